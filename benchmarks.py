@@ -0,0 +1,424 @@
+"""
+Micro-benchmarks for hot paths in giveaway.py.
+
+Run from the repository root (needs the bot's dependencies installed):
+    python benchmarks.py            # all benchmarks
+    python benchmarks.py keywords   # only the named ones
+"""
+import contextlib
+import random
+import re
+import string
+import json
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import giveaway
+from datetime import datetime, timedelta, timezone
+
+from giveaway import GiveawayData, GuildSettings, KeywordMatcher, ParticipantSet, UserGiveawayStats, draw_weighted_winners
+
+
+def _random_words(rng: random.Random, count: int) -> list:
+    return ["".join(rng.choices(string.ascii_letters, k=rng.randint(3, 9))) for _ in range(count)]
+
+
+def _report(title: str, results: dict, per: int, unit: str):
+    print(title)
+    for name, seconds in results.items():
+        print(f"  {name:<28} {seconds * 1000:8.2f} ms  ({seconds / per * 1e6:.2f} us/{unit})")
+
+
+def bench_keywords(messages: int = 20000, repeat: int = 5):
+    """KeywordMatcher vs. the previous per-message loop that lowercased every keyword for every message."""
+    for keyword_count in (2, 8, 32):
+        rng = random.Random(42)
+        keywords = _random_words(rng, keyword_count)
+        vocabulary = _random_words(rng, 500) + keywords
+        contents = [" ".join(rng.choices(vocabulary, k=rng.randint(3, 25))) for _ in range(messages)]
+
+        def old_loop():
+            hits = 0
+            for content in contents:
+                content_lower = content.lower()
+                if any(keyword.lower() in content_lower for keyword in keywords):
+                    hits += 1
+            return hits
+
+        # Reference only: a single case-insensitive alternation, which CPython's re runs slowly
+        regex = re.compile("|".join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+        def regex_loop():
+            return sum(1 for content in contents if regex.search(content))
+
+        def matcher_loop(matcher):
+            return sum(1 for content in contents if matcher.matches(content))
+
+        matcher = KeywordMatcher(keywords)
+        whole_word_matcher = KeywordMatcher(keywords, whole_word=True)
+        assert old_loop() == matcher_loop(matcher) == regex_loop(), "implementations disagree"
+        results = {
+            "old loop": min(timeit.repeat(old_loop, number=1, repeat=repeat)),
+            "combined regex (IGNORECASE)": min(timeit.repeat(regex_loop, number=1, repeat=repeat)),
+            "KeywordMatcher": min(timeit.repeat(lambda: matcher_loop(matcher), number=1, repeat=repeat)),
+            "KeywordMatcher (whole word)": min(timeit.repeat(lambda: matcher_loop(whole_word_matcher), number=1, repeat=repeat)),
+        }
+        _report(f"keywords: {messages} messages, {keyword_count} keywords", results, messages, "message")
+
+
+def bench_draw(participants: int = 50000, winners: int = 10, repeat: int = 5):
+    """draw_weighted_winners vs. the previous expanded entries list + random.choice retry loop."""
+    rng = random.Random(42)
+    for bonus_choices in ((1, 1, 1, 2, 3, 5), (1, 10, 25, 50)):
+        entries = {user_id: rng.choice(bonus_choices) for user_id in range(participants)}
+        _bench_draw_case(entries, winners, repeat)
+
+    # One heavy user: the old retry loop often returned fewer winners than requested
+    skewed = {0: 10000, 1: 1, 2: 1}
+    trials = 2000
+    short_old = sum(1 for _ in range(trials) if len(_old_draw(skewed, 3)) < 3)
+    short_new = sum(1 for _ in range(trials) if len(draw_weighted_winners(skewed, 3)) < 3)
+    print(f"  short draws with one 10000-entry user (3 winners): old {short_old}/{trials}, new {short_new}/{trials}")
+
+
+def _old_draw(entries: dict, k: int) -> list:
+    weighted = []
+    for user_id, count in entries.items():
+        weighted.extend([user_id] * count)
+    k = min(k, len(entries))
+    drawn, attempts = set(), 0
+    while len(drawn) < k and attempts < k * 10:
+        drawn.add(random.choice(weighted))
+        attempts += 1
+    return list(drawn)
+
+
+def _bench_draw_case(entries: dict, winners: int, repeat: int):
+    results = {
+        "old expanded list": min(timeit.repeat(lambda: _old_draw(entries, winners), number=1, repeat=repeat)),
+        "draw_weighted_winners": min(timeit.repeat(lambda: draw_weighted_winners(entries, winners), number=1, repeat=repeat)),
+    }
+    _report(f"draw: {len(entries)} participants, {sum(entries.values())} entries, {winners} winners", results, 1, "draw")
+
+
+def bench_draw_numpy(winners: int = 10, repeat: int = 5):
+    """Pure Python vs. NumPy draw_weighted_winners across pool sizes."""
+    if giveaway.np is None:
+        print("draw_numpy: NumPy is not installed, skipped")
+        return
+    rng = random.Random(42)
+    print(f"draw_numpy: {winners} winners (NUMPY_DRAW_THRESHOLD = {giveaway.NUMPY_DRAW_THRESHOLD})")
+    for participants in (1_000, 10_000, 100_000, 1_000_000):
+        entries = {rng.getrandbits(62): rng.choice((1, 1, 1, 2, 3, 5)) for _ in range(participants)}
+        python_time = min(timeit.repeat(lambda: draw_weighted_winners(entries, winners, use_numpy=False), number=1, repeat=repeat))
+        numpy_time = min(timeit.repeat(lambda: draw_weighted_winners(entries, winners, use_numpy=True), number=1, repeat=repeat))
+        print(f"  {participants:>9} participants: python {python_time * 1000:8.2f} ms, numpy {numpy_time * 1000:8.2f} ms ({python_time / numpy_time:.1f}x)")
+
+
+def _allocated(build) -> tuple:
+    """Returns (object, bytes still allocated after building it)."""
+    tracemalloc.start()
+    try:
+        obj = build()
+        current, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return obj, current
+
+
+def bench_participants(repeat: int = 3):
+    """Memory and operation cost of ParticipantSet vs. the previous Dict[int, int] at 10k/100k/1M participants."""
+    for participants in (10_000, 100_000, 1_000_000):
+        rng = random.Random(42)
+        entry_counts = [rng.choice((1, 1, 1, 2, 3, 5)) for _ in range(participants)]
+        id_rng = random.Random(42)
+        user_ids = [id_rng.getrandbits(62) for _ in range(participants)] # Snowflake-sized IDs
+
+        def joined(mapping):
+            for user_id, entries in zip(user_ids, entry_counts):
+                mapping[user_id] = entries
+            return mapping
+        def fresh_ids():
+            # The loaded ints belong to the mapping (as after parsing a file), so count them too
+            id_rng = random.Random(42)
+            return ((id_rng.getrandbits(62), entries) for entries in entry_counts)
+        as_dict, dict_bytes = _allocated(lambda: dict(fresh_ids()))
+        as_set, set_bytes = _allocated(lambda: ParticipantSet(dict(fresh_ids())))
+        assert as_set == as_dict == joined(ParticipantSet()), "implementations disagree"
+        print(f"participants: {participants}")
+        print(f"  memory: dict {dict_bytes / participants:6.1f} B/participant, ParticipantSet {set_bytes / participants:6.1f} B/participant ({dict_bytes / set_bytes:.1f}x smaller)")
+        legacy_text = json.dumps({str(k): v for k, v in as_dict.items()})
+        blob_text = json.dumps(as_set.to_json())
+        print(f"  serialized: legacy JSON object {len(legacy_text) / 1024:9.0f} KiB, blob {len(as_set.to_bytes()) / 1024:9.0f} KiB, base64 blob {len(blob_text) / 1024:9.0f} KiB")
+
+        probes = rng.sample(user_ids, min(10_000, participants)) + [rng.getrandbits(62) for _ in range(1000)]
+        leavers = probes[:1000]
+        def leave_and_rejoin(mapping):
+            for user_id in leavers:
+                entries = mapping.pop(user_id)
+                mapping[user_id] = entries
+        results = {
+            "join all (dict)": min(timeit.repeat(lambda: joined({}), number=1, repeat=repeat)),
+            "join all (ParticipantSet)": min(timeit.repeat(lambda: joined(ParticipantSet()), number=1, repeat=repeat)),
+            "contains (dict)": min(timeit.repeat(lambda: [user_id in as_dict for user_id in probes], number=1, repeat=repeat)) / len(probes) * participants,
+            "contains (ParticipantSet)": min(timeit.repeat(lambda: [user_id in as_set for user_id in probes], number=1, repeat=repeat)) / len(probes) * participants,
+            "leave+rejoin (dict)": min(timeit.repeat(lambda: leave_and_rejoin(as_dict), number=1, repeat=repeat)) / len(leavers) * participants,
+            "leave+rejoin (ParticipantSet)": min(timeit.repeat(lambda: leave_and_rejoin(as_set), number=1, repeat=repeat)) / len(leavers) * participants,
+            "save (legacy JSON dict)": min(timeit.repeat(lambda: json.dumps({str(k): v for k, v in as_dict.items()}), number=1, repeat=repeat)),
+            "save (base64 blob)": min(timeit.repeat(as_set.to_json, number=1, repeat=repeat)),
+            "load (legacy JSON dict)": min(timeit.repeat(lambda: ParticipantSet.from_json(json.loads(legacy_text)), number=1, repeat=repeat)),
+            "load (base64 blob)": min(timeit.repeat(lambda: ParticipantSet.from_json(json.loads(blob_text)), number=1, repeat=repeat)),
+        }
+        _report("  operations (contains/leave scaled to one per participant):", results, participants, "participant")
+
+
+def bench_models(giveaways: int = 200, participants: int = 5000, users: int = 100_000, repeat: int = 3):
+    """Loading stored giveaways (participants decoded lazily vs. eagerly) and memory of slotted user stats."""
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    stored = [
+        GiveawayData(giveaway_id=i, message_id=10**17 + i, channel_id=1, guild_id=1, prize="Prize", host_id=2, winners_count=1,
+                     start_time=now, end_time=now, participants={rng.getrandbits(62): 1 for _ in range(participants)}).to_dict()
+        for i in range(giveaways)
+    ]
+    def load(decode: bool):
+        loaded = [GiveawayData.from_dict(data) for data in stored]
+        if decode:
+            for gw in loaded:
+                len(gw.participants.get(0, ())) # Any lookup decodes
+        return loaded
+    results = {
+        "from_dict (lazy participants)": min(timeit.repeat(lambda: load(False), number=1, repeat=repeat)),
+        "from_dict + decode": min(timeit.repeat(lambda: load(True), number=1, repeat=repeat)),
+    }
+    _report(f"models: load {giveaways} giveaways x {participants} participants", results, giveaways, "giveaway")
+
+    stats_dicts = [UserGiveawayStats(user_id=rng.getrandbits(62), guild_id=1, hosted_count=1, hosted_last_timestamp=now).to_dict() for _ in range(users)]
+    _stats, stats_bytes = _allocated(lambda: [UserGiveawayStats.from_dict(data) for data in stats_dicts])
+    print(f"  {users} UserGiveawayStats: {stats_bytes / users:.0f} B/instance (slotted, no __dict__)")
+
+
+@contextlib.contextmanager
+def _stdlib_json():
+    """Temporarily encodes/decodes JSON with the stdlib even if orjson is installed."""
+    saved = giveaway.orjson
+    giveaway.orjson = None
+    try:
+        yield
+    finally:
+        giveaway.orjson = saved
+
+
+def bench_serialization(giveaways: int = 100, participants: int = 2000, users: int = 20_000, repeat: int = 5):
+    """Saving/loading one guild's files: the previous pretty-printed JSON vs. each storage codec."""
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    records = {
+        "giveaways": {
+            str(10**17 + i): GiveawayData(giveaway_id=i, message_id=10**17 + i, channel_id=1, guild_id=1, prize=f"Prize {i}", host_id=2, winners_count=1,
+                                          start_time=now, end_time=now, required_keywords=["gg"], bonus_entries={3: 2},
+                                          participants={rng.getrandbits(62): rng.choice((1, 2, 3)) for _ in range(participants)})
+            for i in range(giveaways)
+        },
+        "user_stats": {
+            str(user_id): UserGiveawayStats(user_id=user_id, guild_id=1, hosted_count=1, hosted_last_timestamp=now, won_count=2, won_last_timestamp=now)
+            for user_id in (rng.getrandbits(62) for _ in range(users))
+        },
+        "settings": GuildSettings(guild_id=1),
+    }
+    def to_dicts():
+        return {
+            "giveaways": {key: gw.to_dict() for key, gw in records["giveaways"].items()},
+            "user_stats": {key: stats.to_dict() for key, stats in records["user_stats"].items()},
+            "settings": records["settings"].to_dict(),
+        }
+    def from_dicts(data):
+        return (
+            [GiveawayData.from_dict(gw) for gw in data["giveaways"].values()],
+            [UserGiveawayStats.from_dict(stats) for stats in data["user_stats"].values()],
+            GuildSettings.from_dict(data["settings"]),
+        )
+    def legacy_encode(data) -> bytes:
+        body = json.dumps(data, indent=4) # What write_json_atomic used to write
+        return f"{body}\n{giveaway.STORAGE_CHECKSUM_PREFIX}{giveaway.zlib.crc32(body.encode('utf-8')):08x}\n".encode('utf-8')
+
+    formats = {"legacy JSON (indent=4)": (legacy_encode, _stdlib_json)}
+    formats["codec json (stdlib)"] = (lambda data: giveaway.encode_storage_payload(data, b"J"), _stdlib_json)
+    if giveaway.orjson is not None:
+        formats["codec json (orjson)"] = (lambda data: giveaway.encode_storage_payload(data, b"J"), contextlib.nullcontext)
+    if giveaway.msgpack is not None:
+        formats["codec msgpack"] = (lambda data: giveaway.encode_storage_payload(data, b"M"), contextlib.nullcontext)
+
+    print(f"serialization: {giveaways} giveaways x {participants} participants, {users} user stats, settings")
+    for name, (encode, context) in formats.items():
+        with context():
+            dicts = to_dicts()
+            raw = encode(dicts)
+            assert len(from_dicts(giveaway.decode_storage_payload(raw))[0]) == giveaways
+            save = min(timeit.repeat(lambda: encode(to_dicts()), number=1, repeat=repeat))
+            encode_only = min(timeit.repeat(lambda: encode(dicts), number=1, repeat=repeat))
+            load = min(timeit.repeat(lambda: from_dicts(giveaway.decode_storage_payload(raw)), number=1, repeat=repeat))
+            decode_only = min(timeit.repeat(lambda: giveaway.decode_storage_payload(raw), number=1, repeat=repeat))
+        print(f"  {name:<24} {len(raw) / 1024:8.0f} KiB  save {save * 1000:7.2f} ms (encode {encode_only * 1000:7.2f} ms)  "
+              f"load {load * 1000:7.2f} ms (decode {decode_only * 1000:7.2f} ms)")
+
+
+@contextlib.contextmanager
+def _temporary_storage():
+    """Points the storage layer at an empty JSON store in a temporary directory."""
+    saved = giveaway.STORAGE_DIR, giveaway.storage_backend
+    with tempfile.TemporaryDirectory() as storage_dir:
+        giveaway.STORAGE_DIR = storage_dir
+        giveaway.storage_backend = giveaway.create_storage_backend("json")
+        try:
+            yield storage_dir
+        finally:
+            giveaway.STORAGE_DIR, giveaway.storage_backend = saved
+
+
+class _Bot:
+    async def wait_until_ready(self):
+        pass
+
+
+def bench_startup(guilds: int = 500, active_every: int = 10, ended: int = 50, users: int = 500, repeat: int = 3):
+    """Startup: lazy vs. eager loading, sequential vs. parallel guild reads, and the boot snapshot."""
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    def make(guild_id: int, giveaway_id: int, ended_ago: int | None = None) -> GiveawayData:
+        end_time = now + timedelta(hours=1) if ended_ago is None else now - timedelta(minutes=ended_ago)
+        return GiveawayData(giveaway_id=giveaway_id, message_id=guild_id * 1000 + giveaway_id, channel_id=guild_id, guild_id=guild_id, prize="Prize", host_id=1,
+                            winners_count=1, start_time=now, end_time=end_time, ended=ended_ago is not None,
+                            participants={rng.getrandbits(62): 1 for _ in range(200)})
+
+    with _temporary_storage():
+        for guild_id in range(1, guilds + 1):
+            giveaway.save_guild_settings(GuildSettings(guild_id=guild_id))
+            active = {make(guild_id, 1).message_id: make(guild_id, 1)} if guild_id % active_every == 0 else {}
+            giveaway.save_giveaways_for_guild(active, guild_id)
+            giveaway.save_giveaways_for_guild({gw.message_id: gw for gw in (make(guild_id, i, ended_ago=i) for i in range(2, ended + 2))}, guild_id, is_ended=True)
+            giveaway.save_guild_user_stats({user_id: UserGiveawayStats(user_id=user_id, guild_id=guild_id, won_count=1, won_last_timestamp=now)
+                                            for user_id in range(users)}, guild_id)
+
+        guild_ids = giveaway.storage_backend.list_guild_ids()
+        def lazy():
+            giveaway.GiveawayCog(_Bot()).storage.shutdown() # __init__ runs load_state
+        def eager():
+            lazy()
+            for guild_id in guild_ids:
+                giveaway.load_guild_settings(guild_id)
+                giveaway.load_ended_giveaways_for_guild(guild_id)
+                giveaway.load_guild_user_stats(guild_id)
+        active = giveaway.load_active_giveaways(guild_ids)
+        sequential_ids = {(gw.guild_id, gw.giveaway_id): gw.message_id for gws in active.values() for gw in gws.values()}
+        def write_snapshot():
+            giveaway.write_boot_snapshot(giveaway.BootSnapshot(active, sequential_ids))
+        results = {
+            "eager (every guild's files)": min(timeit.repeat(eager, number=1, repeat=repeat)),
+            "lazy load_state": min(timeit.repeat(lazy, number=1, repeat=repeat)),
+            "active files, 1 thread": min(timeit.repeat(lambda: giveaway.load_active_giveaways(guild_ids, workers=1), number=1, repeat=repeat)),
+            f"active files, {giveaway.STARTUP_LOAD_WORKERS} threads": min(timeit.repeat(lambda: giveaway.load_active_giveaways(guild_ids), number=1, repeat=repeat)),
+            "boot snapshot": min(timeit.repeat(giveaway.consume_boot_snapshot, setup=write_snapshot, number=1, repeat=repeat)),
+        }
+    print(f"startup: {guilds} guilds, {guilds // active_every} active giveaways, {ended} ended giveaways and {users} user stats per guild")
+    for name, seconds in results.items():
+        print(f"  {name:<28} {seconds * 1000:8.2f} ms")
+
+
+class _Role:
+    __slots__ = ("id", "position")
+
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.position = role_id
+
+
+class _Member:
+    """
+    Stand-in for discord.Member: _roles leaves out @everyone, member.roles builds sorted Role objects
+    from it plus the default role, like discord.py.
+    """
+    def __init__(self, user_id: int, role_ids: list, roles_by_id: dict, guild):
+        self.id = user_id
+        self.guild = guild
+        self._roles = role_ids
+        self._roles_by_id = roles_by_id
+
+    @property
+    def roles(self) -> list:
+        roles = [self._roles_by_id[self.guild.id]]
+        roles.extend(self._roles_by_id[role_id] for role_id in self._roles)
+        return sorted(roles, key=lambda role: role.position)
+
+
+class _Guild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id # Also the ID of the @everyone role
+        self._members = {}
+
+    def get_member(self, user_id: int):
+        return self._members.get(user_id)
+
+
+def _old_filter(guild, giveaway_data: GiveawayData, settings: GuildSettings) -> dict:
+    """The previous end-time filter: rebuilt role sets plus a set of role IDs per member."""
+    all_blacklist_roles = {role_id for role_id in (giveaway_data.blacklist_role_id, settings.default_blacklist_role_id) if role_id}
+    all_bypass_roles = set(giveaway_data.bypass_role_ids) | set(settings.default_bypass_role_ids)
+    eligible = []
+    for user_id in list(giveaway_data.participants.keys()):
+        member = guild.get_member(user_id)
+        if not member:
+            continue
+        member_roles_set = {role.id for role in member.roles}
+        has_bypass = any(role_id in all_bypass_roles for role_id in member_roles_set)
+        is_blacklisted = any(role_id in all_blacklist_roles for role_id in member_roles_set)
+        if not is_blacklisted or has_bypass:
+            eligible.append(user_id)
+    return {user_id: giveaway_data.participants[user_id] for user_id in eligible if user_id in giveaway_data.participants}
+
+
+def bench_eligibility(participants: int = 100_000, guild_roles: int = 200, roles_per_member: int = 8, repeat: int = 3):
+    """End-time participant filtering: compiled RoleEligibility table vs. the previous per-member role sets."""
+    rng = random.Random(42)
+    guild = _Guild(guild_roles + 1)
+    roles_by_id = {role_id: _Role(role_id) for role_id in range(1, guild_roles + 1)}
+    roles_by_id[guild.id] = _Role(guild.id)
+    roles_by_id[guild.id].position = 0 # @everyone
+    guild._members = {user_id: _Member(user_id, rng.sample(range(1, guild_roles + 1), rng.randint(1, roles_per_member)), roles_by_id, guild)
+                      for user_id in range(participants) if user_id % 50} # 2% have left the guild
+    now = datetime.now(timezone.utc)
+    giveaway_data = GiveawayData(giveaway_id=1, message_id=1, channel_id=1, guild_id=1, prize="Prize", host_id=1, winners_count=10,
+                                 start_time=now, end_time=now + timedelta(hours=1), required_role_id=3, bonus_entries={4: 2, 5: 1},
+                                 bypass_role_ids=[6, 7], blacklist_role_id=8,
+                                 participants={user_id: rng.randint(1, 4) for user_id in range(participants)})
+    settings = GuildSettings(guild_id=1, default_bypass_role_ids=[9], default_blacklist_role_id=10)
+    compiled = giveaway_data.role_eligibility(settings)
+    assert compiled.filter_participants(guild, giveaway_data.participants)[0] == _old_filter(guild, giveaway_data, settings)
+    for everyone_rules in ({"default_blacklist_role_id": guild.id}, {"default_blacklist_role_id": guild.id, "default_bypass_role_ids": [guild.id]}):
+        everyone_settings = GuildSettings(guild_id=1, **everyone_rules) # Rules on @everyone apply to every member
+        expected = _old_filter(guild, giveaway_data, everyone_settings)
+        assert giveaway_data.role_eligibility(everyone_settings).filter_participants(guild, giveaway_data.participants)[0] == expected
+    results = {
+        "role sets (previous)": min(timeit.repeat(lambda: _old_filter(guild, giveaway_data, settings), number=1, repeat=repeat)),
+        "compiled bit table": min(timeit.repeat(lambda: giveaway_data.role_eligibility(settings).filter_participants(guild, giveaway_data.participants), number=1, repeat=repeat)),
+    }
+    _report(f"eligibility: {participants} participants, up to {roles_per_member} of {guild_roles} roles each", results, participants, "participant")
+
+
+BENCHMARKS = {
+    "keywords": bench_keywords,
+    "draw": bench_draw,
+    "draw_numpy": bench_draw_numpy,
+    "participants": bench_participants,
+    "models": bench_models,
+    "serialization": bench_serialization,
+    "startup": bench_startup,
+    "eligibility": bench_eligibility,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
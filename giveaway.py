@@ -3,13 +3,46 @@ from discord import app_commands
 from discord.ext import commands, tasks
 import asyncio
 import random
+import math
+import heapq
 import logging
 import re
 import os
+import time
+import sys
 import json
+import gzip
+import zlib
+import base64
+import struct
+import sqlite3
+import threading
+import dataclasses
+import functools
+import itertools
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Set, Union
+from typing import List, Dict, Optional, Set, Union, Tuple, Callable, Awaitable, Iterable
+
+try: # Optional: vectorized winner draws for very large giveaways
+    import numpy as np
+except ImportError:
+    np = None
+
+try: # Optional: faster JSON encoding/decoding for storage
+    import orjson
+except ImportError:
+    orjson = None
+
+try: # Optional: compact binary storage files
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # -----------------------------
 # Configuration
@@ -39,26 +72,135 @@ STORAGE_DIR = "storage"
 os.makedirs(STORAGE_DIR, exist_ok=True)
 # Updated: Storage is now per-guild
 
+STORAGE_BACKEND = "json" # "json" (per-guild files) or "sqlite" (single WAL-mode database)
+SQLITE_DB_FILENAME = "giveaways.db" # Stored in STORAGE_DIR when STORAGE_BACKEND = "sqlite"
+SQLITE_IN_CHUNK = 500 # Message IDs per "IN (...)" lookup, below SQLite's bound parameter limit
+
 ACTIVE_GIVEAWAYS_FILENAME = "active_giveaways.json"
+ACTIVE_JOURNAL_FILENAME = "active_giveaways.journal" # Append-only join/leave/end events since the last snapshot
 ENDED_GIVEAWAYS_FILENAME = "ended_giveaways_temp.json" # For reroll cache
+ENDED_JOURNAL_FILENAME = "ended_giveaways.journal" # Reroll cache additions/evictions since the last ended snapshot
 USER_STATS_FILENAME = "user_stats.json" # New file for user stats
 GUILD_SETTINGS_FILENAME = "settings.json"
 
+# Long-term history of ended giveaways (JSON storage; SQLite keeps ended rows instead)
+ARCHIVE_DIRNAME = "archive" # storage/<guild_id>/archive/
+ARCHIVE_INDEX_FILENAME = "index.log" # "giveaway_id message_id segment offset length" per archived giveaway
+ARCHIVE_SEGMENT_MAX_BYTES = 4 * 1024 * 1024 # A new segment file is started once the current one reaches this size
+ARCHIVE_DM_RESULTS_FILENAME = "dm_results.log" # {"m": message_id, "r": {user_id: dm_status}} per line, applied over the records
+
+# Durability of storage writes. Files are always written to a temp file and renamed into place.
+#   "none" - no fsync (fastest, a power loss may lose recent writes)
+#   "file" - fsync the temp file before the rename
+#   "dir"  - also fsync the directory after the rename (rename itself survives power loss)
+STORAGE_FSYNC_POLICY = "file"
+STORAGE_BACKUP_SUFFIX = ".bak" # Previous good copy, used if the current file fails its checksum
+JOURNAL_PREVIOUS_SUFFIX = ".prev" # Journal segment folded into the current snapshot; replayed on top of the .bak copy
+STORAGE_TEMP_SUFFIX = ".tmp"
+STORAGE_CHECKSUM_PREFIX = "#crc32=" # Trailer line appended after the JSON body (legacy text files)
+
+# Encoding of the storage files. Files in every format, including the older pretty-printed JSON, stay readable.
+#   "auto"    - msgpack if installed, otherwise compact JSON
+#   "msgpack" - binary, smallest and fastest to encode/decode (needs the msgpack package)
+#   "json"    - compact JSON (encoded with orjson if installed)
+STORAGE_CODEC = "auto"
+STORAGE_FILE_MAGIC = b"GWS\x01" # Start of files written by the codec layer (legacy JSON files start with '{')
+
+STORAGE_IO_WORKERS = 4 # Threads used for storage I/O (keeps disk work off the event loop)
+STARTUP_LOAD_WORKERS = 8 # Threads reading guild directories in parallel at startup (when there is no boot snapshot)
+BOOT_SNAPSHOT_FILENAME = "boot_snapshot.bin" # storage/; active giveaways + sequential ID map, written on clean shutdown
+
+# Write-behind persistence for active giveaways (joins/leaves are coalesced)
+WRITE_BEHIND_FLUSH_INTERVAL = 5.0 # Seconds between flushes of dirty guilds
+WRITE_BEHIND_MAX_PENDING = 50 # Pending changes per guild that force an immediate flush
+
+# Participant count button on active giveaway messages
+PARTICIPANT_COUNT_EDIT_INTERVAL = 5.0 # Seconds; at most one count edit per giveaway message in this window
+PARTICIPANT_LIST_MAX_SHOWN = 60 # Participants resolved and listed by the participants button (one message)
+
+# Outbound messages: sends/edits are queued per route (channel or DM), highest priority first
+OUTBOUND_WORKERS = 4 # Requests in flight at once (never more than one per route)
+OUTBOUND_PRIORITY_ANNOUNCE = 0 # Giveaway message end edits and winner/reroll announcements
+OUTBOUND_PRIORITY_UPDATE = 1 # Participant count button edits
+OUTBOUND_PRIORITY_LOG = 2 # Log channel embeds
+OUTBOUND_PRIORITY_DM = 3 # Host/winner DMs
+OUTBOUND_DRAIN_TIMEOUT = 10.0 # Seconds cog_unload waits for queued messages to go out
+
+# Member/user lookups for winner lists and DMs (cached with an LRU bound and TTLs)
+USER_CACHE_SIZE = 5000 # Cached lookups (members and users together)
+USER_CACHE_TTL = 600.0 # Seconds a resolved member/user is reused
+USER_CACHE_NEGATIVE_TTL = 3600.0 # Seconds a departed member/deleted user is remembered as missing
+USER_QUERY_CHUNK = 100 # User IDs per guild member chunk request (gateway limit)
+USER_FETCH_CONCURRENCY = 5 # Parallel fetch_user calls for users no longer in the guild
+
+# Winner/host DMs: a few concurrent sends under a global rate budget (token bucket)
+DM_FANOUT_CONCURRENCY = 2 # DMs in flight at once (leaves outbound workers free for channel messages)
+DM_RATE_PER_SECOND = 2.0 # Sustained DMs per second across all guilds
+DM_RATE_BURST = 5 # DMs that may go out back to back after a quiet period
+# Per-winner delivery results recorded on ended giveaways (GiveawayData.dm_results)
+DM_STATUS_PENDING = "pending"
+DM_STATUS_SENT = "sent"
+DM_STATUS_CLOSED = "closed" # The user does not accept DMs from the bot (403)
+DM_STATUS_FAILED = "failed"
+
 # --- Constants ---
 GIVEAWAY_JOIN_ID = "gw_join_persistent"
 GIVEAWAY_LIST_ID = "gw_list_persistent"
+GIVEAWAY_FINAL_COUNT_ID = "gw_final_count" # Disabled participant count button on ended giveaways
 # Renamed/Modified End button ID
 GIVEAWAY_END_BUTTON_ID = "gw_end_button_persistent"
 # New Reroll button ID
 GIVEAWAY_REROLL_BUTTON_ID = "gw_reroll_button_persistent"
 # Link button is standard discord.ui.Button(style=discord.ButtonStyle.link)
 
-MAX_ENDED_GIVEAWAYS_STORED = 50 # Limit how many ended GAs are kept for reroll per guild
+MAX_ENDED_GIVEAWAYS_STORED = 50 # Default for how many ended GAs are kept for reroll per guild (see GuildSettings)
+MAX_ENDED_GIVEAWAYS_LIMIT = 500 # Highest reroll cache size a guild can configure
+ENDED_JOURNAL_COMPACT_EVENTS = 100 # Ended journal events after which the reroll cache snapshot is rewritten
+SCHEDULER_MAX_SLEEP = 60.0 # Seconds; the end scheduler re-checks the wall clock at least this often
+END_QUEUE_WORKERS = 3 # Giveaways ended concurrently (each one fetches/edits messages and sends announcements)
+END_QUEUE_REPORT_INTERVAL = 30.0 # Seconds between queue depth/ETA log lines while a backlog drains
+NUMPY_DRAW_THRESHOLD = 10_000 # Participants from which winners are drawn with NumPy (if installed)
+
+# -------------------------------------------------------------------
+# Schema Versions (New)
+# -------------------------------------------------------------------
+# Every stored record carries its schema version in "v" (records from before versioning count as 1).
+# Older records are upgraded one version at a time on load by the hooks in SCHEMA_UPGRADES.
+SCHEMA_VERSIONS = {"giveaway": 2, "guild_settings": 1, "user_stats": 1}
+
+def _upgrade_giveaway_v1(data: dict) -> dict:
+    """v1 -> v2: fill in giveaway_id for pre-sequential-ID giveaways and store participants as a blob."""
+    if "giveaway_id" not in data:
+        data["giveaway_id"] = data.get("message_id", 0)
+    if isinstance(data.get("participants"), dict): # {"user_id": entries}
+        data["participants"] = ParticipantSet.from_json(data["participants"]).to_json()
+    return data
+
+SCHEMA_UPGRADES: Dict[str, Dict[int, Callable[[dict], dict]]] = {
+    "giveaway": {1: _upgrade_giveaway_v1},
+    "guild_settings": {},
+    "user_stats": {},
+}
+
+def upgrade_record(kind: str, data: dict) -> dict:
+    """Brings a stored record up to the current schema version. The caller's dict is not modified."""
+    version = data.get("v", 1)
+    current = SCHEMA_VERSIONS[kind]
+    if version > current:
+        raise ValueError(f"{kind} record has schema version {version}, but this version of the bot only reads up to {current}")
+    if version < current:
+        data = dict(data)
+        while version < current:
+            data = SCHEMA_UPGRADES[kind][version](data)
+            version += 1
+        data["v"] = current
+    return data
+
 
 # -------------------------------------------------------------------
 # Guild Settings Data Class (Updated)
 # -------------------------------------------------------------------
-@dataclass
+@dataclass(slots=True) # No per-instance __dict__ (one instance per guild)
 class GuildSettings:
     guild_id: int
     next_giveaway_id: int = 1 # Sequential ID counter for this guild
@@ -66,6 +208,9 @@ class GuildSettings:
     default_blacklist_role_id: Optional[int] = None
     default_bypass_role_ids: List[int] = field(default_factory=list)
     log_channel_id: Optional[int] = None
+    # Reroll cache retention: ended giveaways beyond these limits can no longer be rerolled
+    ended_cache_max_count: int = MAX_ENDED_GIVEAWAYS_STORED
+    ended_cache_max_age_days: int = 0 # 0 = no age limit
 
     # --- New Customizable Settings ---
     # Embed Appearance
@@ -103,12 +248,15 @@ class GuildSettings:
 
     def to_dict(self) -> dict:
         return {
+            "v": SCHEMA_VERSIONS["guild_settings"],
             "guild_id": self.guild_id,
             "next_giveaway_id": self.next_giveaway_id,
             "staff_role_id": self.staff_role_id,
             "default_blacklist_role_id": self.default_blacklist_role_id,
             "default_bypass_role_ids": self.default_bypass_role_ids,
             "log_channel_id": self.log_channel_id,
+            "ended_cache_max_count": self.ended_cache_max_count,
+            "ended_cache_max_age_days": self.ended_cache_max_age_days,
             # New fields
             "embed_colour": self.embed_colour,
             "embed_winners_colour": self.embed_winners_colour,
@@ -137,6 +285,7 @@ class GuildSettings:
 
     @classmethod
     def from_dict(cls, data: dict) -> 'GuildSettings':
+        data = upgrade_record("guild_settings", data)
         return cls(
             guild_id=data["guild_id"],
             next_giveaway_id=data.get("next_giveaway_id", 1),
@@ -144,6 +293,8 @@ class GuildSettings:
             default_blacklist_role_id=data.get("default_blacklist_role_id"),
             default_bypass_role_ids=data.get("default_bypass_role_ids", []),
             log_channel_id=data.get("log_channel_id"),
+            ended_cache_max_count=data.get("ended_cache_max_count", MAX_ENDED_GIVEAWAYS_STORED),
+            ended_cache_max_age_days=data.get("ended_cache_max_age_days", 0),
             # New fields with defaults for backward compatibility
             embed_colour=data.get("embed_colour", "#3498db"),
             embed_winners_colour=data.get("embed_winners_colour", "#2ecc71"),
@@ -171,10 +322,410 @@ class GuildSettings:
         )
 
 
+# -------------------------------------------------------------------
+# Keyword Matching (New)
+# -------------------------------------------------------------------
+class KeywordMatcher:
+    """
+    A giveaway's required keywords prepared once, instead of lowercasing every keyword for every message.
+    Substring mode scans for pre-folded keywords (keywords containing another keyword are dropped, they
+    can never decide a match); whole-word mode uses one combined regular expression.
+    An empty keyword list matches every message.
+    """
+    __slots__ = ("keywords", "whole_word", "case_sensitive", "_needles", "_pattern")
+
+    def __init__(self, keywords: List[str], whole_word: bool = False, case_sensitive: bool = False):
+        self.keywords = list(keywords)
+        self.whole_word = whole_word
+        self.case_sensitive = case_sensitive
+        folded = {keyword if case_sensitive else keyword.lower() for keyword in self.keywords if keyword}
+        self._pattern = None
+        if whole_word:
+            self._needles = tuple(sorted(folded, key=len, reverse=True)) # Longest first in the alternation
+            if self._needles:
+                alternation = "|".join(re.escape(needle) for needle in self._needles)
+                # Lookarounds instead of \b so keywords starting/ending with punctuation (e.g. "!enter") still work
+                self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+        else:
+            self._needles = tuple(sorted((k for k in folded if not any(other != k and other in k for other in folded)), key=len))
+
+    def is_for(self, keywords: List[str], whole_word: bool, case_sensitive: bool) -> bool:
+        """True if this matcher was built from the given keywords and options."""
+        return self.whole_word == whole_word and self.case_sensitive == case_sensitive and self.keywords == keywords
+
+    def matches(self, content: str) -> bool:
+        if not self._needles:
+            return True
+        if not self.case_sensitive:
+            content = content.lower()
+        if self._pattern is not None:
+            return self._pattern.search(content) is not None
+        for needle in self._needles:
+            if needle in content:
+                return True
+        return False
+
+
+# -------------------------------------------------------------------
+# Role Eligibility (New) - compiled role requirements per giveaway
+# -------------------------------------------------------------------
+ROLE_BYPASS = 1 # Skips the blacklist, required role and message requirements
+ROLE_BLACKLIST = 2
+ROLE_REQUIRED = 4
+ROLE_BONUS = 8 # Adds bonus entries (amount in RoleEligibility.bonus)
+
+
+def member_role_ids(member: discord.Member):
+    """
+    A member's role IDs (including @everyone, whose ID is the guild's) without building
+    and sorting Role objects like member.roles does.
+    """
+    role_ids = getattr(member, "_roles", None)
+    if role_ids is None:
+        return [role.id for role in member.roles]
+    return itertools.chain((member.guild.id,), role_ids) # _roles leaves out the default role
+
+
+class RoleEligibility:
+    """
+    A giveaway's role rules (its own and the guild defaults) compiled into one role_id -> ROLE_* bit table,
+    so a member is checked with a single pass over their role IDs and a few bitwise tests.
+    Drops only use bypass/blacklist, like the join checks always did.
+    """
+    __slots__ = ("signature", "flags", "bonus", "required_role_id", "blacklist_role_ids")
+
+    def __init__(self, giveaway: 'GiveawayData', settings: Optional[GuildSettings]):
+        self.signature = self.signature_for(giveaway, settings)
+        self.flags: Dict[int, int] = {} # role_id: ROLE_* bits
+        self.bonus: Dict[int, int] = {} # role_id: bonus entries
+        self.blacklist_role_ids: List[int] = []
+        self.required_role_id = None if giveaway.is_drop else giveaway.required_role_id
+        bypass_ids = list(giveaway.bypass_role_ids) + list(settings.default_bypass_role_ids if settings else [])
+        blacklist_ids = [giveaway.blacklist_role_id, settings.default_blacklist_role_id if settings else None]
+        for role_id in bypass_ids:
+            self.flags[role_id] = self.flags.get(role_id, 0) | ROLE_BYPASS
+        for role_id in blacklist_ids:
+            if role_id and role_id not in self.blacklist_role_ids:
+                self.blacklist_role_ids.append(role_id)
+                self.flags[role_id] = self.flags.get(role_id, 0) | ROLE_BLACKLIST
+        if self.required_role_id:
+            self.flags[self.required_role_id] = self.flags.get(self.required_role_id, 0) | ROLE_REQUIRED
+        if not giveaway.is_drop: # Bonus entries only for normal giveaways
+            for role_id, bonus in giveaway.bonus_entries.items():
+                if bonus:
+                    self.flags[role_id] = self.flags.get(role_id, 0) | ROLE_BONUS
+                    self.bonus[role_id] = bonus
+
+    @staticmethod
+    def signature_for(giveaway: 'GiveawayData', settings: Optional[GuildSettings]) -> tuple:
+        """Everything the table is built from; a different signature means it must be rebuilt."""
+        return (
+            giveaway.is_drop, giveaway.required_role_id, tuple(giveaway.bypass_role_ids), giveaway.blacklist_role_id,
+            tuple(giveaway.bonus_entries.items()),
+            tuple(settings.default_bypass_role_ids) if settings else (), settings.default_blacklist_role_id if settings else None,
+        )
+
+    def member_flags(self, member: discord.Member) -> Tuple[int, int]:
+        """(ROLE_* bits of all the member's roles including @everyone, bonus entries from them)."""
+        flags = bonus = 0
+        table = self.flags
+        if not table:
+            return flags, bonus
+        for role_id in member_role_ids(member):
+            role_flags = table.get(role_id)
+            if role_flags:
+                flags |= role_flags
+                if role_flags & ROLE_BONUS:
+                    bonus += self.bonus[role_id]
+        return flags, bonus
+
+    @staticmethod
+    def is_allowed(flags: int) -> bool:
+        """Not blacklisted, or bypassed (the check applied when winners are drawn)."""
+        return not flags & ROLE_BLACKLIST or bool(flags & ROLE_BYPASS)
+
+    def filter_participants(self, guild: discord.Guild, participants) -> Tuple[Dict[int, int], int]:
+        """
+        One pass over the participant pool: ({user_id: entries} of members still in the guild who are not
+        blacklisted (or are bypassed), number of participants no longer in the guild).
+        """
+        eligible: Dict[int, int] = {}
+        missing = 0
+        get_member = guild.get_member
+        check_roles = bool(self.blacklist_role_ids) # Without a blacklist only membership matters
+        for user_id, entries in participants.items():
+            member = get_member(user_id)
+            if member is None:
+                missing += 1
+                continue
+            if check_roles and not self.is_allowed(self.member_flags(member)[0]):
+                continue
+            eligible[user_id] = entries
+        return eligible, missing
+
+
+# -------------------------------------------------------------------
+# Participant Storage (New)
+# -------------------------------------------------------------------
+class ParticipantSet:
+    """
+    Compact user_id -> entry count mapping for giveaway participants.
+    Participants are kept in two parallel arrays sorted by user ID (array('Q') ids, array('H') entries),
+    about 10 bytes per participant instead of ~150 for a dict of boxed ints, and found by binary search.
+    Joins and leaves go to a small dict overlay (0 marks a removal) that is merged into the arrays once
+    it outgrows a fraction of them, so join/leave are O(1) amortized and lookups O(log n).
+    Supports the dict operations the cog uses; iteration is in user ID order.
+    The arrays are never modified in place (a merge builds new ones), so copies can share them.
+    """
+    __slots__ = ("_ids", "_entries", "_pending", "_len", "_merge_at", "_raw") # _raw: only used by LazyParticipantSet
+
+    MERGE_MIN = 256 # Overlay entries always allowed before merging
+    MERGE_FRACTION = 16 # ...or 1/16th of the merged participants, whichever is larger
+    MAX_ENTRIES = 0xFFFF # Entry counts are stored as unsigned 16-bit
+    BLOB_MAGIC = b"PS"
+    BLOB_VERSION = 1
+    _BLOB_HEADER = struct.Struct("<2sBI") # magic, version, participant count
+
+    def __init__(self, participants: Optional[Dict[int, int]] = None):
+        items = sorted(participants.items()) if participants else []
+        self._ids = array('Q', [user_id for user_id, _ in items])
+        self._entries = array('H', [self._clamp(entries) for _, entries in items])
+        self._pending: Dict[int, int] = {} # user_id: entries (0 = removed from the arrays)
+        self._len = len(items)
+        self._merge_at = max(self.MERGE_MIN, self._len // self.MERGE_FRACTION) # Overlay size that triggers a merge
+
+    @classmethod
+    def _clamp(cls, entries: int) -> int:
+        return min(max(int(entries), 1), cls.MAX_ENTRIES)
+
+    def _base_get(self, user_id: int) -> int:
+        ids = self._ids
+        i = bisect_left(ids, user_id)
+        if i < len(ids) and ids[i] == user_id:
+            return self._entries[i]
+        return 0
+
+    def _merge(self):
+        """Folds the overlay into new sorted arrays in one linear pass."""
+        pending = self._pending
+        if not pending:
+            return
+        ids, entries = array('Q'), array('H')
+        old_ids, old_entries = self._ids, self._entries
+        changes = sorted(pending.items())
+        i, n = 0, len(old_ids)
+        for user_id, user_entries in changes:
+            j = bisect_left(old_ids, user_id, i)
+            ids.extend(old_ids[i:j])
+            entries.extend(old_entries[i:j])
+            i = j + 1 if j < n and old_ids[j] == user_id else j # Replaced or removed
+            if user_entries:
+                ids.append(user_id)
+                entries.append(user_entries)
+        ids.extend(old_ids[i:])
+        entries.extend(old_entries[i:])
+        self._ids, self._entries, self._pending = ids, entries, {}
+        self._merge_at = max(self.MERGE_MIN, len(ids) // self.MERGE_FRACTION)
+
+    # --- Mapping API ---
+    def get(self, user_id: int, default=None):
+        entries = self._pending.get(user_id)
+        if entries is None:
+            entries = self._base_get(user_id)
+        return entries or default
+
+    def __contains__(self, user_id) -> bool:
+        entries = self._pending.get(user_id)
+        if entries is None:
+            return self._base_get(user_id) > 0
+        return entries > 0
+
+    def __getitem__(self, user_id: int) -> int:
+        entries = self.get(user_id)
+        if entries is None:
+            raise KeyError(user_id)
+        return entries
+
+    def __setitem__(self, user_id: int, entries: int):
+        pending = self._pending
+        previous = pending.get(user_id)
+        if not (previous or (previous is None and self._base_get(user_id))):
+            self._len += 1
+        pending[user_id] = entries if 0 < entries <= self.MAX_ENTRIES else self._clamp(entries)
+        if len(pending) > self._merge_at:
+            self._merge()
+
+    def __delitem__(self, user_id: int):
+        self.pop(user_id)
+
+    _MISSING = object()
+
+    def pop(self, user_id: int, default=_MISSING):
+        entries = self.get(user_id)
+        if entries is None:
+            if default is self._MISSING:
+                raise KeyError(user_id)
+            return default
+        if self._base_get(user_id):
+            self._pending[user_id] = 0 # Removal is applied at the next merge
+        else:
+            del self._pending[user_id]
+        self._len -= 1
+        if len(self._pending) > self._merge_at:
+            self._merge()
+        return entries
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        self._merge()
+        return iter(self._ids)
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        self._merge()
+        return iter(self._entries)
+
+    def items(self):
+        self._merge()
+        return zip(self._ids, self._entries)
+
+    def copy(self) -> 'ParticipantSet':
+        """Cheap copy: the arrays are shared, only the overlay is copied."""
+        clone = ParticipantSet.__new__(ParticipantSet)
+        clone._ids, clone._entries, clone._pending, clone._len, clone._merge_at = self._ids, self._entries, self._pending.copy(), self._len, self._merge_at
+        return clone
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ParticipantSet, dict)):
+            return len(self) == len(other) and dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ParticipantSet({len(self)} participants)"
+
+    # --- Binary form ---
+    def to_bytes(self) -> bytes:
+        """Header, then all ids (little-endian uint64), then all entry counts (little-endian uint16)."""
+        self._merge()
+        ids, entries = self._ids, self._entries
+        if sys.byteorder == "big":
+            ids, entries = array('Q', ids), array('H', entries)
+            ids.byteswap()
+            entries.byteswap()
+        return self._BLOB_HEADER.pack(self.BLOB_MAGIC, self.BLOB_VERSION, len(ids)) + ids.tobytes() + entries.tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'ParticipantSet':
+        magic, version, count = cls._BLOB_HEADER.unpack_from(blob)
+        if magic != cls.BLOB_MAGIC or version != cls.BLOB_VERSION:
+            raise ValueError(f"Unsupported participant blob (magic {magic!r}, version {version})")
+        start = cls._BLOB_HEADER.size
+        if len(blob) != start + count * 10:
+            raise ValueError(f"Participant blob has {len(blob)} bytes, expected {start + count * 10}")
+        ids, entries = array('Q'), array('H')
+        ids.frombytes(blob[start:start + count * 8])
+        entries.frombytes(blob[start + count * 8:])
+        if sys.byteorder == "big":
+            ids.byteswap()
+            entries.byteswap()
+        participants = cls.__new__(cls)
+        participants._ids, participants._entries, participants._pending, participants._len = ids, entries, {}, count
+        participants._merge_at = max(cls.MERGE_MIN, count // cls.MERGE_FRACTION)
+        return participants
+
+    def to_json(self) -> str:
+        """Base64 of to_bytes(), for the JSON storage files."""
+        return base64.b64encode(self.to_bytes()).decode('ascii')
+
+    @classmethod
+    def from_json(cls, value) -> 'ParticipantSet':
+        """Accepts the base64 form or the older {"user_id": entries} object."""
+        if isinstance(value, str):
+            return cls.from_bytes(base64.b64decode(value))
+        return cls({int(user_id): entries for user_id, entries in (value or {}).items()})
+
+
+class LazyParticipantSet(ParticipantSet):
+    """
+    Participants as read from storage (base64 blob or legacy object), decoded on first use,
+    after which the instance is a plain ParticipantSet. len() only reads the blob header, and
+    copy()/to_json() pass an untouched blob through, so loading and re-saving a giveaway
+    nobody joined never decodes its participants.
+    """
+    __slots__ = ()
+
+    def __init__(self, raw):
+        if isinstance(raw, str): # Cheap validation up front, so a bad blob fails while loading (not on first join)
+            header_chars = -(-self._BLOB_HEADER.size // 3) * 4
+            magic, version, count = self._BLOB_HEADER.unpack_from(base64.b64decode(raw[:header_chars]))
+            if magic != self.BLOB_MAGIC or version != self.BLOB_VERSION or len(raw) != -(-(self._BLOB_HEADER.size + count * 10) // 3) * 4:
+                raise ValueError("Invalid participant blob")
+            self._len = count
+        else:
+            raw = raw or {}
+            self._len = len(raw)
+        self._raw = raw
+
+    def _decode(self):
+        decoded = ParticipantSet.from_json(self._raw)
+        self._ids, self._entries, self._pending, self._merge_at = decoded._ids, decoded._entries, decoded._pending, decoded._merge_at
+        self._raw = None
+        self.__class__ = ParticipantSet # Same slot layout, so later calls skip this class entirely
+
+    def copy(self) -> ParticipantSet:
+        return LazyParticipantSet(self._raw)
+
+    def to_json(self) -> str:
+        if isinstance(self._raw, str):
+            return self._raw
+        self._decode()
+        return self.to_json()
+
+    def get(self, user_id: int, default=None):
+        self._decode()
+        return self.get(user_id, default)
+
+    def __contains__(self, user_id) -> bool:
+        self._decode()
+        return user_id in self
+
+    def __getitem__(self, user_id: int) -> int:
+        self._decode()
+        return self[user_id]
+
+    def __setitem__(self, user_id: int, entries: int):
+        self._decode()
+        self[user_id] = entries
+
+    def pop(self, user_id: int, *default):
+        self._decode()
+        return self.pop(user_id, *default)
+
+    def __iter__(self):
+        self._decode()
+        return iter(self)
+
+    def values(self):
+        self._decode()
+        return self.values()
+
+    def items(self):
+        self._decode()
+        return self.items()
+
+    def to_bytes(self) -> bytes:
+        self._decode()
+        return self.to_bytes()
+
+
 # -------------------------------------------------------------------
 # Data Class for Giveaway State (Updated)
 # -------------------------------------------------------------------
-@dataclass
+@dataclass(slots=True) # No per-instance __dict__; participants are decoded on first use (LazyParticipantSet)
 class GiveawayData:
     giveaway_id: int # Sequential ID for the guild
     message_id: int # The Discord message ID (still needed for interactions)
@@ -193,16 +744,43 @@ class GiveawayData:
     message_count_channel_id: Optional[int] = None # Channel to count messages in
     message_cooldown_seconds: int = 0 # Cooldown between counted messages per user
     required_keywords: List[str] = field(default_factory=list) # Keywords for counting messages
+    keyword_whole_word: bool = False # Keywords must appear as whole words
+    keyword_case_sensitive: bool = False
     donor_id: Optional[int] = None # User ID of the donor
     image_url: Optional[str] = None
-    participants: Dict[int, int] = field(default_factory=dict) # user_id: entry_count
+    participants: ParticipantSet = field(default_factory=ParticipantSet) # user_id: entry_count (plain dicts are converted)
     ended: bool = False
     task_scheduled: bool = False # To track if end task is running
     is_drop: bool = False # NEW FIELD: To identify drop giveaways
+    dm_results: Dict[int, str] = field(default_factory=dict) # winner user_id: DM_STATUS_* (see DirectMessageFanout)
+    # Compiled required_keywords, built on first use (not saved)
+    _keyword_matcher: Optional[KeywordMatcher] = field(default=None, init=False, repr=False, compare=False)
+    # Compiled role rules, rebuilt when they or the guild defaults change (not saved)
+    _role_eligibility: Optional[RoleEligibility] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not isinstance(self.participants, ParticipantSet):
+            self.participants = ParticipantSet(self.participants)
+
+    @property
+    def keyword_matcher(self) -> KeywordMatcher:
+        """Matcher for required_keywords. Rebuilt only if the keywords or options change."""
+        matcher = self._keyword_matcher
+        if matcher is None or not matcher.is_for(self.required_keywords, self.keyword_whole_word, self.keyword_case_sensitive):
+            matcher = self._keyword_matcher = KeywordMatcher(self.required_keywords, self.keyword_whole_word, self.keyword_case_sensitive)
+        return matcher
+
+    def role_eligibility(self, settings: Optional[GuildSettings]) -> RoleEligibility:
+        """Role rules compiled with the guild defaults. Rebuilt only if either changes."""
+        compiled = self._role_eligibility
+        if compiled is None or compiled.signature != RoleEligibility.signature_for(self, settings):
+            compiled = self._role_eligibility = RoleEligibility(self, settings)
+        return compiled
 
     # Method to easily convert to dict for JSON storage
     def to_dict(self) -> dict:
         return {
+            "v": SCHEMA_VERSIONS["giveaway"],
             "giveaway_id": self.giveaway_id,
             "message_id": self.message_id,
             "channel_id": self.channel_id,
@@ -220,16 +798,20 @@ class GiveawayData:
             "message_count_channel_id": self.message_count_channel_id,
             "message_cooldown_seconds": self.message_cooldown_seconds,
             "required_keywords": self.required_keywords,
+            "keyword_whole_word": self.keyword_whole_word,
+            "keyword_case_sensitive": self.keyword_case_sensitive,
             "donor_id": self.donor_id,
             "image_url": self.image_url,
-            "participants": {str(k): v for k, v in self.participants.items()},
+            "participants": self.participants.to_json(),
             "ended": self.ended,
             "is_drop": self.is_drop, # Save new field
+            "dm_results": {str(k): v for k, v in self.dm_results.items()},
         }
 
     # Class method to easily create from dict (loaded from JSON)
     @classmethod
     def from_dict(cls, data: dict) -> 'GiveawayData':
+        data = upgrade_record("giveaway", data)
         start_time = datetime.fromisoformat(data["start_time"])
         end_time = datetime.fromisoformat(data["end_time"])
         if start_time.tzinfo is None:
@@ -238,7 +820,7 @@ class GiveawayData:
             end_time = end_time.replace(tzinfo=timezone.utc)
 
         return cls(
-            giveaway_id=data.get("giveaway_id", data.get("message_id", 0)), # Handle old data or default
+            giveaway_id=data["giveaway_id"], # Filled in for old data by the v1 upgrade
             message_id=data["message_id"],
             channel_id=data["channel_id"],
             guild_id=data["guild_id"],
@@ -248,24 +830,27 @@ class GiveawayData:
             start_time=start_time,
             end_time=end_time,
             required_role_id=data.get("required_role_id"),
-            bonus_entries={int(k): v for k in data.get("bonus_entries", {}).keys() for v in [data["bonus_entries"][k]]}, # Ensure correct type conversion
+            bonus_entries={int(k): v for k, v in data.get("bonus_entries", {}).items()}, # Ensure correct type conversion
             bypass_role_ids=data.get("bypass_role_ids", []),
             blacklist_role_id=data.get("blacklist_role_id"),
             min_messages=data.get("min_messages", 0),
             message_count_channel_id=data.get("message_count_channel_id"),
             message_cooldown_seconds=data.get("message_cooldown_seconds", 0),
             required_keywords=data.get("required_keywords", []),
+            keyword_whole_word=data.get("keyword_whole_word", False),
+            keyword_case_sensitive=data.get("keyword_case_sensitive", False),
             donor_id=data.get("donor_id"),
             image_url=data.get("image_url"),
-            participants={int(k): v for k in data.get("participants", {}).keys() for v in [data["participants"][k]]}, # Ensure correct type conversion
+            participants=LazyParticipantSet(data.get("participants")), # Binary blob or legacy dict, decoded on first use
             ended=data.get("ended", False),
             is_drop=data.get("is_drop", False), # Load new field with default
+            dm_results={int(k): v for k, v in data.get("dm_results", {}).items()},
         )
 
 # -------------------------------------------------------------------
 # User Statistics Data Class (New)
 # -------------------------------------------------------------------
-@dataclass
+@dataclass(slots=True) # No per-instance __dict__ (one instance per user per guild)
 class UserGiveawayStats:
     user_id: int
     guild_id: int
@@ -278,6 +863,7 @@ class UserGiveawayStats:
 
     def to_dict(self) -> dict:
         return {
+            "v": SCHEMA_VERSIONS["user_stats"],
             "user_id": self.user_id,
             "guild_id": self.guild_id,
             "hosted_count": self.hosted_count,
@@ -290,6 +876,7 @@ class UserGiveawayStats:
 
     @classmethod
     def from_dict(cls, data: dict) -> 'UserGiveawayStats':
+        data = upgrade_record("user_stats", data)
         hosted_last_timestamp = datetime.fromisoformat(data["hosted_last_timestamp"]) if data.get("hosted_last_timestamp") else None
         if hosted_last_timestamp and hosted_last_timestamp.tzinfo is None: hosted_last_timestamp = hosted_last_timestamp.replace(tzinfo=timezone.utc)
 
@@ -312,130 +899,2332 @@ class UserGiveawayStats:
 
 
 # -------------------------------------------------------------------
-# Storage Management Functions (Updated for per-guild and user stats)
+# Storage Management Functions (Updated for per-guild and user stats)
+# -------------------------------------------------------------------
+def get_guild_dir(guild_id: int) -> str:
+    """Gets the storage directory path for a specific guild."""
+    guild_dir = os.path.join(STORAGE_DIR, str(guild_id))
+    os.makedirs(guild_dir, exist_ok=True)
+    return guild_dir
+
+def get_guild_giveaways_file(guild_id: int, is_ended: bool = False) -> str:
+    """Gets the file path for active or ended giveaways for a guild."""
+    filename = ENDED_GIVEAWAYS_FILENAME if is_ended else ACTIVE_GIVEAWAYS_FILENAME
+    return os.path.join(get_guild_dir(guild_id), filename)
+
+def get_guild_settings_file(guild_id: int) -> str:
+     """Gets the file path for guild settings."""
+     return os.path.join(get_guild_dir(guild_id), GUILD_SETTINGS_FILENAME)
+
+def get_guild_user_stats_file(guild_id: int) -> str:
+    """Gets the file path for user stats for a guild."""
+    return os.path.join(get_guild_dir(guild_id), USER_STATS_FILENAME)
+
+# --- Atomic File Writes (New) ---
+class StorageCorruptError(Exception):
+    """Raised when a storage file is truncated or fails its checksum."""
+    pass
+
+def _fsync_directory(dir_path: str):
+    """Flushes a directory entry (the rename) to disk. Not supported on every platform."""
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# --- Storage Codecs (New) ---
+def json_dumps(data) -> str:
+    """Compact JSON text (orjson if installed). Used for journal lines, archive records and SQLite rows."""
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'))
+
+def json_loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+def _json_encode(data) -> bytes:
+    return orjson.dumps(data) if orjson is not None else json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def _msgpack_encode(data) -> bytes:
+    return msgpack.packb(data, use_bin_type=True)
+
+def _msgpack_decode(payload: bytes):
+    if msgpack is None:
+        raise StorageCorruptError("File was written with msgpack, which is not installed")
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+# Codec ID byte (stored in the file header): (name, encode, decode)
+STORAGE_CODECS: Dict[bytes, Tuple[str, Callable, Callable]] = {
+    b"J": ("json", _json_encode, json_loads),
+    b"M": ("msgpack", _msgpack_encode, _msgpack_decode),
+}
+_STORAGE_HEADER = struct.Struct("<4scI") # magic, codec ID, CRC32 of the payload
+
+def resolve_storage_codec(name: str = STORAGE_CODEC) -> bytes:
+    """Maps a STORAGE_CODEC setting to the codec ID used for new writes."""
+    if name in ("auto", "msgpack") and msgpack is not None:
+        return b"M"
+    if name == "msgpack":
+        logger.warning("STORAGE_CODEC is 'msgpack' but msgpack is not installed. Writing compact JSON instead.")
+    elif name not in ("auto", "json"):
+        logger.warning(f"Unknown STORAGE_CODEC '{name}'. Writing compact JSON instead.")
+    return b"J"
+
+storage_codec_id = resolve_storage_codec()
+
+def encode_storage_payload(data, codec_id: Optional[bytes] = None) -> bytes:
+    """Header (magic, codec ID, CRC32) followed by the encoded data."""
+    codec_id = codec_id or storage_codec_id
+    payload = STORAGE_CODECS[codec_id][1](data)
+    return _STORAGE_HEADER.pack(STORAGE_FILE_MAGIC, codec_id, zlib.crc32(payload)) + payload
+
+def decode_storage_payload(raw: bytes, source: str = "storage file"):
+    """
+    Decodes a file written by encode_storage_payload, or a legacy (pretty-printed) JSON file,
+    with or without its CRC trailer. The format is detected from the first bytes.
+    """
+    if raw.startswith(STORAGE_FILE_MAGIC):
+        if len(raw) < _STORAGE_HEADER.size:
+            raise StorageCorruptError(f"Truncated header in {source}")
+        _magic, codec_id, crc = _STORAGE_HEADER.unpack_from(raw)
+        payload = raw[_STORAGE_HEADER.size:]
+        if zlib.crc32(payload) != crc:
+            raise StorageCorruptError(f"Checksum mismatch in {source}")
+        codec = STORAGE_CODECS.get(codec_id)
+        if codec is None:
+            raise StorageCorruptError(f"Unknown codec {codec_id!r} in {source}")
+        try:
+            return codec[2](payload)
+        except StorageCorruptError:
+            raise
+        except Exception as e: # Decoder errors differ per codec
+            raise StorageCorruptError(f"Unreadable {codec[0]} data in {source}: {e}") from e
+
+    # Legacy text JSON, optionally followed by a "#crc32=" trailer line
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise StorageCorruptError(f"Unreadable {source}: {e}") from e
+    body, sep, trailer = text.rstrip("\n").rpartition("\n" + STORAGE_CHECKSUM_PREFIX)
+    if sep:
+        if trailer != f"{zlib.crc32(body.encode('utf-8')):08x}":
+            raise StorageCorruptError(f"Checksum mismatch in {source}")
+        text = body
+    try:
+        return json_loads(text)
+    except ValueError as e: # json.JSONDecodeError and orjson.JSONDecodeError
+        raise StorageCorruptError(f"Unreadable JSON in {source}: {e}") from e
+
+def write_storage_file(file_path: str, data, policy: str = STORAGE_FSYNC_POLICY):
+    """
+    Writes data in the configured codec to a temp file, then renames it over file_path.
+    The previous file is kept as <file>.bak so a bad current copy can still be recovered.
+    Readers therefore always see either the old or the new complete file, never a partial one.
+    """
+    payload = encode_storage_payload(data)
+    tmp_path = file_path + STORAGE_TEMP_SUFFIX
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        if policy != "none":
+            f.flush()
+            os.fsync(f.fileno())
+    if os.path.exists(file_path):
+        os.replace(file_path, file_path + STORAGE_BACKUP_SUFFIX)
+    os.replace(tmp_path, file_path)
+    if policy == "dir":
+        _fsync_directory(os.path.dirname(file_path) or ".")
+
+def read_storage_file(file_path: str, default=None):
+    """
+    Reads a file written by write_storage_file (or an older JSON file).
+    Falls back to the .bak copy if the current file is missing or corrupt (torn write, bad sector).
+    Returns default if neither copy exists or both are unreadable.
+    """
+    return read_storage_file_with_source(file_path, default)[0]
+
+def read_storage_file_with_source(file_path: str, default=None) -> Tuple[object, Optional[str]]:
+    """Like read_storage_file, but also returns the path actually read (the .bak copy after a fallback; None if neither)."""
+    for path in (file_path, file_path + STORAGE_BACKUP_SUFFIX):
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'rb') as f:
+                data = decode_storage_payload(f.read(), path)
+        except StorageCorruptError as e:
+            logger.error(f"{e}. Trying previous copy.")
+            continue
+        if path != file_path:
+            logger.warning(f"Recovered {file_path} from backup copy {path}.")
+        return data, path
+    return default, None
+
+def cleanup_storage_temp_files() -> int:
+    """Removes temp files left behind by writes interrupted before their rename. Returns the number removed."""
+    removed = 0
+    if not os.path.exists(STORAGE_DIR):
+        return removed
+    for root, _dirs, files in os.walk(STORAGE_DIR):
+        for name in files:
+            if name.endswith(STORAGE_TEMP_SUFFIX):
+                try:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove leftover temp file {name}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} leftover temp file(s) from interrupted writes.")
+    return removed
+
+# --- Active Giveaway Journal (New) ---
+# One JSON object per line, followed by a space and its CRC32 (hex):
+#   {"op": "join", "m": message_id, "u": user_id, "e": entries}
+#   {"op": "leave", "m": message_id, "u": user_id}
+#   {"op": "end", "m": message_id}
+# The ended (reroll cache) journal uses the same format:
+#   {"op": "add", "g": giveaway_dict}
+#   {"op": "evict", "m": message_id}
+#   {"op": "dm", "m": message_id, "r": {user_id: dm_status}}
+def get_guild_journal_file(guild_id: int, is_ended: bool = False) -> str:
+    """Gets the file path for the active (or ended) giveaway journal of a guild."""
+    return os.path.join(get_guild_dir(guild_id), ENDED_JOURNAL_FILENAME if is_ended else ACTIVE_JOURNAL_FILENAME)
+
+def append_giveaway_journal_event(guild_id: int, event: dict, is_ended: bool = False):
+    """Appends a single event to the guild's journal."""
+    try:
+        line = json_dumps(event)
+        with open(get_guild_journal_file(guild_id, is_ended), 'a', encoding='utf-8') as f:
+            f.write(f"{line} {zlib.crc32(line.encode('utf-8')):08x}\n")
+            if STORAGE_FSYNC_POLICY != "none":
+                f.flush()
+                os.fsync(f.fileno())
+    except Exception as e:
+        logger.error(f"Failed to append journal event for guild {guild_id}: {e}", exc_info=True)
+
+def load_giveaway_journal(guild_id: int, is_ended: bool = False, previous: bool = False) -> List[dict]:
+    """
+    Reads the guild's journal (or, with previous=True, the segment before the last compaction).
+    A torn or corrupt line (crash mid-append) ends the replay.
+    """
+    events = []
+    file_path = get_guild_journal_file(guild_id, is_ended) + (JOURNAL_PREVIOUS_SUFFIX if previous else "")
+    if not os.path.exists(file_path):
+        return events
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                body, _, crc = line.rpartition(" ")
+                try:
+                    if body: # Lines written before checksums were added have no CRC suffix
+                        if crc != f"{zlib.crc32(body.encode('utf-8')):08x}":
+                            raise ValueError("checksum mismatch")
+                        line = body
+                    events.append(json_loads(line))
+                except ValueError: # Also covers json.JSONDecodeError
+                    logger.warning(f"Ignoring unreadable journal line {line_no} for guild {guild_id} (torn write?).")
+                    break # Anything after a torn line is not trustworthy
+    except Exception as e:
+        logger.error(f"Failed to read journal for guild {guild_id}: {e}", exc_info=True)
+    return events
+
+def apply_giveaway_journal(giveaways: Dict[int, GiveawayData], events: List[dict]) -> int:
+    """Applies journal events to loaded giveaways in order. Events are idempotent. Returns the number applied."""
+    applied = 0
+    for event in events:
+        op = event.get("op")
+        if op == "add":
+            giveaway = GiveawayData.from_dict(event["g"])
+            giveaways[giveaway.message_id] = giveaway
+            applied += 1
+            continue
+        giveaway = giveaways.get(event.get("m"))
+        if not giveaway:
+            continue # Giveaway not in snapshot (already ended and compacted)
+        if op == "join":
+            giveaway.participants[event["u"]] = event["e"]
+        elif op == "leave":
+            giveaway.participants.pop(event["u"], None)
+        elif op in ("end", "evict"):
+            giveaways.pop(event["m"], None)
+        elif op == "dm":
+            giveaway.dm_results.update({int(user_id): status for user_id, status in event["r"].items()})
+        else:
+            logger.warning(f"Unknown journal op '{op}' for giveaway message {event.get('m')}.")
+            continue
+        applied += 1
+    return applied
+
+def giveaway_journal_has_events(guild_id: int, is_ended: bool = False) -> bool:
+    file_path = get_guild_journal_file(guild_id, is_ended)
+    return os.path.exists(file_path) and os.path.getsize(file_path) > 0
+
+def rotate_giveaway_journal(guild_id: int, is_ended: bool = False):
+    """
+    Starts an empty journal once its events are contained in a new snapshot.
+    The old journal is kept as the .prev segment (replacing the one before it): it holds exactly the
+    events between the .bak snapshot and the new one, so a fallback to .bak can replay them.
+    """
+    file_path = get_guild_journal_file(guild_id, is_ended)
+    previous_path = file_path + JOURNAL_PREVIOUS_SUFFIX
+    if os.path.exists(file_path):
+        os.replace(file_path, previous_path)
+    elif os.path.exists(previous_path):
+        os.remove(previous_path) # No events since the .bak snapshot
+
+
+# -------------------------------------------------------------------
+# Ended Giveaway Archive (New) - compressed, append-only history for rerolls
+# -------------------------------------------------------------------
+@dataclass
+class ArchiveIndex:
+    """In-memory copy of one guild's archive index."""
+    by_giveaway_id: Dict[int, int] = field(default_factory=dict) # giveaway_id: message_id
+    locations: Dict[int, Tuple[int, int, int]] = field(default_factory=dict) # message_id: (segment, offset, length)
+    segment: int = 1 # Segment new records are appended to
+    valid_size: Optional[int] = None # Set if index.log ends in a partial line: size to truncate to before the next append
+    dm_results: Dict[int, Dict[int, str]] = field(default_factory=dict) # message_id: { user_id: dm_status } from dm_results.log
+
+
+class GiveawayArchive:
+    """
+    Append-only archive of every ended giveaway, per guild under storage/<guild_id>/archive/:
+      segment-NNNNNN.gz - each record is its own gzip member (so a segment is still one valid gzip file)
+      index.log         - one line per record pointing at its segment and byte range
+      dm_results.log    - winner DM results recorded after archiving, applied over the records when read
+    Only the index is kept in memory (loaded on first use of a guild); a record is read and
+    decompressed when it is looked up, so old giveaways can be rerolled without being cached.
+    """
+    def __init__(self):
+        self._lock = threading.Lock() # Appends and index loads may run on different I/O threads
+        self._indexes: Dict[int, ArchiveIndex] = {} # guild_id: ArchiveIndex
+
+    @staticmethod
+    def _archive_dir(guild_id: int) -> str:
+        archive_dir = os.path.join(get_guild_dir(guild_id), ARCHIVE_DIRNAME)
+        os.makedirs(archive_dir, exist_ok=True)
+        return archive_dir
+
+    @staticmethod
+    def _segment_file(archive_dir: str, segment: int) -> str:
+        return os.path.join(archive_dir, f"segment-{segment:06d}.gz")
+
+    @staticmethod
+    def _append_bytes(file_path: str, data: bytes) -> int:
+        """Appends data to a file and returns the offset it was written at."""
+        with open(file_path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+            if STORAGE_FSYNC_POLICY != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        return offset
+
+    def _load_index(self, guild_id: int) -> ArchiveIndex:
+        """Returns the guild's index, reading index.log on first use. Caller holds the lock."""
+        index = self._indexes.get(guild_id)
+        if index is not None:
+            return index
+        index = ArchiveIndex()
+        file_path = os.path.join(self._archive_dir(guild_id), ARCHIVE_INDEX_FILENAME)
+        if os.path.exists(file_path):
+            try:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+                complete = data.rfind(b"\n") + 1
+                if complete < len(data): # Crash mid-append
+                    logger.warning(f"Archive index for guild {guild_id} ends in a partial line. It will be dropped on the next append.")
+                    index.valid_size = complete
+                for line_no, line in enumerate(data[:complete].splitlines(), start=1):
+                    try:
+                        giveaway_id, message_id, segment, offset, length = map(int, line.split())
+                    except ValueError:
+                        logger.warning(f"Ignoring unreadable archive index line {line_no} for guild {guild_id}.")
+                        continue
+                    if giveaway_id:
+                        index.by_giveaway_id[giveaway_id] = message_id
+                    index.locations[message_id] = (segment, offset, length)
+                    index.segment = max(index.segment, segment)
+            except Exception as e:
+                logger.error(f"Failed to read archive index for guild {guild_id}: {e}", exc_info=True)
+        results_path = os.path.join(self._archive_dir(guild_id), ARCHIVE_DM_RESULTS_FILENAME)
+        if os.path.exists(results_path):
+            try:
+                with open(results_path, 'r', encoding='utf-8') as f:
+                    for line_no, line in enumerate(f, start=1):
+                        try:
+                            entry = json_loads(line)
+                            index.dm_results.setdefault(entry["m"], {}).update({int(k): v for k, v in entry["r"].items()})
+                        except (ValueError, KeyError, AttributeError):
+                            logger.warning(f"Ignoring unreadable archive DM results line {line_no} for guild {guild_id}.")
+            except Exception as e:
+                logger.error(f"Failed to read archive DM results for guild {guild_id}: {e}", exc_info=True)
+        self._indexes[guild_id] = index
+        return index
+
+    def contains(self, guild_id: int, message_id: int) -> bool:
+        with self._lock:
+            return message_id in self._load_index(guild_id).locations
+
+    def append(self, giveaway: GiveawayData):
+        """Compresses one ended giveaway onto the current segment, then records it in the index."""
+        record = gzip.compress(json_dumps(giveaway.to_dict()).encode('utf-8'))
+        guild_id = giveaway.guild_id
+        try:
+            with self._lock:
+                index = self._load_index(guild_id)
+                archive_dir = self._archive_dir(guild_id)
+                segment_file = self._segment_file(archive_dir, index.segment)
+                if os.path.exists(segment_file) and os.path.getsize(segment_file) >= ARCHIVE_SEGMENT_MAX_BYTES:
+                    index.segment += 1
+                    segment_file = self._segment_file(archive_dir, index.segment)
+                # Record first, index line second: a crash in between only leaves unreferenced bytes
+                offset = self._append_bytes(segment_file, record)
+                index_file = os.path.join(archive_dir, ARCHIVE_INDEX_FILENAME)
+                if index.valid_size is not None:
+                    os.truncate(index_file, index.valid_size)
+                    index.valid_size = None
+                index_line = f"{giveaway.giveaway_id} {giveaway.message_id} {index.segment} {offset} {len(record)}\n"
+                self._append_bytes(index_file, index_line.encode('utf-8'))
+                if giveaway.giveaway_id:
+                    index.by_giveaway_id[giveaway.giveaway_id] = giveaway.message_id
+                index.locations[giveaway.message_id] = (index.segment, offset, len(record))
+            logger.debug(f"Archived giveaway {giveaway.giveaway_id}/{giveaway.message_id} for guild {guild_id} ({len(record)} bytes).")
+        except Exception as e:
+            logger.error(f"Failed to archive giveaway {giveaway.message_id} for guild {guild_id}: {e}", exc_info=True)
+
+    def record_dm_results(self, guild_id: int, message_id: int, results: Dict[str, str]):
+        """Appends a giveaway's DM results (a few bytes) instead of archiving the whole record again."""
+        try:
+            with self._lock:
+                index = self._load_index(guild_id)
+                line = json_dumps({"m": message_id, "r": results}) + "\n"
+                self._append_bytes(os.path.join(self._archive_dir(guild_id), ARCHIVE_DM_RESULTS_FILENAME), line.encode('utf-8'))
+                index.dm_results.setdefault(message_id, {}).update({int(k): v for k, v in results.items()})
+        except Exception as e:
+            logger.error(f"Failed to archive DM results of giveaway {message_id} for guild {guild_id}: {e}", exc_info=True)
+
+    def _with_dm_results(self, guild_id: int, giveaway: Optional[GiveawayData]) -> Optional[GiveawayData]:
+        if giveaway is not None:
+            with self._lock:
+                results = self._load_index(guild_id).dm_results.get(giveaway.message_id)
+            if results:
+                giveaway.dm_results.update(results)
+        return giveaway
+
+    def _read(self, guild_id: int, location: Tuple[int, int, int]) -> Optional[GiveawayData]:
+        segment, offset, length = location
+        try:
+            with open(self._segment_file(self._archive_dir(guild_id), segment), 'rb') as f:
+                f.seek(offset)
+                data = f.read(length)
+            return GiveawayData.from_dict(json_loads(gzip.decompress(data)))
+        except (OSError, EOFError, zlib.error, ValueError, KeyError) as e: # BadGzipFile is an OSError
+            logger.error(f"Failed to read archived giveaway at segment {segment} offset {offset} for guild {guild_id}: {e}")
+            return None
+
+    def find(self, guild_id: int, giveaway_id: Optional[int] = None, message_id: Optional[int] = None) -> Optional[GiveawayData]:
+        """Pages in one archived giveaway by sequential ID or message ID."""
+        with self._lock:
+            index = self._load_index(guild_id)
+            if message_id is None:
+                message_id = index.by_giveaway_id.get(giveaway_id)
+            location = index.locations.get(message_id)
+        if location is None:
+            return None
+        return self._with_dm_results(guild_id, self._read(guild_id, location))
+
+    def iter_guild(self, guild_id: int):
+        """Yields every archived giveaway of a guild (used for migrations)."""
+        with self._lock:
+            locations = list(self._load_index(guild_id).locations.values())
+        for location in sorted(locations):
+            giveaway = self._with_dm_results(guild_id, self._read(guild_id, location))
+            if giveaway is not None:
+                yield giveaway
+
+
+# -------------------------------------------------------------------
+# Storage Backends (New) - JSON files or SQLite, selected by STORAGE_BACKEND
+# -------------------------------------------------------------------
+class StorageBackend(ABC):
+    """
+    Interface for persisting settings, giveaways and user stats.
+    The module-level load_*/save_* functions dispatch to the configured backend.
+    """
+    name = "base"
+    # True if participant changes are only durable once the next snapshot is written (or compacted)
+    participant_changes_need_snapshot = True
+
+    @abstractmethod
+    def list_guild_ids(self) -> List[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_guild_settings(self, guild_id: int) -> GuildSettings:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_guild_settings(self, settings: GuildSettings):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_giveaways(self, guild_id: int, is_ended: bool = False) -> Dict[int, GiveawayData]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_giveaways(self, giveaways: Dict[int, GiveawayData], guild_id: int, is_ended: bool = False):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_user_stats(self, guild_id: int) -> Dict[int, UserGiveawayStats]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_user_stats(self, stats: Dict[int, UserGiveawayStats], guild_id: int, changed_user_ids: Optional[Set[int]] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def record_join(self, giveaway: GiveawayData, user_id: int, entries: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def record_leave(self, giveaway: GiveawayData, user_id: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def record_end(self, giveaway: GiveawayData, cancelled: bool = False):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_ended_giveaway(self, giveaway: GiveawayData):
+        """Adds one ended giveaway to the stored reroll cache without rewriting the rest of it."""
+        raise NotImplementedError
+
+    def update_dm_results(self, giveaway: GiveawayData, in_reroll_cache: bool = True):
+        """Stores an ended giveaway's winner DM results (SQLite: rewrites the giveaway row; participants are untouched)."""
+        self.add_ended_giveaway(giveaway)
+
+    @abstractmethod
+    def remove_ended_giveaways(self, guild_id: int, message_ids: List[int]):
+        """Drops giveaways evicted from the in-memory reroll cache."""
+        raise NotImplementedError
+
+    def archive_ended_giveaways(self, guild_id: int, giveaways: List[GiveawayData]):
+        """Makes sure ended giveaways are part of the long-term history (no-op if the backend keeps ended records)."""
+        pass
+
+    def find_giveaway(self, guild_id: int, giveaway_id: int) -> Optional[GiveawayData]:
+        """Looks up a stored giveaway (active or ended) by its sequential ID."""
+        return None
+
+    def has_uncompacted_changes(self, guild_id: int, is_ended: bool = False) -> bool:
+        """True if the snapshot should be rewritten after loading (e.g. a journal tail was replayed)."""
+        return False
+
+    def recover(self):
+        """Called once on startup before loading, to clean up after an unclean shutdown."""
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonStorageBackend(StorageBackend):
+    """Per-guild JSON files under storage/<guild_id>/ plus append-only journals for joins/leaves and the reroll cache."""
+    name = "json"
+    participant_changes_need_snapshot = True
+
+    def __init__(self):
+        self._ended_journal_events: Dict[int, int] = {} # guild_id: ended journal events since the last ended snapshot
+        self.archive = GiveawayArchive() # Every ended giveaway, for rerolls beyond the reroll cache
+
+    def list_guild_ids(self) -> List[int]:
+        guild_ids = []
+        if not os.path.exists(STORAGE_DIR):
+            return guild_ids
+        for item in os.listdir(STORAGE_DIR):
+            if not os.path.isdir(os.path.join(STORAGE_DIR, item)):
+                continue
+            try:
+                guild_ids.append(int(item))
+            except ValueError:
+                logger.warning(f"Invalid directory name in storage: {item}. Skipping.")
+        return guild_ids
+
+    def save_guild_settings(self, settings: GuildSettings):
+        """Saves guild settings to its file."""
+        try:
+            file_path = get_guild_settings_file(settings.guild_id)
+            write_storage_file(file_path, settings.to_dict())
+            logger.debug(f"Saved settings for guild {settings.guild_id}")
+        except Exception as e:
+            logger.error(f"Failed to save settings for guild {settings.guild_id}: {e}", exc_info=True)
+
+    def load_guild_settings(self, guild_id: int) -> GuildSettings:
+        """Loads guild settings from its file, or returns default if not found."""
+        file_path = get_guild_settings_file(guild_id)
+        try:
+            data = read_storage_file(file_path)
+            if data is None:
+                logger.info(f"No readable settings file found for guild {guild_id}. Returning default.")
+                return GuildSettings(guild_id=guild_id) # Return default settings
+            settings = GuildSettings.from_dict(data)
+            logger.debug(f"Loaded settings for guild {guild_id}")
+            return settings
+        except Exception as e:
+            logger.error(f"Failed to load settings for guild {guild_id}: {e}", exc_info=True)
+            return GuildSettings(guild_id=guild_id)
+
+    def save_giveaways(self, giveaways: Dict[int, GiveawayData], guild_id: int, is_ended: bool = False):
+        """
+        Saves active or ended giveaways for a specific guild.
+        Saving a snapshot also compacts the matching journal, since every
+        journaled event is now contained in the snapshot.
+        """
+        try:
+            file_path = get_guild_giveaways_file(guild_id, is_ended)
+            # Filter out ended giveaways if saving active ones, or vice-versa
+            filtered_giveaways = {
+                str(msg_id): gw.to_dict() for msg_id, gw in giveaways.items()
+                if gw.ended == is_ended # Only save if ended status matches
+            }
+            write_storage_file(file_path, filtered_giveaways)
+            rotate_giveaway_journal(guild_id, is_ended) # Only after the snapshot is in place
+            if is_ended:
+                self._ended_journal_events[guild_id] = 0
+            logger.debug(f"Saved {len(filtered_giveaways)} {'ended' if is_ended else 'active'} giveaways for guild {guild_id}")
+        except Exception as e:
+            logger.error(f"Failed to save giveaways for guild {guild_id}: {e}", exc_info=True)
+
+    def load_giveaways(self, guild_id: int, is_ended: bool = False) -> Dict[int, GiveawayData]:
+        """Loads active or ended giveaways for a specific guild."""
+        giveaways = {}
+        file_path = get_guild_giveaways_file(guild_id, is_ended)
+        source = file_path
+        try:
+            giveaway_dicts, source = read_storage_file_with_source(file_path, default={})
+            for msg_id_str, gw_dict in giveaway_dicts.items():
+                try:
+                    msg_id = int(msg_id_str)
+                    giveaways[msg_id] = GiveawayData.from_dict(gw_dict)
+                except Exception as e:
+                    logger.error(f"Failed to load individual giveaway {msg_id_str} for guild {guild_id}: {e}")
+            logger.debug(f"Loaded {len(giveaways)} {'ended' if is_ended else 'active'} giveaways from {file_path}")
+        except Exception as e:
+            logger.error(f"Failed to load giveaways for guild {guild_id}: {e}", exc_info=True)
+
+        # Replay events written after the last snapshot
+        events = load_giveaway_journal(guild_id, is_ended)
+        if is_ended:
+            self._ended_journal_events[guild_id] = len(events)
+        if source is not None and source != file_path:
+            # Fell back to the .bak snapshot: the events folded into the lost snapshot are in the previous segment
+            kind = 'ended' if is_ended else 'active'
+            previous_path = get_guild_journal_file(guild_id, is_ended) + JOURNAL_PREVIOUS_SUFFIX
+            if os.path.exists(previous_path):
+                events = load_giveaway_journal(guild_id, is_ended, previous=True) + events
+                logger.warning(f"Rebuilt {kind} giveaways for guild {guild_id} from the backup snapshot and the previous journal segment.")
+            else:
+                logger.error(f"Loaded {kind} giveaways for guild {guild_id} from the backup snapshot without a previous journal segment; changes made between the two snapshots may have been lost.")
+        applied = apply_giveaway_journal(giveaways, events)
+        if applied:
+            logger.info(f"Replayed {applied} {'ended' if is_ended else 'active'} journal event(s) for guild {guild_id}.")
+        return giveaways
+
+    def load_user_stats(self, guild_id: int) -> Dict[int, UserGiveawayStats]:
+        """Loads user stats for a guild."""
+        stats = {}
+        file_path = get_guild_user_stats_file(guild_id)
+        try:
+            stats_dict = read_storage_file(file_path, default={})
+            for user_id_str, user_stats_dict in stats_dict.items():
+                try:
+                    user_id = int(user_id_str)
+                    stats[user_id] = UserGiveawayStats.from_dict(user_stats_dict)
+                except Exception as e:
+                    logger.error(f"Failed to load individual user stats {user_id_str} for guild {guild_id}: {e}")
+            logger.debug(f"Loaded {len(stats)} user stats from {file_path} for guild {guild_id}")
+        except Exception as e:
+            logger.error(f"Failed to load user stats for guild {guild_id}: {e}", exc_info=True)
+        return stats
+
+    def save_user_stats(self, stats: Dict[int, UserGiveawayStats], guild_id: int, changed_user_ids: Optional[Set[int]] = None):
+        """Saves user stats for a guild. The JSON file is always rewritten whole."""
+        try:
+            file_path = get_guild_user_stats_file(guild_id)
+            stats_to_save = {str(user_id): user_stats.to_dict() for user_id, user_stats in stats.items()}
+            write_storage_file(file_path, stats_to_save)
+            logger.debug(f"Saved {len(stats)} user stats for guild {guild_id}")
+        except Exception as e:
+            logger.error(f"Failed to save user stats for guild {guild_id}: {e}", exc_info=True)
+
+    def record_join(self, giveaway: GiveawayData, user_id: int, entries: int):
+        append_giveaway_journal_event(giveaway.guild_id, {"op": "join", "m": giveaway.message_id, "u": user_id, "e": entries})
+
+    def record_leave(self, giveaway: GiveawayData, user_id: int):
+        append_giveaway_journal_event(giveaway.guild_id, {"op": "leave", "m": giveaway.message_id, "u": user_id})
+
+    def record_end(self, giveaway: GiveawayData, cancelled: bool = False):
+        append_giveaway_journal_event(giveaway.guild_id, {"op": "end", "m": giveaway.message_id})
+
+    def add_ended_giveaway(self, giveaway: GiveawayData):
+        self.archive.append(giveaway)
+        append_giveaway_journal_event(giveaway.guild_id, {"op": "add", "g": giveaway.to_dict()}, is_ended=True)
+        self._count_ended_journal_events(giveaway.guild_id, 1)
+
+    def update_dm_results(self, giveaway: GiveawayData, in_reroll_cache: bool = True):
+        # Only the results are written, never the whole record with its participants
+        results = {str(user_id): status for user_id, status in giveaway.dm_results.items()}
+        self.archive.record_dm_results(giveaway.guild_id, giveaway.message_id, results)
+        if in_reroll_cache:
+            append_giveaway_journal_event(giveaway.guild_id, {"op": "dm", "m": giveaway.message_id, "r": results}, is_ended=True)
+            self._count_ended_journal_events(giveaway.guild_id, 1)
+
+    def archive_ended_giveaways(self, guild_id: int, giveaways: List[GiveawayData]):
+        for giveaway in giveaways: # Reroll cache entries stored before the archive existed
+            if not self.archive.contains(guild_id, giveaway.message_id):
+                self.archive.append(giveaway)
+
+    def remove_ended_giveaways(self, guild_id: int, message_ids: List[int]):
+        for msg_id in message_ids:
+            append_giveaway_journal_event(guild_id, {"op": "evict", "m": msg_id}, is_ended=True)
+        self._count_ended_journal_events(guild_id, len(message_ids))
+
+    def _count_ended_journal_events(self, guild_id: int, added: int):
+        """Folds the ended journal into a fresh snapshot once it holds ENDED_JOURNAL_COMPACT_EVENTS events."""
+        if guild_id not in self._ended_journal_events: # Not loaded since startup: count the existing tail once
+            self._ended_journal_events[guild_id] = len(load_giveaway_journal(guild_id, is_ended=True))
+        else:
+            self._ended_journal_events[guild_id] += added
+        if self._ended_journal_events[guild_id] >= ENDED_JOURNAL_COMPACT_EVENTS:
+            self.save_giveaways(self.load_giveaways(guild_id, is_ended=True), guild_id, is_ended=True)
+
+    def find_giveaway(self, guild_id: int, giveaway_id: int) -> Optional[GiveawayData]:
+        archived = self.archive.find(guild_id, giveaway_id=giveaway_id) # Indexed, reads a single record
+        if archived is not None:
+            return archived
+        for is_ended in (False, True):
+            for giveaway in self.load_giveaways(guild_id, is_ended=is_ended).values():
+                if giveaway.giveaway_id == giveaway_id:
+                    return giveaway
+        return None
+
+    def has_uncompacted_changes(self, guild_id: int, is_ended: bool = False) -> bool:
+        return giveaway_journal_has_events(guild_id, is_ended)
+
+    def recover(self):
+        cleanup_storage_temp_files()
+
+
+class SqliteStorageBackend(StorageBackend):
+    """
+    Single SQLite database (WAL mode). Participants are rows keyed by (message_id, user_id),
+    so joins/leaves are single-row writes and sequential ID lookups use an index.
+    """
+    name = "sqlite"
+    participant_changes_need_snapshot = False
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS giveaways (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            giveaway_id INTEGER NOT NULL,
+            ended INTEGER NOT NULL DEFAULT 0,
+            end_time TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_giveaways_guild_ended ON giveaways (guild_id, ended, end_time);
+        CREATE INDEX IF NOT EXISTS idx_giveaways_guild_seq ON giveaways (guild_id, giveaway_id);
+        CREATE TABLE IF NOT EXISTS participants (
+            message_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            entries INTEGER NOT NULL,
+            PRIMARY KEY (message_id, user_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS user_stats (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            hosted_count INTEGER NOT NULL DEFAULT 0,
+            hosted_last_timestamp TEXT,
+            donated_count INTEGER NOT NULL DEFAULT 0,
+            donated_last_timestamp TEXT,
+            won_count INTEGER NOT NULL DEFAULT 0,
+            won_last_timestamp TEXT,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock() # One connection shared across threads
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Map the file fsync policy onto SQLite's own durability setting
+        synchronous = {"none": "OFF", "file": "NORMAL", "dir": "FULL"}.get(STORAGE_FSYNC_POLICY, "NORMAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    # --- Row helpers ---
+    @staticmethod
+    def _giveaway_row(giveaway: GiveawayData) -> tuple:
+        data = giveaway.to_dict()
+        data.pop("participants", None) # Participants live in their own table
+        return (giveaway.message_id, giveaway.guild_id, giveaway.giveaway_id, int(giveaway.ended), giveaway.end_time.isoformat(), json_dumps(data))
+
+    def _giveaways_from_rows(self, rows) -> Dict[int, GiveawayData]:
+        giveaways = {}
+        for message_id, data in rows:
+            try:
+                gw_dict = json_loads(data)
+                gw_dict["participants"] = {}
+                giveaways[message_id] = GiveawayData.from_dict(gw_dict)
+            except Exception as e:
+                logger.error(f"Failed to load giveaway row {message_id} from SQLite: {e}")
+        if giveaways:
+            placeholders = ",".join("?" * len(giveaways))
+            participants: Dict[int, Dict[int, int]] = {message_id: {} for message_id in giveaways}
+            for message_id, user_id, entries in self._conn.execute(
+                f"SELECT message_id, user_id, entries FROM participants WHERE message_id IN ({placeholders})",
+                tuple(giveaways.keys())
+            ):
+                participants[message_id][user_id] = entries
+            for message_id, rows in participants.items(): # Built once per giveaway (sorted arrays)
+                giveaways[message_id].participants = ParticipantSet(rows)
+        return giveaways
+
+    def _replace_participants(self, giveaway: GiveawayData):
+        self._conn.execute("DELETE FROM participants WHERE message_id = ?", (giveaway.message_id,))
+        self._conn.executemany(
+            "INSERT INTO participants (message_id, user_id, entries) VALUES (?, ?, ?)",
+            [(giveaway.message_id, user_id, entries) for user_id, entries in giveaway.participants.items()]
+        )
+
+    # --- Interface ---
+    def list_guild_ids(self) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT guild_id FROM guild_settings UNION SELECT guild_id FROM giveaways UNION SELECT guild_id FROM user_stats"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def load_guild_settings(self, guild_id: int) -> GuildSettings:
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT data FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchone()
+            if not row:
+                logger.info(f"No settings row found for guild {guild_id}. Returning default.")
+                return GuildSettings(guild_id=guild_id)
+            return GuildSettings.from_dict(json_loads(row[0]))
+        except Exception as e:
+            logger.error(f"Failed to load settings for guild {guild_id} from SQLite: {e}", exc_info=True)
+            return GuildSettings(guild_id=guild_id)
+
+    def save_guild_settings(self, settings: GuildSettings):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO guild_settings (guild_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data",
+                    (settings.guild_id, json_dumps(settings.to_dict()))
+                )
+        except Exception as e:
+            logger.error(f"Failed to save settings for guild {settings.guild_id} to SQLite: {e}", exc_info=True)
+
+    def load_giveaways(self, guild_id: int, is_ended: bool = False) -> Dict[int, GiveawayData]:
+        try:
+            with self._lock:
+                if is_ended:
+                    # Full history is kept; only the most recent ones form the reroll cache (trimmed further per guild on load)
+                    rows = self._conn.execute(
+                        "SELECT message_id, data FROM giveaways WHERE guild_id = ? AND ended = 1 ORDER BY end_time DESC LIMIT ?",
+                        (guild_id, MAX_ENDED_GIVEAWAYS_LIMIT)
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        "SELECT message_id, data FROM giveaways WHERE guild_id = ? AND ended = 0", (guild_id,)
+                    ).fetchall()
+                return self._giveaways_from_rows(rows)
+        except Exception as e:
+            logger.error(f"Failed to load giveaways for guild {guild_id} from SQLite: {e}", exc_info=True)
+            return {}
+
+    def save_giveaways(self, giveaways: Dict[int, GiveawayData], guild_id: int, is_ended: bool = False):
+        """
+        Upserts giveaway rows. Participants are only written for rows that did not exist yet,
+        since existing rows are kept current by record_join/record_leave.
+        Active rows missing from `giveaways` are removed (same as the JSON snapshot semantics);
+        ended rows are kept as history.
+        """
+        try:
+            filtered = [gw for gw in giveaways.values() if gw.ended == is_ended]
+            with self._lock, self._conn:
+                existing = set() # Only the rows being saved, not the guild's whole ended history
+                message_ids = [gw.message_id for gw in filtered]
+                for start in range(0, len(message_ids), SQLITE_IN_CHUNK):
+                    chunk = message_ids[start:start + SQLITE_IN_CHUNK]
+                    existing.update(row[0] for row in self._conn.execute(
+                        f"SELECT message_id FROM giveaways WHERE message_id IN ({','.join('?' * len(chunk))})", chunk
+                    ))
+                self._conn.executemany(
+                    "INSERT INTO giveaways (message_id, guild_id, giveaway_id, ended, end_time, data) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(message_id) DO UPDATE SET guild_id = excluded.guild_id, giveaway_id = excluded.giveaway_id, "
+                    "ended = excluded.ended, end_time = excluded.end_time, data = excluded.data",
+                    [self._giveaway_row(gw) for gw in filtered]
+                )
+                for gw in filtered:
+                    if gw.message_id not in existing:
+                        self._replace_participants(gw)
+                if not is_ended:
+                    keep = {gw.message_id for gw in filtered}
+                    stale = [(msg_id,) for (msg_id,) in self._conn.execute(
+                        "SELECT message_id FROM giveaways WHERE guild_id = ? AND ended = 0", (guild_id,)
+                    ) if msg_id not in keep]
+                    self._conn.executemany("DELETE FROM participants WHERE message_id = ?", stale)
+                    self._conn.executemany("DELETE FROM giveaways WHERE message_id = ?", stale)
+            logger.debug(f"Saved {len(filtered)} {'ended' if is_ended else 'active'} giveaways for guild {guild_id} to SQLite")
+        except Exception as e:
+            logger.error(f"Failed to save giveaways for guild {guild_id} to SQLite: {e}", exc_info=True)
+
+    def load_user_stats(self, guild_id: int) -> Dict[int, UserGiveawayStats]:
+        stats = {}
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT user_id, hosted_count, hosted_last_timestamp, donated_count, donated_last_timestamp, won_count, won_last_timestamp "
+                    "FROM user_stats WHERE guild_id = ?", (guild_id,)
+                ).fetchall()
+            for user_id, hosted, hosted_ts, donated, donated_ts, won, won_ts in rows:
+                stats[user_id] = UserGiveawayStats.from_dict({
+                    "user_id": user_id, "guild_id": guild_id,
+                    "hosted_count": hosted, "hosted_last_timestamp": hosted_ts,
+                    "donated_count": donated, "donated_last_timestamp": donated_ts,
+                    "won_count": won, "won_last_timestamp": won_ts,
+                })
+        except Exception as e:
+            logger.error(f"Failed to load user stats for guild {guild_id} from SQLite: {e}", exc_info=True)
+        return stats
+
+    def save_user_stats(self, stats: Dict[int, UserGiveawayStats], guild_id: int, changed_user_ids: Optional[Set[int]] = None):
+        """Upserts one row per changed user (all users if changed_user_ids is None)."""
+        user_ids = stats.keys() if changed_user_ids is None else [uid for uid in changed_user_ids if uid in stats]
+        rows = []
+        for user_id in user_ids:
+            d = stats[user_id].to_dict()
+            rows.append((guild_id, user_id, d["hosted_count"], d["hosted_last_timestamp"], d["donated_count"], d["donated_last_timestamp"], d["won_count"], d["won_last_timestamp"]))
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO user_stats (guild_id, user_id, hosted_count, hosted_last_timestamp, donated_count, donated_last_timestamp, won_count, won_last_timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(guild_id, user_id) DO UPDATE SET "
+                    "hosted_count = excluded.hosted_count, hosted_last_timestamp = excluded.hosted_last_timestamp, "
+                    "donated_count = excluded.donated_count, donated_last_timestamp = excluded.donated_last_timestamp, "
+                    "won_count = excluded.won_count, won_last_timestamp = excluded.won_last_timestamp",
+                    rows
+                )
+        except Exception as e:
+            logger.error(f"Failed to save user stats for guild {guild_id} to SQLite: {e}", exc_info=True)
+
+    def record_join(self, giveaway: GiveawayData, user_id: int, entries: int):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO participants (message_id, user_id, entries) VALUES (?, ?, ?) "
+                    "ON CONFLICT(message_id, user_id) DO UPDATE SET entries = excluded.entries",
+                    (giveaway.message_id, user_id, entries)
+                )
+        except Exception as e:
+            logger.error(f"Failed to record join of {user_id} for giveaway {giveaway.message_id} in SQLite: {e}", exc_info=True)
+
+    def record_leave(self, giveaway: GiveawayData, user_id: int):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM participants WHERE message_id = ? AND user_id = ?", (giveaway.message_id, user_id))
+        except Exception as e:
+            logger.error(f"Failed to record leave of {user_id} for giveaway {giveaway.message_id} in SQLite: {e}", exc_info=True)
+
+    def record_end(self, giveaway: GiveawayData, cancelled: bool = False):
+        try:
+            with self._lock, self._conn:
+                if cancelled: # Cancelled giveaways are not kept for reroll
+                    self._conn.execute("DELETE FROM participants WHERE message_id = ?", (giveaway.message_id,))
+                    self._conn.execute("DELETE FROM giveaways WHERE message_id = ?", (giveaway.message_id,))
+                else:
+                    self._conn.execute("UPDATE giveaways SET ended = 1 WHERE message_id = ?", (giveaway.message_id,))
+        except Exception as e:
+            logger.error(f"Failed to record end of giveaway {giveaway.message_id} in SQLite: {e}", exc_info=True)
+
+    def add_ended_giveaway(self, giveaway: GiveawayData):
+        self.save_giveaways({giveaway.message_id: giveaway}, giveaway.guild_id, is_ended=True)
+
+    def remove_ended_giveaways(self, guild_id: int, message_ids: List[int]):
+        pass # Ended rows are kept as history; load_giveaways only reads the newest ones
+
+    def find_giveaway(self, guild_id: int, giveaway_id: int) -> Optional[GiveawayData]:
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT message_id, data FROM giveaways WHERE guild_id = ? AND giveaway_id = ? LIMIT 1", (guild_id, giveaway_id)
+                ).fetchall()
+                found = self._giveaways_from_rows(rows)
+            return next(iter(found.values()), None)
+        except Exception as e:
+            logger.error(f"Failed to look up giveaway {giveaway_id} for guild {guild_id} in SQLite: {e}", exc_info=True)
+            return None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_storage_to_sqlite(db_path: str) -> Dict[str, int]:
+    """
+    One-shot migration of the storage/<guild_id>/*.json tree into a SQLite database.
+    The database is built next to db_path and only moved into place once every guild is migrated,
+    so an interrupted run leaves no partial database and is simply redone on the next start.
+    Returns counts of migrated records.
+    """
+    temp_path = db_path + ".tmp"
+    for leftover in (temp_path, temp_path + "-wal", temp_path + "-shm"): # From an interrupted run
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    source = JsonStorageBackend()
+    target = SqliteStorageBackend(temp_path)
+    counts = {"guilds": 0, "giveaways": 0, "participants": 0, "user_stats": 0, "archived": 0}
+    try:
+        for guild_id in source.list_guild_ids():
+            if os.path.exists(get_guild_settings_file(guild_id)):
+                target.save_guild_settings(source.load_guild_settings(guild_id))
+            for is_ended in (False, True):
+                giveaways = source.load_giveaways(guild_id, is_ended=is_ended)
+                target.save_giveaways(giveaways, guild_id, is_ended=is_ended)
+                with target._lock, target._conn: # Existing rows skip participants in save_giveaways, so write them explicitly
+                    for gw in giveaways.values():
+                        target._replace_participants(gw)
+                counts["giveaways"] += len(giveaways)
+                counts["participants"] += sum(len(gw.participants) for gw in giveaways.values())
+            # Archived history becomes ended rows (SQLite keeps ended giveaways itself)
+            archived = {gw.message_id: gw for gw in source.archive.iter_guild(guild_id)}
+            if archived:
+                target.save_giveaways(archived, guild_id, is_ended=True)
+                with target._lock, target._conn:
+                    for gw in archived.values():
+                        target._replace_participants(gw)
+                counts["archived"] += len(archived)
+            stats = source.load_user_stats(guild_id)
+            target.save_user_stats(stats, guild_id)
+            counts["user_stats"] += len(stats)
+            counts["guilds"] += 1
+    finally:
+        target.close() # Checkpoints the WAL into the database file
+    os.replace(temp_path, db_path)
+    logger.info(f"Migrated JSON storage to SQLite database {db_path}: {counts}")
+    return counts
+
+
+def create_storage_backend(kind: str = STORAGE_BACKEND) -> StorageBackend:
+    """Creates the configured storage backend. A new SQLite database is seeded from existing JSON files once."""
+    if kind == "sqlite":
+        db_path = os.path.join(STORAGE_DIR, SQLITE_DB_FILENAME)
+        if not os.path.exists(db_path) and JsonStorageBackend().list_guild_ids():
+            logger.info(f"SQLite database {db_path} not found but JSON storage exists. Migrating once.")
+            migrate_json_storage_to_sqlite(db_path)
+        return SqliteStorageBackend(db_path)
+    if kind != "json":
+        logger.warning(f"Unknown STORAGE_BACKEND '{kind}'. Falling back to JSON files.")
+    return JsonStorageBackend()
+
+storage_backend: StorageBackend = create_storage_backend()
+
+
+# --- Storage API used by the cog (dispatches to the configured backend) ---
+def save_guild_settings(settings: GuildSettings):
+    """Saves guild settings."""
+    storage_backend.save_guild_settings(settings)
+
+def load_guild_settings(guild_id: int) -> GuildSettings:
+    """Loads guild settings, or returns default if not found."""
+    return storage_backend.load_guild_settings(guild_id)
+
+def save_giveaways_for_guild(giveaways: Dict[int, GiveawayData], guild_id: int, is_ended: bool = False):
+    """Saves active or ended giveaways for a specific guild."""
+    storage_backend.save_giveaways(giveaways, guild_id, is_ended)
+
+def load_giveaways_for_guild(guild_id: int, is_ended: bool = False) -> Dict[int, GiveawayData]:
+    """Loads active or ended giveaways for a specific guild."""
+    return storage_backend.load_giveaways(guild_id, is_ended)
+
+def load_guild_user_stats(guild_id: int) -> Dict[int, UserGiveawayStats]:
+    """Loads user stats for a guild."""
+    return storage_backend.load_user_stats(guild_id)
+
+def save_guild_user_stats(stats: Dict[int, UserGiveawayStats], guild_id: int, changed_user_ids: Optional[Set[int]] = None):
+    """Saves user stats for a guild. Backends that support it only write the changed users."""
+    storage_backend.save_user_stats(stats, guild_id, changed_user_ids)
+
+def find_stored_giveaway(guild_id: int, giveaway_id: int) -> Optional[GiveawayData]:
+    """Looks up a stored giveaway by its sequential ID (used when it is no longer in memory)."""
+    return storage_backend.find_giveaway(guild_id, giveaway_id)
+
+def load_ended_giveaways_for_guild(guild_id: int) -> Dict[int, GiveawayData]:
+    """Loads a guild's reroll cache and makes sure every entry is in the archive (evicted ones stay reachable there)."""
+    giveaways = load_giveaways_for_guild(guild_id, is_ended=True)
+    storage_backend.archive_ended_giveaways(guild_id, list(giveaways.values()))
+    return giveaways
+
+def add_ended_giveaway_to_storage(giveaway: GiveawayData, evicted_ids: Optional[List[int]] = None):
+    """Persists a newly ended giveaway and the reroll cache evictions it caused (only the delta is written)."""
+    storage_backend.add_ended_giveaway(giveaway)
+    if evicted_ids:
+        storage_backend.remove_ended_giveaways(giveaway.guild_id, evicted_ids)
+
+def remove_ended_giveaways_from_storage(guild_id: int, message_ids: List[int]):
+    """Drops evicted giveaways from the guild's stored reroll cache."""
+    storage_backend.remove_ended_giveaways(guild_id, message_ids)
+
+def load_active_giveaways_for_guild(guild_id: int) -> Dict[int, GiveawayData]:
+    """Loads a guild's active giveaways for startup, dropping any marked ended and compacting the journal tail."""
+    giveaways = load_giveaways_for_guild(guild_id, is_ended=False)
+    # Remove giveaways that were somehow marked ended in the active file
+    ended_ids = [msg_id for msg_id, giveaway in giveaways.items() if giveaway.ended]
+    for msg_id in ended_ids:
+        del giveaways[msg_id]
+    # Compact: fold the replayed journal tail into a fresh snapshot
+    if ended_ids or storage_backend.has_uncompacted_changes(guild_id):
+        save_giveaways_for_guild(giveaways, guild_id, is_ended=False)
+    return giveaways
+
+def load_active_giveaways(guild_ids: List[int], workers: int = STARTUP_LOAD_WORKERS) -> Dict[int, Dict[int, GiveawayData]]:
+    """Loads the active giveaways of many guilds, reading guild directories concurrently on a thread pool."""
+    if workers <= 1 or len(guild_ids) <= 1:
+        return {guild_id: load_active_giveaways_for_guild(guild_id) for guild_id in guild_ids}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="giveaway-load") as executor:
+        return dict(zip(guild_ids, executor.map(load_active_giveaways_for_guild, guild_ids)))
+
+
+# --- Boot Snapshot (New) ---
+# Written on clean shutdown, after every guild's files are up to date, so a normal restart reads
+# one file instead of every guild directory. It is deleted as soon as it has been read: after a
+# crash there is no snapshot and startup falls back to the per-guild files.
+BOOT_SNAPSHOT_VERSION = 1
+
+@dataclass
+class BootSnapshot:
+    active: Dict[int, Dict[int, GiveawayData]] # guild_id: { message_id: GiveawayData }
+    sequential_ids: Dict[Tuple[int, int], int] # (guild_id, giveaway_id): message_id
+
+def get_boot_snapshot_file() -> str:
+    return os.path.join(STORAGE_DIR, BOOT_SNAPSHOT_FILENAME)
+
+def write_boot_snapshot(snapshot: BootSnapshot):
+    """Writes the boot snapshot. Only call this once every guild's active giveaways have been saved."""
+    os.makedirs(STORAGE_DIR, exist_ok=True)
+    write_storage_file(get_boot_snapshot_file(), {
+        "v": BOOT_SNAPSHOT_VERSION,
+        "backend": storage_backend.name, # A snapshot from another backend says nothing about this one's data
+        "active": [giveaway.to_dict() for giveaways in snapshot.active.values() for giveaway in giveaways.values()],
+        "sequential_ids": [[guild_id, giveaway_id, msg_id] for (guild_id, giveaway_id), msg_id in snapshot.sequential_ids.items()],
+    })
+
+def consume_boot_snapshot() -> Optional[BootSnapshot]:
+    """Reads and deletes the boot snapshot. Returns None if there is none or it cannot be used."""
+    file_path = get_boot_snapshot_file()
+    if not os.path.exists(file_path):
+        return None
+    snapshot = None
+    try:
+        with open(file_path, 'rb') as f:
+            data = decode_storage_payload(f.read(), file_path)
+        if data.get("v") != BOOT_SNAPSHOT_VERSION or data.get("backend") != storage_backend.name:
+            raise StorageCorruptError(f"{file_path} was written by another version or storage backend")
+        snapshot = BootSnapshot(active={}, sequential_ids={})
+        for gw_dict in data["active"]:
+            giveaway = GiveawayData.from_dict(gw_dict)
+            snapshot.active.setdefault(giveaway.guild_id, {})[giveaway.message_id] = giveaway
+        for guild_id, giveaway_id, msg_id in data["sequential_ids"]:
+            snapshot.sequential_ids[(guild_id, giveaway_id)] = msg_id
+    except (StorageCorruptError, KeyError, TypeError, ValueError, AttributeError) as e:
+        logger.warning(f"Ignoring boot snapshot ({e}). Loading from guild directories instead.")
+        snapshot = None
+    finally:
+        for path in (file_path, file_path + STORAGE_BACKUP_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return snapshot
+
+
+# -------------------------------------------------------------------
+# Async Storage Facade (New) - runs storage I/O on a dedicated executor
+# -------------------------------------------------------------------
+class AsyncStorage:
+    """
+    Awaitable wrappers around the storage functions.
+    Serialization and file writes run on a bounded thread pool instead of the event loop.
+    Calls that touch the same guild file share an ordering key and run strictly in call order
+    (asyncio.Lock wakes waiters FIFO), so two writes to one file can never be reordered.
+    Objects are copied on the loop before being handed to a worker thread.
+    """
+    def __init__(self, max_workers: int = STORAGE_IO_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="giveaway-io")
+        self._key_locks: Dict[tuple, asyncio.Lock] = {}
+
+    async def run(self, key: tuple, func, *args):
+        """Runs func(*args) on the I/O executor after every earlier call with the same key."""
+        lock = self._key_locks.get(key)
+        if lock is None:
+            lock = self._key_locks[key] = asyncio.Lock()
+        async with lock:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    # --- Snapshot helpers (run on the loop, cheap C-level copies) ---
+    @staticmethod
+    def _copy_giveaway(giveaway: GiveawayData) -> GiveawayData:
+        return dataclasses.replace(giveaway, participants=giveaway.participants.copy(), dm_results=dict(giveaway.dm_results))
+
+    # --- Settings ---
+    async def load_guild_settings(self, guild_id: int) -> GuildSettings:
+        return await self.run(("settings", guild_id), load_guild_settings, guild_id)
+
+    async def save_guild_settings(self, settings: GuildSettings):
+        snapshot = dataclasses.replace(settings, default_bypass_role_ids=list(settings.default_bypass_role_ids))
+        await self.run(("settings", settings.guild_id), save_guild_settings, snapshot)
+
+    # --- Giveaways (the active snapshot and its journal share one key) ---
+    async def load_giveaways_for_guild(self, guild_id: int, is_ended: bool = False) -> Dict[int, GiveawayData]:
+        return await self.run(("giveaways", guild_id, is_ended), load_giveaways_for_guild, guild_id, is_ended)
+
+    async def save_giveaways_for_guild(self, giveaways: Dict[int, GiveawayData], guild_id: int, is_ended: bool = False):
+        snapshot = {msg_id: self._copy_giveaway(gw) for msg_id, gw in giveaways.items()}
+        await self.run(("giveaways", guild_id, is_ended), save_giveaways_for_guild, snapshot, guild_id, is_ended)
+
+    async def load_ended_giveaways_for_guild(self, guild_id: int) -> Dict[int, GiveawayData]:
+        return await self.run(("giveaways", guild_id, True), load_ended_giveaways_for_guild, guild_id)
+
+    async def add_ended_giveaway(self, giveaway: GiveawayData, evicted_ids: Optional[List[int]] = None):
+        await self.run(("giveaways", giveaway.guild_id, True), add_ended_giveaway_to_storage, self._copy_giveaway(giveaway), list(evicted_ids or []))
+
+    async def update_dm_results(self, giveaway: GiveawayData, in_reroll_cache: bool = True):
+        await self.run(("giveaways", giveaway.guild_id, True), storage_backend.update_dm_results, self._copy_giveaway(giveaway), in_reroll_cache)
+
+    async def remove_ended_giveaways(self, guild_id: int, message_ids: List[int]):
+        await self.run(("giveaways", guild_id, True), remove_ended_giveaways_from_storage, guild_id, list(message_ids))
+
+    async def find_giveaway(self, guild_id: int, giveaway_id: int) -> Optional[GiveawayData]:
+        return await self.run(("giveaways", guild_id, True), find_stored_giveaway, guild_id, giveaway_id)
+
+    async def record_join(self, giveaway: GiveawayData, user_id: int, entries: int):
+        await self.run(("giveaways", giveaway.guild_id, False), storage_backend.record_join, giveaway, user_id, entries)
+
+    async def record_leave(self, giveaway: GiveawayData, user_id: int):
+        await self.run(("giveaways", giveaway.guild_id, False), storage_backend.record_leave, giveaway, user_id)
+
+    async def record_end(self, giveaway: GiveawayData, cancelled: bool = False):
+        await self.run(("giveaways", giveaway.guild_id, False), storage_backend.record_end, giveaway, cancelled)
+
+    # --- User stats ---
+    async def load_guild_user_stats(self, guild_id: int) -> Dict[int, UserGiveawayStats]:
+        return await self.run(("stats", guild_id), load_guild_user_stats, guild_id)
+
+    async def save_guild_user_stats(self, stats: Dict[int, UserGiveawayStats], guild_id: int, changed_user_ids: Optional[Set[int]] = None):
+        snapshot = {user_id: dataclasses.replace(user_stats) for user_id, user_stats in stats.items()}
+        await self.run(("stats", guild_id), save_guild_user_stats, snapshot, guild_id, changed_user_ids)
+
+    # --- Boot snapshot ---
+    async def write_boot_snapshot(self, active: Dict[int, Dict[int, GiveawayData]], sequential_ids: Dict[Tuple[int, int], int]):
+        snapshot = BootSnapshot(
+            active={guild_id: {msg_id: self._copy_giveaway(gw) for msg_id, gw in giveaways.items()} for guild_id, giveaways in active.items()},
+            sequential_ids=dict(sequential_ids),
+        )
+        await self.run(("boot",), write_boot_snapshot, snapshot)
+
+
+# -------------------------------------------------------------------
+# Write-Behind Store for Active Giveaways (New)
+# -------------------------------------------------------------------
+class WriteBehindStore:
+    """
+    Coalesces repeated saves of a guild's active giveaways.
+    Callers mark a guild dirty; the snapshot is written on the next flush
+    (periodic, size threshold reached, or forced) instead of on every change.
+    """
+    def __init__(self, snapshot_func, save_func, max_pending: int = WRITE_BEHIND_MAX_PENDING):
+        self._snapshot_func = snapshot_func # guild_id -> Dict[int, GiveawayData]
+        self._save_func = save_func # async (giveaways, guild_id) -> None
+        self.max_pending = max_pending
+        self._dirty: Dict[int, int] = {} # guild_id: pending change count
+        # Counters
+        self.writes_requested = 0 # Total save requests received
+        self.writes_flushed = 0 # Snapshots actually written to disk
+        self.writes_coalesced = 0 # Requests absorbed into another snapshot
+
+    def mark_dirty(self, guild_id: int) -> bool:
+        """Records a pending change. Returns True once the guild has reached the flush threshold."""
+        self.writes_requested += 1
+        self._dirty[guild_id] = self._dirty.get(guild_id, 0) + 1
+        return self._dirty[guild_id] >= self.max_pending
+
+    def is_dirty(self, guild_id: int) -> bool:
+        return guild_id in self._dirty
+
+    async def flush(self, guild_id: Optional[int] = None) -> int:
+        """Writes the snapshot for one guild (or every dirty guild). Returns the number of snapshots written."""
+        guild_ids = [guild_id] if guild_id is not None else list(self._dirty.keys())
+        written = 0
+        for gid in guild_ids:
+            pending = self._dirty.pop(gid, 0)
+            if pending == 0 and guild_id is None:
+                continue
+            try:
+                await self._save_func(self._snapshot_func(gid), gid)
+            except Exception as e:
+                # Keep the guild dirty so the next flush retries
+                self._dirty[gid] = self._dirty.get(gid, 0) + pending
+                logger.error(f"Write-behind flush failed for guild {gid}: {e}", exc_info=True)
+                continue
+            written += 1
+            self.writes_flushed += 1
+            if pending > 1:
+                self.writes_coalesced += pending - 1
+        return written
+
+    def stats(self) -> dict:
+        return {
+            "requested": self.writes_requested,
+            "flushed": self.writes_flushed,
+            "coalesced": self.writes_coalesced,
+            "dirty_guilds": len(self._dirty),
+        }
+
+
+# -------------------------------------------------------------------
+# Giveaway End Scheduler (New) - one coroutine and a min-heap instead of a task per giveaway
+# -------------------------------------------------------------------
+class GiveawayScheduler:
+    """
+    Ends timed giveaways from a single runner coroutine.
+    Entries are (end timestamp, sequence, message_id) in a min-heap: schedule is O(log n), cancel is O(1)
+    and lazy (the entry is skipped when it reaches the top), and finding overdue giveaways only pops the heap.
+    """
+    def __init__(self, on_due: Callable[[int], None], wait_ready: Optional[Callable[[], Awaitable]] = None):
+        self._on_due = on_due # (message_id) -> None, must not block (e.g. hands the giveaway to the end queue)
+        self._wait_ready = wait_ready # Awaited once before the first giveaway is ended
+        self._heap: List[Tuple[float, int, int]] = []
+        self._deadlines: Dict[int, float] = {} # message_id: end timestamp of its live heap entry
+        self._sequence = 0 # Tie-breaker so equal deadlines keep scheduling order
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def is_scheduled(self, message_id: int) -> bool:
+        return message_id in self._deadlines
+
+    def schedule(self, message_id: int, end_time: datetime):
+        """Schedules (or reschedules) a giveaway to end at end_time."""
+        deadline = end_time.timestamp()
+        self._deadlines[message_id] = deadline
+        self._sequence += 1
+        heapq.heappush(self._heap, (deadline, self._sequence, message_id))
+        if self._heap[0][2] == message_id:
+            self._wakeup.set() # New earliest deadline, the runner must sleep less
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+
+    def cancel(self, message_id: int) -> bool:
+        """Unschedules a giveaway. Returns True if it was scheduled."""
+        return self._deadlines.pop(message_id, None) is not None
+
+    def _compact(self):
+        """Drops stale heap entries once they outnumber the live ones."""
+        self._heap = [entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]]
+        heapq.heapify(self._heap)
+
+    def _next_deadline(self) -> Optional[float]:
+        while self._heap:
+            deadline, _, message_id = self._heap[0]
+            if self._deadlines.get(message_id) == deadline:
+                return deadline
+            heapq.heappop(self._heap) # Cancelled or rescheduled
+        return None
+
+    def pop_due(self, now: Optional[float] = None) -> List[int]:
+        """Removes and returns every giveaway whose end time has passed, earliest first."""
+        now = time.time() if now is None else now
+        due = []
+        while True:
+            deadline = self._next_deadline()
+            if deadline is None or deadline > now:
+                return due
+            _, _, message_id = heapq.heappop(self._heap)
+            del self._deadlines[message_id]
+            due.append(message_id)
+
+    def dispatch_due(self) -> int:
+        """Calls on_due for every overdue giveaway. Returns how many were dispatched."""
+        due = self.pop_due()
+        for message_id in due:
+            self._on_due(message_id)
+        return len(due)
+
+    def start(self):
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._runner:
+            self._runner.cancel()
+
+    async def _run(self):
+        if self._wait_ready:
+            await self._wait_ready()
+        while True:
+            self._wakeup.clear()
+            try:
+                self.dispatch_due()
+            except Exception as e:
+                logger.error(f"Giveaway scheduler failed to dispatch due giveaways: {e}", exc_info=True)
+            deadline = self._next_deadline()
+            timeout = SCHEDULER_MAX_SLEEP if deadline is None else min(max(deadline - time.time(), 0), SCHEDULER_MAX_SLEEP)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# -------------------------------------------------------------------
+# Giveaway End Queue (New) - bounded, fair processing of due giveaways
+# -------------------------------------------------------------------
+@dataclass
+class EndQueueItem:
+    message_id: int
+    guild_id: int
+    channel_id: int
+
+
+class GiveawayEndQueue:
+    """
+    Ends due giveaways with a fixed number of workers instead of one task each, so a backlog
+    (e.g. after downtime) reaches the rate limiter at a steady pace.
+    Guilds are served round-robin (one busy guild cannot starve the others), and at most one
+    giveaway per channel is processed at a time.
+    """
+    def __init__(self, process: Callable[[int], Awaitable], workers: int = END_QUEUE_WORKERS):
+        self._process = process # async (message_id) -> None
+        self._worker_count = workers
+        self._guild_queues: Dict[int, deque] = {} # guild_id: deque[EndQueueItem]
+        self._ring: deque = deque() # guild_ids with queued items, in round-robin order
+        self._queued: Set[int] = set() # message_ids queued or in progress (no duplicates)
+        self._busy_channels: Set[int] = set()
+        self._changed = asyncio.Event() # Set when work is added or a channel frees up
+        self._workers: List[asyncio.Task] = []
+        self.in_progress = 0
+        self.processed = 0
+        self._avg_seconds: Optional[float] = None # Moving average time per giveaway
+        self._backlog_started: Optional[float] = None
+        self._backlog_processed = 0
+        self._last_report = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._guild_queues.values())
+
+    def enqueue(self, message_id: int, guild_id: int, channel_id: int) -> bool:
+        """Queues a giveaway to be ended. Returns False if it is already queued or being ended."""
+        if message_id in self._queued:
+            return False
+        self._queued.add(message_id)
+        queue = self._guild_queues.get(guild_id)
+        if queue is None:
+            queue = self._guild_queues[guild_id] = deque()
+            self._ring.append(guild_id)
+        queue.append(EndQueueItem(message_id, guild_id, channel_id))
+        if self._backlog_started is None:
+            self._backlog_started = time.monotonic()
+            self._backlog_processed = 0
+        self._changed.set()
+        return True
+
+    def _take(self) -> Optional[EndQueueItem]:
+        """Next item from the next guild in turn whose channel is not already being processed."""
+        for _ in range(len(self._ring)):
+            guild_id = self._ring[0]
+            self._ring.rotate(-1)
+            queue = self._guild_queues[guild_id]
+            for index, item in enumerate(queue):
+                if item.channel_id in self._busy_channels:
+                    continue
+                del queue[index]
+                if not queue:
+                    del self._guild_queues[guild_id]
+                    self._ring.remove(guild_id)
+                return item
+        return None
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated time to drain the queue, from the average time per giveaway so far."""
+        if self._avg_seconds is None:
+            return None
+        return (len(self) + self.in_progress) * self._avg_seconds / max(1, self._worker_count)
+
+    def stats(self) -> dict:
+        eta = self.eta_seconds()
+        return {
+            "queued": len(self),
+            "in_progress": self.in_progress,
+            "processed": self.processed,
+            "guilds": len(self._guild_queues),
+            "avg_seconds": round(self._avg_seconds, 2) if self._avg_seconds is not None else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+    def _report(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_report < END_QUEUE_REPORT_INTERVAL:
+            return
+        self._last_report = now
+        eta = self.eta_seconds()
+        eta_text = f"~{eta:.0f}s" if eta is not None else "unknown"
+        logger.info(f"End queue: {len(self)} giveaway(s) queued across {len(self._guild_queues)} guild(s), {self.in_progress} in progress, ETA {eta_text}.")
+
+    def start(self):
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self._worker_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    async def _worker(self):
+        while True:
+            item = self._take()
+            if item is None:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+            if len(self) > self._worker_count:
+                self._report() # Only worth reporting while there is a backlog
+            self._busy_channels.add(item.channel_id)
+            self.in_progress += 1
+            started = time.monotonic()
+            try:
+                await self._process(item.message_id)
+            except Exception as e:
+                logger.error(f"End queue failed to end giveaway message {item.message_id}: {e}", exc_info=True)
+            finally:
+                elapsed = time.monotonic() - started
+                self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+                self.in_progress -= 1
+                self.processed += 1
+                self._backlog_processed += 1
+                self._busy_channels.discard(item.channel_id)
+                self._queued.discard(item.message_id)
+                self._changed.set() # The channel is free again
+            if not self._guild_queues and self.in_progress == 0 and self._backlog_started is not None:
+                if self._backlog_processed > self._worker_count:
+                    logger.info(f"End queue drained {self._backlog_processed} giveaway(s) in {time.monotonic() - self._backlog_started:.1f}s.")
+                self._backlog_started = None
+
+
+# -------------------------------------------------------------------
+# Outbound Dispatcher (New) - per-route queues for message sends/edits
+# -------------------------------------------------------------------
+def _consume_future_exception(future: asyncio.Future):
+    """Marks a failure as retrieved; the dispatcher already logged it and nobody may await the future."""
+    if not future.cancelled():
+        future.exception()
+
+
+@dataclass
+class OutboundJob:
+    send: Callable[[], Awaitable] # Makes the request; replaced when a newer edit of the same message supersedes it
+    priority: int
+    seq: int
+    description: str
+    merge_key: Optional[tuple]
+    queued_at: float
+    futures: List[asyncio.Future] = field(default_factory=list) # One per submit merged into this job
+
+
+@dataclass
+class OutboundRouteStats:
+    sent: int = 0
+    merged: int = 0 # Submits folded into an already queued edit
+    failed: int = 0
+    avg_latency: Optional[float] = None # Seconds from submit to completion (moving average)
+    max_latency: float = 0.0
+
+
+class OutboundDispatcher:
+    """
+    Sends and edits Discord messages from a fixed number of workers, with one queue per route:
+    ("channel", channel_id) or ("dm", user_id). A route has at most one request in flight, so a burst
+    to one channel goes out in order instead of racing into the same rate limit bucket, and across
+    routes the next free worker takes the highest-priority job (lowest OUTBOUND_PRIORITY_* value).
+    A queued job with the same merge_key as a new one (an edit of the same message) is replaced by
+    the new one instead of being sent twice; such edits must each carry the message's full new state.
+    """
+    def __init__(self, workers: int = OUTBOUND_WORKERS):
+        self._worker_count = workers
+        self._queues: Dict[tuple, List[OutboundJob]] = {} # route: queued jobs
+        self._busy: Set[tuple] = set() # Routes with a request in flight
+        self._stats: Dict[str, OutboundRouteStats] = {} # Per channel; DMs share one entry
+        self._changed = asyncio.Event() # Set when work is added or a route frees up
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: List[asyncio.Task] = []
+        self._seq = 0
+
+    @staticmethod
+    def _stats_key(route: tuple) -> str:
+        return "dm" if route[0] == "dm" else f"{route[0]}:{route[1]}"
+
+    def backlog(self) -> int:
+        return sum(len(jobs) for jobs in self._queues.values())
+
+    def submit(self, route: tuple, send: Callable[[], Awaitable], priority: int, description: str, merge_key: Optional[tuple] = None) -> asyncio.Future:
+        """
+        Queues a request. The returned future resolves with its result (or raises its exception) once sent;
+        awaiting it is optional, failures are logged either way. Cancelling it withdraws a job that has not started.
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_future_exception)
+        queue = self._queues.setdefault(route, [])
+        self._idle.clear()
+        if merge_key is not None:
+            for job in queue:
+                if job.merge_key == merge_key:
+                    job.send = send
+                    job.description = description
+                    job.priority = min(job.priority, priority)
+                    job.futures.append(future)
+                    self._stats.setdefault(self._stats_key(route), OutboundRouteStats()).merged += 1
+                    return future
+        self._seq += 1
+        queue.append(OutboundJob(send, priority, self._seq, description, merge_key, time.monotonic(), [future]))
+        self._changed.set()
+        return future
+
+    def _take(self) -> Optional[Tuple[tuple, OutboundJob]]:
+        """Highest-priority job (oldest first) among routes without a request in flight."""
+        best_route, best_job = None, None
+        for route, queue in self._queues.items():
+            if route in self._busy:
+                continue
+            job = min(queue, key=lambda queued: (queued.priority, queued.seq))
+            if best_job is None or (job.priority, job.seq) < (best_job.priority, best_job.seq):
+                best_route, best_job = route, job
+        if best_job is None:
+            return None
+        queue = self._queues[best_route]
+        queue.remove(best_job)
+        if not queue:
+            del self._queues[best_route]
+        return best_route, best_job
+
+    def stats(self) -> dict:
+        """Backlog, in-flight request and latency per route ("channel:<id>", or "dm" for all DMs)."""
+        report = {}
+        for key, route_stats in self._stats.items():
+            report[key] = {
+                "queued": 0,
+                "in_flight": 0,
+                "sent": route_stats.sent,
+                "merged": route_stats.merged,
+                "failed": route_stats.failed,
+                "avg_latency": round(route_stats.avg_latency, 3) if route_stats.avg_latency is not None else None,
+                "max_latency": round(route_stats.max_latency, 3),
+            }
+        for route, queue in self._queues.items():
+            report.setdefault(self._stats_key(route), {"queued": 0, "in_flight": 0})["queued"] += len(queue)
+        for route in self._busy:
+            report.setdefault(self._stats_key(route), {"queued": 0, "in_flight": 0})["in_flight"] += 1
+        return report
+
+    def start(self):
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self._worker_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    async def drain(self, timeout: float = OUTBOUND_DRAIN_TIMEOUT) -> bool:
+        """Waits until every queued job has been sent. Returns False if the timeout ran out first."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Outbound queue not drained after {timeout}s; {self.backlog()} message(s) dropped.")
+            return False
+
+    async def _worker(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+            route, job = taken
+            futures = [future for future in job.futures if not future.done()]
+            if futures: # Otherwise every submitter withdrew it
+                self._busy.add(route)
+                route_stats = self._stats.setdefault(self._stats_key(route), OutboundRouteStats())
+                try:
+                    result = await job.send()
+                except asyncio.CancelledError:
+                    for future in futures:
+                        future.cancel()
+                    raise
+                except Exception as e:
+                    route_stats.failed += 1
+                    logger.warning(f"Outbound {job.description} failed: {e}")
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    route_stats.sent += 1
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(result)
+                finally:
+                    self._busy.discard(route)
+                    latency = time.monotonic() - job.queued_at
+                    route_stats.avg_latency = latency if route_stats.avg_latency is None else 0.8 * route_stats.avg_latency + 0.2 * latency
+                    route_stats.max_latency = max(route_stats.max_latency, latency)
+            self._changed.set() # The route is free again
+            if not self._queues and not self._busy:
+                self._idle.set()
+
+
+# -------------------------------------------------------------------
+# Direct Message Fan-out (New) - throttled winner/host DMs with per-user results
 # -------------------------------------------------------------------
-def get_guild_dir(guild_id: int) -> str:
-    """Gets the storage directory path for a specific guild."""
-    guild_dir = os.path.join(STORAGE_DIR, str(guild_id))
-    os.makedirs(guild_dir, exist_ok=True)
-    return guild_dir
+@dataclass
+class DirectMessageJob:
+    giveaway: GiveawayData
+    user_id: int
+    send: Callable[[], Awaitable] # Sends the DM; returns False if the user could not be resolved
+    description: str
+    record: bool # Record the outcome in giveaway.dm_results
 
-def get_guild_giveaways_file(guild_id: int, is_ended: bool = False) -> str:
-    """Gets the file path for active or ended giveaways for a guild."""
-    filename = ENDED_GIVEAWAYS_FILENAME if is_ended else ACTIVE_GIVEAWAYS_FILENAME
-    return os.path.join(get_guild_dir(guild_id), filename)
 
-def get_guild_settings_file(guild_id: int) -> str:
-     """Gets the file path for guild settings."""
-     return os.path.join(get_guild_dir(guild_id), GUILD_SETTINGS_FILENAME)
+class DirectMessageFanout:
+    """
+    Sends queued DMs from a few workers under a global token-bucket rate budget, so ending a giveaway
+    with many winners returns at once and the DMs trickle out behind it. Each DM still goes through the
+    outbound dispatcher on its ("dm", user_id) route at OUTBOUND_PRIORITY_DM.
+    Outcomes (sent / closed / failed) are written to giveaway.dm_results as they arrive; once a giveaway
+    has no DMs outstanding, on_results(giveaway) is awaited to persist them.
+    """
+    def __init__(self, outbound: OutboundDispatcher, on_results: Callable[[GiveawayData], Awaitable],
+                 workers: int = DM_FANOUT_CONCURRENCY, rate: float = DM_RATE_PER_SECOND, burst: int = DM_RATE_BURST):
+        self._outbound = outbound
+        self._on_results = on_results # async (giveaway) -> None
+        self._worker_count = workers
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._queue: deque = deque() # DirectMessageJob
+        self._outstanding: Dict[int, int] = {} # message_id: recorded DMs queued or in flight
+        self._changed = asyncio.Event() # Set when work is added
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: List[asyncio.Task] = []
+        self.in_flight = 0
+        self.counts: Dict[str, int] = {DM_STATUS_SENT: 0, DM_STATUS_CLOSED: 0, DM_STATUS_FAILED: 0}
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, giveaway: GiveawayData, user_id: int, send: Callable[[], Awaitable], description: str, record: bool = True):
+        """Queues a DM and returns immediately. With record=True the user is marked pending in giveaway.dm_results."""
+        if record:
+            giveaway.dm_results[user_id] = DM_STATUS_PENDING
+            self._outstanding[giveaway.message_id] = self._outstanding.get(giveaway.message_id, 0) + 1
+        self._queue.append(DirectMessageJob(giveaway, user_id, send, description, record))
+        self._idle.clear()
+        self._changed.set()
+
+    def stats(self) -> dict:
+        return {"queued": len(self._queue), "in_flight": self.in_flight, "giveaways_pending": len(self._outstanding), **self.counts}
+
+    def start(self):
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self._worker_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        if self._queue:
+            logger.warning(f"DM fan-out stopped with {len(self._queue)} DM(s) unsent; their results stay pending.")
+
+    async def drain(self, timeout: float = OUTBOUND_DRAIN_TIMEOUT) -> bool:
+        """Waits until every queued DM has been sent and its results stored. Returns False on timeout."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _acquire(self):
+        """Waits for a token from the shared rate budget."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(float(self._burst), self._tokens + (now - self._refilled_at) * self._rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    async def _worker(self):
+        while True:
+            if not self._queue:
+                if self.in_flight == 0:
+                    self._idle.set()
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+            await self._acquire()
+            if not self._queue:
+                continue # Another worker took it while this one waited for a token
+            job = self._queue.popleft()
+            self.in_flight += 1 # Until the result is stored, so drain() also waits for persistence
+            try:
+                try:
+                    sent = await self._outbound.submit(("dm", job.user_id), job.send, OUTBOUND_PRIORITY_DM, job.description)
+                    status = DM_STATUS_SENT if sent is not False else DM_STATUS_FAILED
+                except discord.Forbidden:
+                    status = DM_STATUS_CLOSED # Failures are logged by the outbound dispatcher
+                except Exception:
+                    status = DM_STATUS_FAILED
+                self.counts[status] += 1
+                if job.record:
+                    await self._record(job, status)
+            finally:
+                self.in_flight -= 1
+            if not self._queue and self.in_flight == 0:
+                self._idle.set()
+
+    async def _record(self, job: DirectMessageJob, status: str):
+        giveaway = job.giveaway
+        giveaway.dm_results[job.user_id] = status
+        remaining = self._outstanding.get(giveaway.message_id, 1) - 1
+        if remaining > 0:
+            self._outstanding[giveaway.message_id] = remaining
+            return
+        self._outstanding.pop(giveaway.message_id, None)
+        try:
+            await self._on_results(giveaway)
+        except Exception as e:
+            logger.error(f"Failed to store DM results for giveaway {giveaway.giveaway_id}/{giveaway.message_id}: {e}", exc_info=True)
 
-def save_guild_settings(settings: GuildSettings):
-    """Saves guild settings to its file."""
-    try:
-        file_path = get_guild_settings_file(settings.guild_id)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(settings.to_dict(), f, indent=4)
-        logger.debug(f"Saved settings for guild {settings.guild_id}")
-    except Exception as e:
-        logger.error(f"Failed to save settings for guild {settings.guild_id}: {e}", exc_info=True)
 
-def load_guild_settings(guild_id: int) -> GuildSettings:
-    """Loads guild settings from its file, or returns default if not found."""
-    file_path = get_guild_settings_file(guild_id)
-    if not os.path.exists(file_path):
-        logger.info(f"No settings file found for guild {guild_id}. Returning default.")
-        return GuildSettings(guild_id=guild_id) # Return default settings
+# -------------------------------------------------------------------
+# User Resolver (New) - cached, batched member/user lookups
+# -------------------------------------------------------------------
+_UNRESOLVED = object() # UserResolver cache miss marker (None is a cached "missing")
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            settings = GuildSettings.from_dict(data)
-            logger.debug(f"Loaded settings for guild {guild_id}")
-            return settings
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON from settings file for guild {guild_id}. File might be corrupt or empty. Returning default settings.", exc_info=True)
-        return GuildSettings(guild_id=guild_id)
-    except Exception as e:
-        logger.error(f"Failed to load settings for guild {guild_id}: {e}", exc_info=True)
-        return GuildSettings(guild_id=guild_id)
 
+class UserResolver:
+    """
+    Resolves user IDs to Members (or Users, for people who left the guild) for winner lists and DMs.
+    Lookups missing from the gateway cache are batched into guild member chunk requests
+    (USER_QUERY_CHUNK IDs each); whoever is still missing is fetched as a User in parallel.
+    Results are kept in an LRU of at most `max_size` entries: found ones for `ttl` seconds,
+    departed members and deleted users (negative entries) for `negative_ttl` seconds.
+    """
+    def __init__(self, bot: commands.Bot, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL, negative_ttl: float = USER_CACHE_NEGATIVE_TTL):
+        self.bot = bot
+        self._max_size = max_size
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        # ("member", guild_id, user_id) or ("user", user_id): (expires_at, Member/User, or None if missing); least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.queried = 0 # Member chunk requests sent
+        self.fetched = 0 # fetch_user calls
+
+    def _get(self, key: tuple):
+        """Cached value for key (None = known missing), or _UNRESOLVED if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _UNRESOLVED
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _UNRESOLVED
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: tuple, value):
+        ttl = self._ttl if value is not None else self._negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def forget(self, user_id: int, guild_id: Optional[int] = None):
+        """Drops cached lookups of a user (e.g. when they join or leave a guild)."""
+        self._entries.pop(("user", user_id), None)
+        if guild_id is not None:
+            self._entries.pop(("member", guild_id, user_id), None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "queried": self.queried, "fetched": self.fetched}
+
+    async def resolve_members(self, guild: discord.Guild, user_ids: Iterable[int]) -> Dict[int, Optional[discord.Member]]:
+        """Members for the given IDs (None for anyone not in the guild)."""
+        resolved: Dict[int, Optional[discord.Member]] = {}
+        missing: List[int] = []
+        for user_id in dict.fromkeys(user_ids): # De-duplicated, order kept
+            member = guild.get_member(user_id)
+            if member is None:
+                member = self._get(("member", guild.id, user_id))
+            if member is _UNRESOLVED:
+                self.misses += 1
+                missing.append(user_id)
+            else:
+                self.hits += 1
+                resolved[user_id] = member
+        for start in range(0, len(missing), USER_QUERY_CHUNK):
+            chunk = missing[start:start + USER_QUERY_CHUNK]
+            try:
+                self.queried += 1
+                found = {member.id: member for member in await guild.query_members(user_ids=chunk, limit=len(chunk), cache=True)}
+            except Exception as e: # Gateway timeout, shard not ready, ...; leave them unresolved this time (not cached)
+                logger.warning(f"Member chunk request for {len(chunk)} user(s) in guild {guild.id} failed: {e}")
+                resolved.update((user_id, None) for user_id in chunk)
+                continue
+            for user_id in chunk:
+                member = found.get(user_id)
+                self._put(("member", guild.id, user_id), member) # Not returned = not in the guild
+                resolved[user_id] = member
+        return resolved
+
+    async def resolve_user(self, user_id: int) -> Optional[discord.User]:
+        """The User for an ID (None if the account no longer exists)."""
+        user = self.bot.get_user(user_id)
+        if user is None:
+            user = self._get(("user", user_id))
+        if user is not _UNRESOLVED:
+            self.hits += 1
+            return user
+        self.misses += 1
+        self.fetched += 1
+        try:
+            user = await self.bot.fetch_user(user_id)
+        except discord.NotFound:
+            user = None
+        self._put(("user", user_id), user)
+        return user
+
+    async def resolve_users(self, guild: Optional[discord.Guild], user_ids: Iterable[int]) -> Dict[int, Optional[discord.abc.User]]:
+        """Members where possible, otherwise Users; None for deleted accounts or failed lookups."""
+        user_ids = list(dict.fromkeys(user_ids))
+        resolved: Dict[int, Optional[discord.abc.User]] = await self.resolve_members(guild, user_ids) if guild else {}
+        departed = [user_id for user_id in user_ids if resolved.get(user_id) is None]
+        if departed:
+            limit = asyncio.Semaphore(USER_FETCH_CONCURRENCY)
+
+            async def fetch(user_id: int):
+                async with limit:
+                    try:
+                        return await self.resolve_user(user_id)
+                    except Exception as e:
+                        logger.warning(f"Could not fetch user {user_id}: {e}")
+                        return None
+            users = await asyncio.gather(*(fetch(user_id) for user_id in departed))
+            resolved.update(zip(departed, users))
+        return resolved
 
-def save_giveaways_for_guild(giveaways: Dict[int, GiveawayData], guild_id: int, is_ended: bool = False):
-    """Saves active or ended giveaways for a specific guild."""
-    try:
-        file_path = get_guild_giveaways_file(guild_id, is_ended)
-        # Filter out ended giveaways if saving active ones, or vice-versa
-        filtered_giveaways = {
-            str(msg_id): gw.to_dict() for msg_id, gw in giveaways.items()
-            if gw.ended == is_ended # Only save if ended status matches
-        }
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(filtered_giveaways, f, indent=4)
-        logger.debug(f"Saved {len(filtered_giveaways)} {'ended' if is_ended else 'active'} giveaways for guild {guild_id}")
-    except Exception as e:
-        logger.error(f"Failed to save giveaways for guild {guild_id}: {e}", exc_info=True)
 
-def load_giveaways_for_guild(guild_id: int, is_ended: bool = False) -> Dict[int, GiveawayData]:
-    """Loads active or ended giveaways for a specific guild."""
-    giveaways = {}
-    file_path = get_guild_giveaways_file(guild_id, is_ended)
-    if not os.path.exists(file_path):
-        return giveaways
+# -------------------------------------------------------------------
+# Participant Count Renderer (New) - coalesced edits of the count button
+# -------------------------------------------------------------------
+@dataclass
+class CountRenderState:
+    """Render state of one giveaway message."""
+    rendered: Optional[int] = None # Count the message currently shows (None = unknown)
+    last_edit: float = 0.0 # time.monotonic() of the last edit
+    dirty: bool = False # Count changed since the pending/in-flight render read it
+    changes: int = 0 # Changes reported since the last render read the count
+    rendering: int = 0 # Changes covered by the render in progress
+    task: Optional[asyncio.Task] = None
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            giveaway_dicts = json.load(f)
-            for msg_id_str, gw_dict in giveaway_dicts.items():
+
+class ParticipantCountRenderer:
+    """
+    Coalesces participant count changes into at most one message edit per giveaway message
+    every `interval` seconds. The first change after a quiet period is rendered right away;
+    changes during the interval are folded into one edit when it is over.
+    Each edit sends a fresh view for that message, so one giveaway's count never shows up on another.
+    Every reported change ends up as exactly one of: the change that triggered an edit (edits),
+    one folded into an edit or into no edit at all (saved), or one whose edit failed (failed).
+    """
+    def __init__(self, get_count: Callable[[int], Optional[int]], render: Callable[[int, int, Callable[[], None]], Awaitable], interval: float = PARTICIPANT_COUNT_EDIT_INTERVAL):
+        self._get_count = get_count # (message_id) -> current count, or None once the giveaway is no longer active
+        # async (message_id, count, on_send) -> None; edits the message, calling on_send() right before the request goes out
+        # (never called if the edit is withdrawn or superseded before it is sent)
+        self._render = render
+        self._interval = interval
+        self._states: Dict[int, CountRenderState] = {} # message_id: CountRenderState
+        self.requested = 0 # Count changes reported
+        self.edits = 0 # Message edits sent
+        self.saved = 0 # Changes that needed no edit of their own
+        self.failed = 0
+
+    def request(self, message_id: int):
+        """Reports that a giveaway's participant count changed."""
+        self.requested += 1
+        state = self._states.get(message_id)
+        if state is None:
+            state = self._states[message_id] = CountRenderState()
+        state.dirty = True
+        state.changes += 1
+        if state.task is None:
+            state.task = asyncio.create_task(self._run(message_id, state))
+
+    async def _run(self, message_id: int, state: CountRenderState):
+        sent = False
+
+        def on_send():
+            nonlocal sent
+            sent = True
+
+        try:
+            while state.dirty:
+                delay = state.last_edit + self._interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                state.dirty = False
+                state.rendering, state.changes = state.changes, 0
+                count = self._get_count(message_id)
+                if count is None: # Ended meanwhile; the end edit shows the final count
+                    self._settle(state, sent=False)
+                    if self._states.get(message_id) is state:
+                        del self._states[message_id]
+                    break
+                if count == state.rendered:
+                    self._settle(state, sent=False) # Changes cancelled out (join + leave)
+                    continue
+                state.last_edit = time.monotonic()
+                sent = False
                 try:
-                    msg_id = int(msg_id_str)
-                    giveaways[msg_id] = GiveawayData.from_dict(gw_dict)
+                    await self._render(message_id, count, on_send)
+                    state.rendered = count
+                    self._settle(state, sent) # Not sent: withdrawn or superseded by the end edit
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
-                    logger.error(f"Failed to load individual giveaway {msg_id_str} for guild {guild_id}: {e}")
-            logger.debug(f"Loaded {len(giveaways)} {'ended' if is_ended else 'active'} giveaways from {file_path}")
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON from {'ended' if is_ended else 'active'} giveaways file for guild {guild_id}. File might be corrupt or empty.", exc_info=True)
-    except Exception as e:
-        logger.error(f"Failed to load giveaways for guild {guild_id}: {e}", exc_info=True)
-    return giveaways
+                    self._settle(state, sent=False, failed=True)
+                    logger.warning(f"Failed to update participant count on giveaway message {message_id}: {e}")
+        except asyncio.CancelledError: # finish()/stop(): an edit already going out still lands
+            self._settle(state, sent)
+            self.saved += state.changes
+            state.changes = 0
+            raise
+        finally:
+            state.task = None
+
+    def _settle(self, state: CountRenderState, sent: bool, failed: bool = False):
+        """Accounts for the changes covered by the render that just finished (or was skipped)."""
+        covered, state.rendering = state.rendering, 0
+        if covered and (sent or failed):
+            if failed:
+                self.failed += 1
+            else:
+                self.edits += 1
+            covered -= 1
+        self.saved += covered
+
+    def finish(self, message_id: int):
+        """
+        Stops rendering a giveaway that is ending; the end edit carries the final count.
+        Cancelling the render withdraws its queued edit. An edit already being sent still lands
+        before the end edit, because both go through the message's outbound route in order.
+        """
+        state = self._states.pop(message_id, None)
+        if state is not None and state.task is not None:
+            state.task.cancel()
+
+    def stop(self):
+        for state in self._states.values():
+            if state.task is not None:
+                state.task.cancel()
+        self._states.clear()
+
+    def stats(self) -> dict:
+        return {
+            "changes": self.requested,
+            "edits": self.edits,
+            "saved": self.saved,
+            "failed": self.failed,
+            "pending": sum(state.changes + state.rendering for state in self._states.values()), # Not rendered yet
+        }
 
-# --- Storage for User Stats (New) ---
-def get_guild_user_stats_file(guild_id: int) -> str:
-    """Gets the file path for user stats for a guild."""
-    return os.path.join(get_guild_dir(guild_id), USER_STATS_FILENAME)
 
-def load_guild_user_stats(guild_id: int) -> Dict[int, UserGiveawayStats]:
-    """Loads user stats for a guild."""
-    stats = {}
-    file_path = get_guild_user_stats_file(guild_id)
-    if not os.path.exists(file_path):
-        return stats
+# -------------------------------------------------------------------
+# Message Count Index (New) - fed by on_message instead of per-join history scans
+# -------------------------------------------------------------------
+@dataclass
+class MessageTally:
+    """Eligible message count of one user for one giveaway."""
+    count: int = 0
+    last_counted: Optional[float] = None # Unix timestamp of the last counted message (for the cooldown)
+    # Every keyword-matching message since start_time: message_id -> timestamp (kept so deletions can be undone)
+    messages: Dict[int, float] = field(default_factory=dict)
+    backfilling: bool = False # Waiting for the history backfill; count is rebuilt when it completes
+
+    def add(self, message_id: int, timestamp: float, cooldown: int):
+        """Records a keyword-matching message and counts it if it is outside the cooldown of the last counted one."""
+        self.messages[message_id] = timestamp
+        if self.backfilling:
+            return
+        if self.last_counted is not None and timestamp - self.last_counted < cooldown:
+            return
+        self.count += 1
+        self.last_counted = timestamp
+
+    def rebuild(self, cooldown: int):
+        """Recounts the recorded messages in time order (after a backfill or a deletion)."""
+        self.count, self.last_counted = 0, None
+        for timestamp in sorted(self.messages.values()):
+            if self.last_counted is not None and timestamp - self.last_counted < cooldown:
+                continue
+            self.count += 1
+            self.last_counted = timestamp
+
+    def remove(self, message_ids: Iterable[int], cooldown: int) -> bool:
+        """Forgets deleted messages. Returns True if any of them was recorded."""
+        removed = False
+        for message_id in message_ids:
+            if self.messages.pop(message_id, None) is not None:
+                removed = True
+        if removed and not self.backfilling:
+            self.rebuild(cooldown) # A later message held back by the cooldown may count now
+        return removed
 
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            stats_dict = json.load(f)
-            for user_id_str, user_stats_dict in stats_dict.items():
-                try:
-                    user_id = int(user_id_str)
-                    stats[user_id] = UserGiveawayStats.from_dict(user_stats_dict)
-                except Exception as e:
-                    logger.error(f"Failed to load individual user stats {user_id_str} for guild {guild_id}: {e}")
-            logger.debug(f"Loaded {len(stats)} user stats from {file_path} for guild {guild_id}")
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON from user stats file for guild {guild_id}. File might be corrupt or empty.", exc_info=True)
-    except Exception as e:
-        logger.error(f"Failed to load user stats for guild {guild_id}: {e}", exc_info=True)
-    return stats
 
-def save_guild_user_stats(stats: Dict[int, UserGiveawayStats], guild_id: int):
-    """Saves user stats for a guild."""
-    try:
-        file_path = get_guild_user_stats_file(guild_id)
-        stats_to_save = {str(user_id): user_stats.to_dict() for user_id, user_stats in stats.items()}
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(stats_to_save, f, indent=4)
-        logger.debug(f"Saved {len(stats)} user stats for guild {guild_id}")
-    except Exception as e:
-        logger.error(f"Failed to save user stats for guild {guild_id}: {e}", exc_info=True)
+@dataclass
+class ChannelBackfill:
+    """One shared history walk of a count channel, covering every giveaway there that needs a backfill."""
+    channel_id: int
+    giveaway_ids: Set[int] # Fixed when the walk is created
+    cursor: Optional[int] = None # ID of the last scanned message; a retried walk resumes after it
+    scanned: int = 0
+    found: Dict[int, Dict[int, Dict[int, float]]] = field(default_factory=dict) # giveaway message_id: { user_id: { message_id: timestamp } }
+    future: Optional[asyncio.Future] = None
+
+
+class MessageCountIndex:
+    """
+    Per (channel_id, user_id) message tallies for giveaways with a min_messages requirement.
+    Keywords and cooldown are applied when a message arrives, so a join check is a dict lookup.
+    Giveaways restored after a restart need a one-time history backfill for the time the bot was
+    offline; live messages seen before it completes are merged in by message ID (no double counting).
+    Deleted messages stop counting (remove_messages, fed by the raw delete events), like a fresh
+    history walk would only see the messages that still exist.
+    """
+    def __init__(self):
+        self._by_channel: Dict[int, Dict[int, GiveawayData]] = {} # count channel_id: { giveaway message_id: giveaway }
+        self._tallies: Dict[Tuple[int, int], Dict[int, MessageTally]] = {} # (channel_id, user_id): { giveaway message_id: tally }
+        self._users: Dict[int, Set[int]] = {} # giveaway message_id: user IDs with a tally (for cleanup)
+        self._needs_backfill: Set[int] = set() # giveaway message_ids still waiting for their history walk
+        self._backfills: Dict[int, ChannelBackfill] = {} # count channel_id: shared history walk (kept across failed attempts)
+        self._authors: Dict[int, Dict[int, int]] = {} # count channel_id: { recorded message_id: author user_id } (for deletions)
+
+    @staticmethod
+    def count_channel_id(giveaway: GiveawayData) -> int:
+        return giveaway.message_count_channel_id or giveaway.channel_id
+
+    def is_tracked(self, giveaway: GiveawayData) -> bool:
+        return giveaway.message_id in self._users
+
+    def track(self, giveaway: GiveawayData, backfill: bool = False):
+        """
+        Starts counting messages for a giveaway. Pass backfill=True if messages may have been
+        sent since start_time while the bot was not listening (e.g. restored on startup).
+        """
+        if giveaway.min_messages <= 0 or giveaway.is_drop:
+            return
+        self._by_channel.setdefault(self.count_channel_id(giveaway), {})[giveaway.message_id] = giveaway
+        self._users.setdefault(giveaway.message_id, set())
+        if backfill:
+            self._needs_backfill.add(giveaway.message_id)
+
+    def untrack(self, giveaway: GiveawayData):
+        """Stops counting for a giveaway and frees its tallies."""
+        msg_id = giveaway.message_id
+        channel_id = self.count_channel_id(giveaway)
+        channel_giveaways = self._by_channel.get(channel_id)
+        if channel_giveaways is not None:
+            channel_giveaways.pop(msg_id, None)
+            if not channel_giveaways:
+                del self._by_channel[channel_id]
+        authors = self._authors.get(channel_id)
+        if channel_id not in self._by_channel:
+            self._authors.pop(channel_id, None) # Nothing counts in this channel any more
+            authors = None
+        self._needs_backfill.discard(msg_id)
+        state = self._backfills.get(channel_id)
+        if state is not None:
+            state.giveaway_ids.discard(msg_id)
+            state.found.pop(msg_id, None)
+            if not state.giveaway_ids: # Nobody left to walk for
+                if state.future and not state.future.done():
+                    state.future.cancel()
+                del self._backfills[channel_id]
+        for user_id in self._users.pop(msg_id, ()):
+            user_tallies = self._tallies.get((channel_id, user_id))
+            if user_tallies is not None:
+                tally = user_tallies.pop(msg_id, None)
+                if not user_tallies:
+                    del self._tallies[(channel_id, user_id)]
+                if tally is not None and authors is not None:
+                    for message_id in tally.messages: # Still needed if another giveaway here recorded it
+                        if not any(message_id in other.messages for other in user_tallies.values()):
+                            authors.pop(message_id, None)
+
+    def _get_tally(self, channel_id: int, user_id: int, msg_id: int) -> MessageTally:
+        user_tallies = self._tallies.setdefault((channel_id, user_id), {})
+        tally = user_tallies.get(msg_id)
+        if tally is None:
+            tally = user_tallies[msg_id] = MessageTally(backfilling=msg_id in self._needs_backfill)
+            self._users[msg_id].add(user_id)
+        return tally
+
+    def ingest(self, message: discord.Message):
+        """Counts a newly created message for every giveaway tracking its channel."""
+        channel_giveaways = self._by_channel.get(message.channel.id)
+        if not channel_giveaways:
+            return
+        timestamp = message.created_at.timestamp()
+        for msg_id, giveaway in channel_giveaways.items():
+            if message.created_at < giveaway.start_time or not giveaway.keyword_matcher.matches(message.content):
+                continue
+            tally = self._get_tally(message.channel.id, message.author.id, msg_id)
+            tally.add(message.id, timestamp, giveaway.message_cooldown_seconds)
+            self._authors.setdefault(message.channel.id, {})[message.id] = message.author.id
+
+    def remove_messages(self, channel_id: int, message_ids: Iterable[int]) -> int:
+        """Stops counting deleted messages. Returns the number of tallies that changed."""
+        authors = self._authors.get(channel_id)
+        if not authors:
+            return 0
+        by_user: Dict[int, List[int]] = {}
+        for message_id in message_ids:
+            user_id = authors.pop(message_id, None)
+            if user_id is not None:
+                by_user.setdefault(user_id, []).append(message_id)
+        changed = 0
+        giveaways = self._by_channel.get(channel_id, {})
+        state = self._backfills.get(channel_id)
+        for user_id, deleted in by_user.items():
+            for gid, tally in self._tallies.get((channel_id, user_id), {}).items():
+                giveaway = giveaways.get(gid)
+                if tally.remove(deleted, giveaway.message_cooldown_seconds if giveaway else 0):
+                    changed += 1
+            if state is not None: # Already seen by a history walk still in progress
+                for found in state.found.values():
+                    user_found = found.get(user_id)
+                    if user_found:
+                        for message_id in deleted:
+                            user_found.pop(message_id, None)
+        return changed
+
+    def count(self, giveaway: GiveawayData, user_id: int) -> int:
+        """Eligible messages of a user for a giveaway. Only exact once ensure_backfilled has completed."""
+        tally = self._tallies.get((self.count_channel_id(giveaway), user_id), {}).get(giveaway.message_id)
+        return tally.count if tally else 0
+
+    async def ensure_backfilled(self, giveaway: GiveawayData, channel: discord.abc.Messageable):
+        """
+        Makes sure the giveaway's counts include messages sent before live tracking began.
+        All giveaways waiting on the same channel are filled by one shared history walk;
+        concurrent callers await the same in-flight future.
+        """
+        if not self.is_tracked(giveaway):
+            self.track(giveaway, backfill=True) # Not tracked yet (should not happen), count from history
+        msg_id = giveaway.message_id
+        channel_id = self.count_channel_id(giveaway)
+        while msg_id in self._needs_backfill:
+            state = self._backfills.get(channel_id)
+            if state is None:
+                waiting = {gid for gid in self._by_channel.get(channel_id, {}) if gid in self._needs_backfill}
+                state = self._backfills[channel_id] = ChannelBackfill(channel_id=channel_id, giveaway_ids=waiting)
+            if state.future is None or state.future.done(): # Not started yet, or the last attempt failed
+                state.future = asyncio.ensure_future(self._run_backfill(state, channel))
+            # A cancelled interaction must not cancel the shared walk. Giveaways tracked after this
+            # walk started are not covered by it; the loop starts a new walk for them afterwards.
+            try:
+                await asyncio.shield(state.future)
+            except asyncio.CancelledError:
+                if not state.future.cancelled():
+                    raise # The caller itself was cancelled
+                # The walk was dropped because all of its giveaways ended; re-check
+
+    async def _run_backfill(self, state: ChannelBackfill, channel: discord.abc.Messageable):
+        """Walks the channel once for every giveaway in state, resuming after state.cursor on retries."""
+        giveaways = {gid: self._by_channel.get(state.channel_id, {}).get(gid) for gid in state.giveaway_ids}
+        giveaways = {gid: gw for gid, gw in giveaways.items() if gw is not None}
+        if giveaways:
+            if state.cursor is not None:
+                after = discord.Object(id=state.cursor)
+                logger.info(f"Resuming message count backfill in channel {state.channel_id} after message {state.cursor}.")
+            else:
+                after = min(gw.start_time for gw in giveaways.values())
+            async for msg in channel.history(limit=None, after=after, oldest_first=True):
+                timestamp = msg.created_at.timestamp()
+                for gid, gw in giveaways.items():
+                    if msg.created_at >= gw.start_time and gw.keyword_matcher.matches(msg.content):
+                        state.found.setdefault(gid, {}).setdefault(msg.author.id, {})[msg.id] = timestamp
+                        self._authors.setdefault(state.channel_id, {})[msg.id] = msg.author.id
+                state.cursor = msg.id
+                state.scanned += 1
+
+        # Rebuild every tally from history plus live messages, in time order
+        for gid, gw in giveaways.items():
+            if gid not in self._needs_backfill:
+                continue # Untracked while walking
+            found = state.found.get(gid, {})
+            for user_id in found:
+                self._get_tally(state.channel_id, user_id, gid)
+            for user_id in self._users[gid]:
+                tally = self._tallies[(state.channel_id, user_id)][gid]
+                tally.messages.update(found.get(user_id, {})) # Same message IDs as live ones merge
+                tally.backfilling = False
+                tally.rebuild(gw.message_cooldown_seconds)
+            self._needs_backfill.discard(gid)
+        if self._backfills.get(state.channel_id) is state:
+            del self._backfills[state.channel_id]
+        logger.info(f"Backfilled message counts for {len(giveaways)} giveaway(s) in channel {state.channel_id} from {state.scanned} message(s).")
 
 
 # -------------------------------------------------------------------
@@ -476,6 +3265,62 @@ def parse_duration(duration_str: str) -> Optional[timedelta]:
 
     return timedelta(seconds=total_seconds)
 
+# -------------------------------------------------------------------
+# Winner Drawing (New)
+# -------------------------------------------------------------------
+def draw_weighted_winners(entries: Dict[int, int], k: int, rng: random.Random = random, use_numpy: Optional[bool] = None) -> List[int]:
+    """
+    Draws up to k distinct users, each weighted by their entry count, without replacement.
+    Uses Efraimidis-Spirakis keys (log(u) / weight, keep the k largest): O(n log k) time,
+    no list with one item per entry, and always exactly min(k, users with entries > 0) winners.
+    Winners are returned in draw order.
+    use_numpy=None picks the NumPy path for pools of NUMPY_DRAW_THRESHOLD or more when NumPy is installed.
+    A given rng also drives the NumPy path (its generator is seeded from rng), so seeded draws stay reproducible.
+    """
+    if k <= 0 or not entries:
+        return []
+    if use_numpy is None:
+        use_numpy = np is not None and len(entries) >= NUMPY_DRAW_THRESHOLD
+    if use_numpy:
+        generator = None if rng is random else np.random.default_rng(rng.getrandbits(64))
+        return draw_weighted_winners_numpy(entries, k, generator)
+    rand, log = rng.random, math.log
+    users = list(entries)
+    # 1 - random() is in (0, 1], so log() is defined; users without entries can never be drawn
+    keys = [log(1.0 - rand()) / weight if weight > 0 else -math.inf for weight in entries.values()]
+    top = heapq.nlargest(k, range(len(keys)), key=keys.__getitem__)
+    return [users[i] for i in top if keys[i] != -math.inf]
+
+_numpy_rng = None
+
+def draw_weighted_winners_numpy(entries: Dict[int, int], k: int, generator: Optional["np.random.Generator"] = None) -> List[int]:
+    """
+    Vectorized draw_weighted_winners. IDs and entries are copied into contiguous int64/int32 arrays,
+    keys are exponential variates divided by the weight (the k smallest win, equivalent to
+    log(u) / weight largest), and the top k are found with argpartition in O(n).
+    """
+    global _numpy_rng
+    if np is None:
+        raise RuntimeError("NumPy is not installed")
+    if generator is None:
+        if _numpy_rng is None:
+            _numpy_rng = np.random.default_rng()
+        generator = _numpy_rng
+    count = len(entries)
+    ids = np.fromiter(entries.keys(), dtype=np.int64, count=count) # Discord IDs fit in int64
+    weights = np.fromiter(entries.values(), dtype=np.int32, count=count)
+    has_entries = weights > 0
+    if not has_entries.all():
+        ids, weights = ids[has_entries], weights[has_entries]
+    k = min(k, len(ids))
+    if k == 0:
+        return []
+    keys = generator.standard_exponential(len(ids)) / weights
+    top = np.argpartition(keys, k - 1)[:k]
+    top = top[np.argsort(keys[top])] # Draw order
+    return ids[top].tolist()
+
+
 # -------------------------------------------------------------------
 # Giveaway Embed Generator (Updated)
 # -------------------------------------------------------------------
@@ -581,6 +3426,8 @@ def create_giveaway_embed(giveaway: GiveawayData, bot: commands.Bot, status: str
                  req_text += f" (with >{giveaway.message_cooldown_seconds}s cooldown)"
             if giveaway.required_keywords:
                  req_text += f" (containing keywords: {', '.join(giveaway.required_keywords)})"
+                 if giveaway.keyword_whole_word: req_text += " (whole words)"
+                 if giveaway.keyword_case_sensitive: req_text += " (case-sensitive)"
             requirements.append(req_text)
 
         # Add requirements field if any exist
@@ -603,9 +3450,8 @@ def create_giveaway_embed(giveaway: GiveawayData, bot: commands.Bot, status: str
 
         # Display Bypass Roles
         all_bypass_roles = set(giveaway.bypass_role_ids)
-        guild_settings_from_cog = bot.giveaway_cog.guild_settings.get(giveaway.guild_id) # Access settings from cog
-        if guild_settings_from_cog and guild_settings_from_cog.default_bypass_role_ids:
-             all_bypass_roles.update(guild_settings_from_cog.default_bypass_role_ids)
+        if settings.default_bypass_role_ids:
+             all_bypass_roles.update(settings.default_bypass_role_ids)
 
         if all_bypass_roles:
              bypass_str = ""
@@ -619,8 +3465,8 @@ def create_giveaway_embed(giveaway: GiveawayData, bot: commands.Bot, status: str
         all_blacklist_roles = set()
         if giveaway.blacklist_role_id:
             all_blacklist_roles.add(giveaway.blacklist_role_id)
-        if guild_settings_from_cog and guild_settings_from_cog.default_blacklist_role_id:
-             all_blacklist_roles.add(guild_settings_from_cog.default_blacklist_role_id)
+        if settings.default_blacklist_role_id:
+             all_blacklist_roles.add(settings.default_blacklist_role_id)
 
         if all_blacklist_roles:
              blacklist_str = ""
@@ -651,36 +3497,12 @@ def create_giveaway_embed(giveaway: GiveawayData, bot: commands.Bot, status: str
 # Active Giveaway View (Used while giveaway is running) - NEW CLASS
 # -------------------------------------------------------------------
 class ActiveGiveawayView(discord.ui.View):
-    def __init__(self, cog_ref):
+    def __init__(self, cog_ref, participant_count: int = 0):
         super().__init__(timeout=None) # Persistent View
         self.cog = cog_ref # Reference to the Giveaway cog instance
-
-    # Add the buttons in __init__ for clarity of active state
-    def __init__(self, cog_ref):
-        super().__init__(timeout=None)
-        self.cog = cog_ref
-        # Add buttons directly
-        self.add_item(discord.ui.Button(label="Join", style=discord.ButtonStyle.green, emoji="<:EventsHost:1368365113521995858>", custom_id=GIVEAWAY_JOIN_ID))
-        # Initial label will be set by update_participant_count on load/start
-        self.add_item(discord.ui.Button(label="0", style=discord.ButtonStyle.blurple, emoji="<:group:1369320729404899349>", custom_id=GIVEAWAY_LIST_ID)) # Participant count only
-        self.add_item(discord.ui.Button(label="End", style=discord.ButtonStyle.red, custom_id=GIVEAWAY_END_BUTTON_ID))
-
-
-    async def update_participant_count(self, interaction: discord.Interaction, giveaway: GiveawayData):
-        """Helper to update the participants button label."""
-        participant_count = len(giveaway.participants)
-        for item in self.children:
-            # Update label and emoji for the participants button
-            if isinstance(item, discord.ui.Button) and item.custom_id == GIVEAWAY_LIST_ID:
-                item.label = f"{participant_count}" # Only count
-                # Emoji <:group:1369320729404899349> is already set in __init__
-                break
-        # The view needs to be updated on the message for the change to be visible.
-        # This update is triggered by the interaction response or followup.
-        # For participant count updates specifically, we might need to fetch the message
-        # and edit the view *after* the initial interaction response, which is complex.
-        # Let's rely on the join/leave interactions themselves to trigger a view update
-        # via the followup.edit_message or interaction.edit_original_response.
+        # Buttons come from the decorated callbacks below. Count edits send a new view per message
+        # (see ParticipantCountRenderer); the instance registered in cog_load is never edited.
+        self.participants_button.label = str(participant_count) # Participant count only
 
 
     @discord.ui.button(label="Join", style=discord.ButtonStyle.green, emoji="<:EventsHost:1368365113521995858>", custom_id=GIVEAWAY_JOIN_ID)
@@ -707,11 +3529,11 @@ class ActiveGiveawayView(discord.ui.View):
         # --- Double-Click to Leave Logic ---
         if user.id in giveaway.participants:
             del giveaway.participants[user.id]
-            self.cog.save_active_giveaways_for_guild(giveaway.guild_id)
-            # Update participant count and view
-            await self.update_participant_count(interaction, giveaway)
+            await self.cog.record_participant_leave(giveaway, user.id)
+            # Update the count button (coalesced with other joins/leaves)
+            self.cog.count_renderer.request(giveaway.message_id)
             await interaction.followup.send("You have left the giveaway.", ephemeral=True)
-            logger.info(f"{user} (ID: {user.id}) left giveaway {giveaway.giveaway_id}/{giveaway.message.id} in guild {guild.id} by clicking Join again.")
+            logger.info(f"{user} (ID: {user.id}) left giveaway {giveaway.giveaway_id}/{giveaway.message_id} in guild {guild.id} by clicking Join again.")
             # Do NOT log leave event here as per new logging requirement (only start/end/cancel/reroll)
             return # User successfully left
 
@@ -721,26 +3543,17 @@ class ActiveGiveawayView(discord.ui.View):
         if not member:
              return await interaction.followup.send("Could not verify your membership status.", ephemeral=True)
 
-        # Combine giveaway-specific and default bypass roles
-        all_bypass_roles = set(giveaway.bypass_role_ids)
-        guild_settings = self.cog.guild_settings.get(guild.id)
-        if guild_settings and guild_settings.default_bypass_role_ids:
-             all_bypass_roles.update(guild_settings.default_bypass_role_ids)
-
-        member_roles_set = {role.id for role in member.roles}
-        has_bypass = any(role_id in all_bypass_roles for role_id in member_roles_set)
+        # Giveaway and default bypass/blacklist/required/bonus roles, compiled once per giveaway
+        guild_settings = await self.cog.get_guild_settings(guild.id)
+        eligibility = giveaway.role_eligibility(guild_settings)
+        role_flags, bonus_entries = eligibility.member_flags(member)
+        has_bypass = bool(role_flags & ROLE_BYPASS)
 
 
         # 1. Blacklist Role Check (if not bypassed)
         if not has_bypass:
-             all_blacklist_roles = set()
-             if giveaway.blacklist_role_id:
-                 all_blacklist_roles.add(giveaway.blacklist_role_id)
-             if guild_settings and guild_settings.default_blacklist_role_id:
-                  all_blacklist_roles.add(guild_settings.default_blacklist_role_id)
-
-             if any(role_id in all_blacklist_roles for role_id in member_roles_set):
-                  blacklist_role_names = [guild.get_role(rid).name for rid in all_blacklist_roles if guild.get_role(rid)]
+             if role_flags & ROLE_BLACKLIST:
+                  blacklist_role_names = [guild.get_role(rid).name for rid in eligibility.blacklist_role_ids if guild.get_role(rid)]
                   role_list_str = ", ".join(blacklist_role_names) if blacklist_role_names else "a blacklisted role"
                   return await interaction.followup.send(
                        f"You have {role_list_str} and cannot join this giveaway.", ephemeral=True
@@ -750,7 +3563,7 @@ class ActiveGiveawayView(discord.ui.View):
         # 2. Required Role Check (if not bypassed) - Only for normal giveaways
         if not has_bypass and not giveaway.is_drop and giveaway.required_role_id: # Add is_drop check
             required_role = guild.get_role(giveaway.required_role_id)
-            if required_role and required_role.id not in member_roles_set:
+            if required_role and not role_flags & ROLE_REQUIRED:
                 return await interaction.followup.send(
                     f"You need the **{required_role.name}** role to join this giveaway.", ephemeral=True
                 )
@@ -772,25 +3585,10 @@ class ActiveGiveawayView(discord.ui.View):
                  logger.error(f"Bot lacks permission to read history in channel {count_channel.id} for giveaway {giveaway.message.id}")
                  return await interaction.followup.send(f"I don't have permission to check message history in {count_channel.mention}.", ephemeral=True)
 
-            message_count = 0
-            last_counted_message_time: Optional[datetime] = None
-
             try:
-                async for msg in count_channel.history(limit=None, after=giveaway.start_time.replace(tzinfo=None), before=datetime.now(timezone.utc).replace(tzinfo=None)): # Remove tzinfo for comparison if needed
-                     if msg.author.id == user.id:
-                         if giveaway.required_keywords:
-                             message_content_lower = msg.content.lower()
-                             if not any(keyword.lower() in message_content_lower for keyword in giveaway.required_keywords):
-                                  continue
-
-                         if giveaway.message_cooldown_seconds > 0:
-                              if last_counted_message_time is not None:
-                                   time_since_last_counted = msg.created_at.replace(tzinfo=None) - last_counted_message_time.replace(tzinfo=None) # Compare naive datetimes
-                                   if time_since_last_counted.total_seconds() < giveaway.message_cooldown_seconds:
-                                        continue
-
-                         message_count += 1
-                         last_counted_message_time = msg.created_at # Keep original datetime with tzinfo
+                # Counts are kept up to date by on_message; history is only read once after a restart
+                await self.cog.message_counts.ensure_backfilled(giveaway, count_channel)
+                message_count = self.cog.message_counts.count(giveaway, user.id)
 
 
                 if message_count < giveaway.min_messages:
@@ -801,6 +3599,8 @@ class ActiveGiveawayView(discord.ui.View):
                          req_text += f" Messages must be sent with more than {giveaway.message_cooldown_seconds} seconds apart."
                      if giveaway.required_keywords:
                          req_text += f" Messages must contain one of the required keywords: {', '.join(giveaway.required_keywords)}."
+                         if giveaway.keyword_whole_word or giveaway.keyword_case_sensitive:
+                             req_text += f" Keywords are matched{' as whole words' if giveaway.keyword_whole_word else ''}{' case-sensitively' if giveaway.keyword_case_sensitive else ''}."
 
                      req_text += f" You currently have {message_count} eligible message(s)."
 
@@ -816,11 +3616,7 @@ class ActiveGiveawayView(discord.ui.View):
 
         # --- Calculate Entries ---
         # If we reached here, requirements are met (or bypassed) and user is joining
-        total_entries = 1 # Base entry
-        if not giveaway.is_drop: # Bonus entries only for normal giveaways
-            for role_id, bonus in giveaway.bonus_entries.items():
-                if role_id in member_roles_set:
-                    total_entries += bonus
+        total_entries = 1 + bonus_entries # Base entry + bonus roles (always 0 for drops)
 
         # --- Add Participant ---
         # Check again if it's a drop and already has participants (should only allow 1)
@@ -830,15 +3626,10 @@ class ActiveGiveawayView(discord.ui.View):
              return await interaction.followup.send("Someone else was faster!", ephemeral=True)
 
         giveaway.participants[user.id] = total_entries
-        self.cog.save_active_giveaways_for_guild(giveaway.guild_id)
+        await self.cog.record_participant_join(giveaway, user.id, total_entries)
 
-        # Update button label and view
-        await self.update_participant_count(interaction, giveaway)
-        # Edit the original message to update the view with the new participant count label
-        try:
-             await interaction.edit_original_response(view=self)
-        except Exception as e:
-             logger.warning(f"Failed to edit original response to update view for giveaway {giveaway.message.id}: {e}")
+        # Update the count button on the giveaway message (coalesced with other joins/leaves)
+        self.cog.count_renderer.request(giveaway.message_id)
 
 
         # --- Handle Drop Giveaway Instant Win ---
@@ -854,12 +3645,8 @@ class ActiveGiveawayView(discord.ui.View):
              else:
                  # If they joined but were not the first (race condition)
                  del giveaway.participants[user.id] # Remove their entry
-                 self.cog.save_active_giveaways_for_guild(giveaway.guild_id) # Save the state
-                 await self.update_participant_count(interaction, giveaway) # Update count display
-                 try:
-                    await interaction.edit_original_response(view=self)
-                 except:
-                    pass
+                 await self.cog.record_participant_leave(giveaway, user.id) # Save the state
+                 self.cog.count_renderer.request(giveaway.message_id) # Update count display
                  return await interaction.followup.send("Someone else claimed the drop just before you!", ephemeral=True)
 
 
@@ -886,10 +3673,12 @@ class ActiveGiveawayView(discord.ui.View):
         if not giveaway.participants:
             return await interaction.followup.send("No one has joined the giveaway yet.", ephemeral=True)
 
-        # Create a list of participants - fetch members for mentions
+        # Create a list of participants - resolve only as many members as fit in one message
+        shown = list(itertools.islice(giveaway.participants.items(), PARTICIPANT_LIST_MAX_SHOWN))
+        members = await self.cog.user_resolver.resolve_members(guild, [user_id for user_id, _ in shown])
         participant_mentions = []
-        for user_id, entries in giveaway.participants.items():
-            member = guild.get_member(user_id)
+        for user_id, entries in shown:
+            member = members.get(user_id)
             mention = member.mention if member else f"User ID: {user_id}"
             # Only show entries for non-drop giveaways
             entry_text = f" ({entries} entries)" if not giveaway.is_drop else ""
@@ -897,7 +3686,7 @@ class ActiveGiveawayView(discord.ui.View):
 
 
         description = "**Participants:**\n" + "\n".join(participant_mentions)
-        if len(description) > 1900: # Keep buffer for safety
+        if len(description) > 1900 or len(shown) < len(giveaway.participants): # Keep buffer for safety
             description = description[:1900] + "\n... (list truncated)"
 
         await interaction.followup.send(description, ephemeral=True)
@@ -922,7 +3711,7 @@ class ActiveGiveawayView(discord.ui.View):
         if not member:
             return await interaction.followup.send("Could not verify your identity.", ephemeral=True)
 
-        guild_settings = self.cog.guild_settings.get(guild.id)
+        guild_settings = await self.cog.get_guild_settings(guild.id)
         is_staff = False
         if guild_settings and guild_settings.staff_role_id:
             staff_role = guild.get_role(guild_settings.staff_role_id)
@@ -940,11 +3729,9 @@ class ActiveGiveawayView(discord.ui.View):
             return await interaction.followup.send(perm_msg, ephemeral=True)
 
 
-        # Cancel the scheduled end task (if it exists and is running)
-        if self.cog.giveaway_end_tasks.get(interaction.message.id):
-             self.cog.giveaway_end_tasks[interaction.message.id].cancel()
-             del self.cog.giveaway_end_tasks[interaction.message.id]
-             logger.info(f"Cancelled scheduled end task for giveaway {giveaway.giveaway_id}/{giveaway.message.id} due to early end.")
+        # Remove the giveaway from the end scheduler (if it is scheduled)
+        if self.cog.scheduler.cancel(interaction.message.id):
+             logger.info(f"Unscheduled end of giveaway {giveaway.giveaway_id}/{giveaway.message.id} due to early end.")
 
         # End the giveaway immediately
         await self.cog.end_giveaway(interaction.message.id, ended_by=interaction.user)
@@ -961,8 +3748,9 @@ class EndedGiveawayView(discord.ui.View):
         self.cog = cog_ref
         self.giveaway_id = giveaway.giveaway_id # Store sequential ID
 
-        # Add Reroll Button
-        self.add_item(discord.ui.Button(label="Reroll", style=discord.ButtonStyle.primary, emoji="🎲", custom_id=GIVEAWAY_REROLL_BUTTON_ID))
+        # The Reroll button comes from the decorated callback below
+        # Final participant count (replaces the active view's count button, so the end edit shows the final count)
+        self.add_item(discord.ui.Button(label=str(len(giveaway.participants)), style=discord.ButtonStyle.blurple, emoji="<:group:1369320729404899349>", custom_id=GIVEAWAY_FINAL_COUNT_ID, disabled=True))
 
         # Add Link Button
         jump_url = f"https://discord.com/channels/{giveaway.guild_id}/{giveaway.channel_id}/{giveaway.message_id}"
@@ -978,7 +3766,7 @@ class EndedGiveawayView(discord.ui.View):
 
         # Permissions check: Host or Staff Role or Manage Guild
         # Get giveaway data from cache using the stored giveaway_id
-        giveaway = self.cog.get_giveaway_by_sequential_id(guild.id, self.giveaway_id)
+        giveaway = await self.cog.get_giveaway_by_sequential_id(guild.id, self.giveaway_id)
 
         if not giveaway or giveaway.guild_id != guild.id:
              # This shouldn't happen if the view is attached to the correct message
@@ -991,7 +3779,7 @@ class EndedGiveawayView(discord.ui.View):
             await interaction.response.send_message("Could not verify your identity.", ephemeral=True)
             return
 
-        guild_settings = self.cog.guild_settings.get(guild.id)
+        guild_settings = await self.cog.get_guild_settings(guild.id)
         is_staff = False
         if guild_settings and guild_settings.staff_role_id:
             staff_role = guild.get_role(guild_settings.staff_role_id)
@@ -1027,11 +3815,29 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         self.user_stats: Dict[int, Dict[int, UserGiveawayStats]] = {} # guild_id: { user_id: UserGiveawayStats } # New attribute for user stats
         # Secondary index for sequential ID lookup: (guild_id, giveaway_id) -> message_id
         self._sequential_id_map: Dict[tuple[int, int], int] = {}
-        self.giveaway_end_tasks: Dict[int, asyncio.Task] = {} # message_id: end_task
+        # Per-guild indexes (only changed through _register/_unregister/_cache_ended_giveaway)
+        self._active_by_guild: Dict[int, Dict[int, GiveawayData]] = {} # guild_id: { message_id: GiveawayData }
+        self._ended_by_guild: Dict[int, OrderedDict] = {} # guild_id: OrderedDict{ message_id: GiveawayData } (reroll cache, least recently used first)
+        self._ended_loaded_guilds: Set[int] = set() # Guilds whose reroll cache has been loaded (see ensure_ended_cache_loaded)
+        # Timed giveaway ends: one runner + min-heap hands due giveaways to a bounded end queue (both started in cog_load)
+        self.end_queue = GiveawayEndQueue(self._end_scheduled_giveaway)
+        self.scheduler = GiveawayScheduler(self._enqueue_giveaway_end, wait_ready=self.bot.wait_until_ready)
+        self.message_counts = MessageCountIndex() # Eligible message counts for min_messages requirements
+        # All message sends/edits from giveaway events go through one dispatcher (started in cog_load)
+        self.outbound = OutboundDispatcher()
+        # Cached, batched member/user lookups for winner lists, participant lists and DMs
+        self.user_resolver = UserResolver(self.bot)
+        # Winner/host DMs are queued here and sent under a global rate budget (started in cog_load)
+        self.dm_fanout = DirectMessageFanout(self.outbound, self._store_dm_results)
+        # Count button edits: at most one per giveaway message every PARTICIPANT_COUNT_EDIT_INTERVAL seconds
+        self.count_renderer = ParticipantCountRenderer(self._current_participant_count, self._render_participant_count)
+        # Write-behind store: joins/leaves mark the guild dirty, snapshots are flushed periodically
+        self.storage = AsyncStorage() # All storage I/O from coroutines goes through this
+        self.active_store = WriteBehindStore(self._active_giveaways_snapshot, lambda giveaways, guild_id: self.storage.save_giveaways_for_guild(giveaways, guild_id, is_ended=False))
         # Use NEW ActiveGiveawayView and EndedGiveawayView
         # Persistent views are registered in cog_load
 
-        # Load state on startup
+        # Load the active giveaway schedule on startup (everything else loads per guild on first use)
         self.load_state()
 
     def cog_load(self):
@@ -1049,136 +3855,296 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         self.bot.add_view(EndedGiveawayView(self, giveaway=GiveawayData(giveaway_id=0, message_id=0, channel_id=0, guild_id=0, prize="", host_id=0, winners_count=0, start_time=datetime.now(timezone.utc), end_time=datetime.now(timezone.utc)))) # Register ended view with minimal dummy data for registration
 
         logger.info("Persistent GiveawayViews registered.")
-        # Start the loop to check for ended giveaways missed during downtime
+        # Start the end scheduler and the safety-net loop for overdue giveaways
+        self.outbound.start()
+        self.dm_fanout.start()
+        self.end_queue.start()
+        self.scheduler.start()
         self.check_missed_giveaways.start()
-
-    def cog_unload(self):
-        # Cancel all running giveaway end tasks when cog unloads
-        for task in self.giveaway_end_tasks.values():
-            task.cancel()
+        # Start the write-behind flush loop for active giveaways
+        self.flush_active_giveaways.start()
+
+    async def cog_unload(self):
+        interrupted_ends = self.end_queue.in_progress # Ends cut off below may not have reached storage yet
+        # Stop the end scheduler (and any end it is running) when cog unloads
+        self.scheduler.stop()
+        self.end_queue.stop()
         self.check_missed_giveaways.cancel()
-        logger.info("Giveaway end tasks cancelled and check loop stopped.")
+        self.count_renderer.stop()
+        await self.dm_fanout.drain() # Hand queued DMs to the dispatcher and store their results
+        self.dm_fanout.stop()
+        await self.outbound.drain() # Let queued announcements/logs/DMs go out
+        self.outbound.stop()
+        # Stop the flush loop and write out anything still pending.
+        # bot.close() removes cogs, so this also runs on shutdown.
+        self.flush_active_giveaways.cancel()
+        await self.active_store.flush()
+        # Everything is on disk now; write the boot snapshot so the next start reads one file
+        if interrupted_ends:
+            logger.warning(f"{interrupted_ends} giveaway end(s) were interrupted by shutdown. Skipping the boot snapshot; the next start reads the guild files.")
+        else:
+            try:
+                await self.storage.write_boot_snapshot(self._active_by_guild, self._sequential_id_map)
+            except Exception as e:
+                logger.error(f"Failed to write boot snapshot: {e}", exc_info=True)
+        self.storage.shutdown()
+        logger.info(f"Giveaway scheduler and check loop stopped. Write-behind stats: {self.active_store.stats()}, count edits: {self.count_renderer.stats()}, outbound: {self.outbound.stats()}, DMs: {self.dm_fanout.stats()}, user lookups: {self.user_resolver.stats()}")
 
     def load_state(self):
-        """Loads guild settings, active giveaways, ended giveaways, and user stats from per-guild files."""
+        """
+        Loads the active giveaways of every guild and schedules their ends.
+        After a clean shutdown they come from the boot snapshot (one file); otherwise guild directories
+        are read concurrently, and with JSON storage each one is rebuilt from its snapshot plus journal tail.
+        Guild settings, reroll caches and user stats are not read here; they load per guild on first use
+        (get_guild_settings, ensure_ended_cache_loaded, get_guild_user_stats), so startup time only
+        depends on how many giveaways are running.
+        """
         self.active_giveaways = {}
         self.ended_giveaways_cache = {}
         self.guild_settings = {}
         self.user_stats = {} # Initialize user_stats
         self._sequential_id_map = {}
+        self._active_by_guild = {}
+        self._ended_by_guild = {}
+        self._ended_loaded_guilds = set()
 
         now = datetime.now(timezone.utc)
-
-        if not os.path.exists(STORAGE_DIR):
-             logger.info(f"Storage directory '{STORAGE_DIR}' not found. No state to load.")
-             return
-
-        # Iterate through guild directories
-        for item in os.listdir(STORAGE_DIR):
-            guild_dir = os.path.join(STORAGE_DIR, item)
-            if os.path.isdir(guild_dir):
-                try:
-                    guild_id = int(item)
-                except ValueError:
-                    logger.warning(f"Invalid directory name in storage: {item}. Skipping.")
-                    continue
-
-                # Load settings for this guild
-                settings = load_guild_settings(guild_id)
-                self.guild_settings[guild_id] = settings
-
-                # Load active giveaways for this guild
-                active_guild_giveaways = load_giveaways_for_guild(guild_id, is_ended=False)
-                giveaways_to_remove = []
-
-                for msg_id, giveaway in active_guild_giveaways.items():
-                     if giveaway.ended:
-                         giveaways_to_remove.append(msg_id)
-                         continue
-
-                     self.active_giveaways[msg_id] = giveaway
-                     # Add to sequential ID map
-                     if giveaway.giveaway_id:
-                         self._sequential_id_map[(giveaway.guild_id, giveaway.giveaway_id)] = msg_id
-
-                     if giveaway.end_time <= now and not giveaway.is_drop: # Only schedule standard giveaways
-                         # Giveaway should have ended while bot was offline
-                         logger.info(f"Giveaway {giveaway.giveaway_id}/{msg_id} in guild {guild_id} end time passed while offline. Scheduling immediate end.")
-                         # Schedule to end ASAP, not blocking startup
-                         asyncio.create_task(self.end_giveaway(msg_id, ended_by=self.bot.user))
-                     elif not giveaway.ended and not giveaway.is_drop: # Only schedule standard giveaways if not ended
-                         # Schedule the end task for giveaways still active
-                         self.schedule_giveaway_end(giveaway)
-                    # Note: Drop giveaways are not scheduled via timer, they end on first join
-
-
-                # Remove giveaways that were somehow marked ended in the active file
-                if giveaways_to_remove:
-                    for msg_id in giveaways_to_remove:
-                        active_guild_giveaways.pop(msg_id, None)
-                    save_giveaways_for_guild(active_guild_giveaways, guild_id, is_ended=False)
-
-                # Load ended giveaways cache for this guild
-                ended_guild_giveaways = load_giveaways_for_guild(guild_id, is_ended=True)
-                # Limit cache size on load if necessary
-                if len(ended_guild_giveaways) > MAX_ENDED_GIVEAWAYS_STORED:
-                    # Sort by end time and keep the most recent
-                    sorted_ended = sorted(ended_guild_giveaways.items(), key=lambda item: item[1].end_time, reverse=True)
-                    ended_guild_giveaways = dict(sorted_ended[:MAX_ENDED_GIVEAWAYS_STORED])
-                    # Resave to trim
-                    save_giveaways_for_guild(ended_guild_giveaways, guild_id, is_ended=True)
-
-
-                for msg_id, giveaway in ended_guild_giveaways.items():
-                    self.ended_giveaways_cache[msg_id] = giveaway
-                    # Add to sequential ID map (even if ended, for reroll lookup)
-                    if giveaway.giveaway_id:
-                         self._sequential_id_map[(giveaway.guild_id, giveaway.giveaway_id)] = msg_id
-
-                # Load user stats for this guild (New)
-                guild_user_stats = load_guild_user_stats(guild_id)
-                self.user_stats[guild_id] = guild_user_stats # Store user stats per guild
-
-
-        logger.info(f"Initial state loaded. Active: {len(self.active_giveaways)}, Ended Cache: {len(self.ended_giveaways_cache)}, Guilds: {len(self.guild_settings)}, User Stats Guilds: {len(self.user_stats)}")
-
-
-    def save_active_giveaways_for_guild(self, guild_id: int):
-        """Saves active giveaways filtered by guild ID."""
-        guild_active_giveaways = {msg_id: gw for msg_id, gw in self.active_giveaways.items() if gw.guild_id == guild_id and not gw.ended}
-        save_giveaways_for_guild(guild_active_giveaways, guild_id, is_ended=False)
-
-    def save_ended_giveaway_cache_for_guild(self, giveaway: GiveawayData):
-        """Adds an ended giveaway to the cache file for reroll for its guild."""
-        guild_id = giveaway.guild_id
-        file_path = get_guild_giveaways_file(guild_id, is_ended=True)
-
-        # Load existing cache for this guild
-        guild_ended_giveaways = load_giveaways_for_guild(guild_id, is_ended=True)
-
-        # Add/update the new ended giveaway
-        guild_ended_giveaways[giveaway.message_id] = giveaway
-
-        # Limit cache size
-        if len(guild_ended_giveaways) > MAX_ENDED_GIVEAWAYS_STORED:
-            # Remove the oldest ones based on end time
-            sorted_ended = sorted(guild_ended_giveaways.items(), key=lambda item: item[1].end_time, reverse=True)
-            guild_ended_giveaways = dict(sorted_ended[:MAX_ENDED_GIVEAWAY_STORED])
-
-        # Save the updated cache
-        save_giveaways_for_guild(guild_ended_giveaways, guild_id, is_ended=True)
-
-        # Update global cache and map
-        self.ended_giveaways_cache[giveaway.message_id] = giveaway
+        timings = {} # phase: milliseconds
+        started = phase_started = time.perf_counter()
+        def end_phase(name: str):
+            nonlocal phase_started
+            phase_ended = time.perf_counter()
+            timings[name] = (phase_ended - phase_started) * 1000
+            phase_started = phase_ended
+
+        storage_backend.recover()
+        end_phase("recover")
+
+        snapshot = consume_boot_snapshot()
+        if snapshot is not None:
+            active_by_guild = snapshot.active
+            self._sequential_id_map.update(snapshot.sequential_ids) # Ended entries resolve once their guild's reroll cache loads
+            source = "boot snapshot"
+        else:
+            guild_ids = storage_backend.list_guild_ids()
+            active_by_guild = load_active_giveaways(guild_ids)
+            source = f"{len(guild_ids)} guild(s) in storage"
+        end_phase("read")
+
+        for guild_id, active_guild_giveaways in active_by_guild.items():
+            for msg_id, giveaway in active_guild_giveaways.items():
+                 # Index it; message counts need a backfill since messages may have been sent while offline
+                 self._register_active_giveaway(giveaway, backfill=True)
+
+                 if giveaway.end_time <= now and not giveaway.is_drop: # Only schedule standard giveaways
+                     # Giveaway should have ended while bot was offline
+                     logger.info(f"Giveaway {giveaway.giveaway_id}/{msg_id} in guild {guild_id} end time passed while offline. Scheduling immediate end.")
+                 if not giveaway.is_drop: # Only schedule standard giveaways
+                     # Overdue ones are ended as soon as the scheduler starts (once the bot is ready)
+                     self.schedule_giveaway_end(giveaway)
+                # Note: Drop giveaways are not scheduled via timer, they end on first join
+        end_phase("index")
+
+        phases = ", ".join(f"{name} {ms:.1f} ms" for name, ms in timings.items())
+        logger.info(f"Initial state loaded from {source} in {(time.perf_counter() - started) * 1000:.1f} ms ({phases}). "
+                    f"Active: {len(self.active_giveaways)} in {len(self._active_by_guild)} guild(s); settings, reroll caches and user stats load on first use.")
+
+    async def ensure_ended_cache_loaded(self, guild_id: int):
+        """
+        Loads a guild's reroll cache the first time it is needed, oldest first so the guild's count/age retention
+        evicts the oldest, and folds the ended journal into a fresh snapshot.
+        """
+        if guild_id in self._ended_loaded_guilds:
+            return
+        settings = await self.get_guild_settings(guild_id)
+        ended_guild_giveaways = await self.storage.load_ended_giveaways_for_guild(guild_id)
+        if guild_id in self._ended_loaded_guilds:
+            return # Another caller finished loading it while this one waited
+        self._ended_loaded_guilds.add(guild_id)
+
+        evicted = []
+        for giveaway in sorted(ended_guild_giveaways.values(), key=lambda gw: gw.end_time):
+            # Also maps the sequential ID (even if ended, for reroll lookup)
+            evicted.extend(self._cache_ended_giveaway(giveaway, settings))
+        if evicted:
+            await self.storage.remove_ended_giveaways(guild_id, evicted)
+        # Compact: fold the ended journal into a fresh reroll cache snapshot
+        if storage_backend.has_uncompacted_changes(guild_id, is_ended=True):
+            await self.storage.save_giveaways_for_guild(dict(self._ended_by_guild.get(guild_id, {})), guild_id, is_ended=True)
+        logger.debug(f"Loaded reroll cache for guild {guild_id}: {len(self._ended_by_guild.get(guild_id, {}))} giveaway(s), {len(evicted)} evicted.")
+
+
+    # --- Giveaway index mutation API (keeps the global dicts and secondary indexes consistent) ---
+    def _register_active_giveaway(self, giveaway: GiveawayData, backfill: bool = False):
+        """Adds a giveaway to the active dict, the guild/sequential ID indexes and the message count index."""
+        msg_id = giveaway.message_id
+        self.active_giveaways[msg_id] = giveaway
+        self._active_by_guild.setdefault(giveaway.guild_id, {})[msg_id] = giveaway
         if giveaway.giveaway_id:
-             self._sequential_id_map[(giveaway.guild_id, giveaway.giveaway_id)] = giveaway.message_id
-
+            self._sequential_id_map[(giveaway.guild_id, giveaway.giveaway_id)] = msg_id
+        self.message_counts.track(giveaway, backfill=backfill)
+
+    def _unregister_active_giveaway(self, giveaway: GiveawayData):
+        """Removes a giveaway from the active dict and indexes. The sequential ID stays mapped for later lookups."""
+        msg_id = giveaway.message_id
+        self.active_giveaways.pop(msg_id, None)
+        bucket = self._active_by_guild.get(giveaway.guild_id)
+        if bucket is not None:
+            bucket.pop(msg_id, None)
+            if not bucket:
+                del self._active_by_guild[giveaway.guild_id]
+        self.message_counts.untrack(giveaway)
+
+    def _cache_ended_giveaway(self, giveaway: GiveawayData, settings: Optional[GuildSettings] = None) -> List[int]:
+        """
+        Adds an ended giveaway to the in-memory reroll cache and its indexes as the most recently used entry,
+        then evicts whatever falls outside the guild's retention. Returns the evicted message IDs.
+        """
+        msg_id = giveaway.message_id
+        guild_cache = self._ended_by_guild.get(giveaway.guild_id)
+        if guild_cache is None:
+            guild_cache = self._ended_by_guild[giveaway.guild_id] = OrderedDict()
+        guild_cache[msg_id] = giveaway
+        guild_cache.move_to_end(msg_id)
+        self.ended_giveaways_cache[msg_id] = giveaway
+        if giveaway.giveaway_id:
+            self._sequential_id_map[(giveaway.guild_id, giveaway.giveaway_id)] = msg_id
+        return self._evict_ended_giveaways(giveaway.guild_id, settings)
+
+    def _touch_ended_giveaway(self, giveaway: GiveawayData):
+        """Marks a cached ended giveaway as recently used (rerolls keep it from being evicted first)."""
+        guild_cache = self._ended_by_guild.get(giveaway.guild_id)
+        if guild_cache is not None and giveaway.message_id in guild_cache:
+            guild_cache.move_to_end(giveaway.message_id)
+
+    def _evict_ended_giveaways(self, guild_id: int, settings: Optional[GuildSettings] = None) -> List[int]:
+        """
+        Evicts every entry of the guild's reroll cache that ended before the age limit, however recently
+        it was used, then pops least recently used entries while the cache is over its count limit.
+        Returns the evicted message IDs.
+        """
+        guild_cache = self._ended_by_guild.get(guild_id)
+        if not guild_cache:
+            return []
+        settings = settings or self.guild_settings.get(guild_id) or GuildSettings(guild_id)
+        max_count = max(1, min(settings.ended_cache_max_count, MAX_ENDED_GIVEAWAYS_LIMIT))
+
+        evicted = []
+        if settings.ended_cache_max_age_days > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=settings.ended_cache_max_age_days)
+            # Recency order says nothing about age (touched entries move to the end), so check them all
+            evicted.extend(msg_id for msg_id, giveaway in guild_cache.items() if giveaway.end_time < cutoff)
+        excess = len(guild_cache) - len(evicted) - max_count
+        if excess > 0:
+            expired = set(evicted)
+            evicted.extend(itertools.islice((msg_id for msg_id in guild_cache if msg_id not in expired), excess)) # Least recently used first
+
+        for msg_id in evicted:
+            giveaway = guild_cache.pop(msg_id)
+            self.ended_giveaways_cache.pop(msg_id, None)
+            seq_key = (guild_id, giveaway.giveaway_id)
+            if self._sequential_id_map.get(seq_key) == msg_id:
+                del self._sequential_id_map[seq_key] # Later lookups fall back to storage
+        if not guild_cache:
+            del self._ended_by_guild[guild_id]
+        if evicted:
+            logger.debug(f"Evicted {len(evicted)} giveaway(s) from the reroll cache of guild {guild_id}.")
+        return evicted
+
+    async def prune_ended_giveaway_caches(self, guild_id: Optional[int] = None) -> int:
+        """Applies count/age retention to one guild's (or every guild's) reroll cache and persists the evictions."""
+        total = 0
+        for gid in ([guild_id] if guild_id is not None else list(self._ended_by_guild)):
+            evicted = self._evict_ended_giveaways(gid)
+            if evicted:
+                await self.storage.remove_ended_giveaways(gid, evicted)
+                total += len(evicted)
+        return total
+
+    def _current_participant_count(self, message_id: int) -> Optional[int]:
+        giveaway = self.active_giveaways.get(message_id)
+        return len(giveaway.participants) if giveaway is not None else None
 
-    def get_giveaway_by_sequential_id(self, guild_id: int, giveaway_id: int) -> Optional[GiveawayData]:
+    async def _render_participant_count(self, message_id: int, count: int, on_send: Callable[[], None]):
+        """Edits a giveaway message's count button (called by the count renderer)."""
+        giveaway = self.active_giveaways.get(message_id)
+        channel = self.bot.get_channel(giveaway.channel_id) if giveaway else None
+        if channel is None:
+            return
+        # A partial message needs no fetch; the view is built for this message only.
+        # Shares the end edit's merge key: a queued count edit is superseded by the end edit.
+        message = channel.get_partial_message(message_id)
+
+        async def send():
+            on_send() # Runs only if the dispatcher actually sends this edit
+            return await message.edit(view=ActiveGiveawayView(self, participant_count=count))
+
+        await self.outbound.submit(("channel", channel.id), send,
+                                   OUTBOUND_PRIORITY_UPDATE, f"participant count edit of giveaway message {message_id}", merge_key=("edit", message_id))
+
+    def get_guild_active_giveaways(self, guild_id: int) -> List[GiveawayData]:
+        return list(self._active_by_guild.get(guild_id, {}).values())
+
+    def _active_giveaways_snapshot(self, guild_id: int) -> Dict[int, GiveawayData]:
+        """Returns the active giveaways belonging to a guild."""
+        return {msg_id: gw for msg_id, gw in self._active_by_guild.get(guild_id, {}).items() if not gw.ended}
+
+    async def save_active_giveaways_for_guild(self, guild_id: int, force: bool = False):
+        """
+        Saves active giveaways filtered by guild ID.
+        By default the guild is only marked dirty and written by the write-behind flush;
+        pass force=True for changes that must hit disk immediately (start/end/cancel).
+        """
+        if self.active_store.mark_dirty(guild_id) or force:
+            await self.active_store.flush(guild_id)
+
+    async def record_participant_join(self, giveaway: GiveawayData, user_id: int, entries: int):
+        """Persists a join as one small write (journal append or row upsert) and defers the snapshot to the write-behind flush."""
+        await self.storage.record_join(giveaway, user_id, entries)
+        if storage_backend.participant_changes_need_snapshot:
+            await self.save_active_giveaways_for_guild(giveaway.guild_id)
+
+    async def record_participant_leave(self, giveaway: GiveawayData, user_id: int):
+        """Persists a leave and defers the snapshot to the write-behind flush."""
+        await self.storage.record_leave(giveaway, user_id)
+        if storage_backend.participant_changes_need_snapshot:
+            await self.save_active_giveaways_for_guild(giveaway.guild_id)
+
+    async def get_guild_settings(self, guild_id: int) -> GuildSettings:
+        """Returns cached guild settings, loading them off the event loop on first use."""
+        settings = self.guild_settings.get(guild_id)
+        if settings is None:
+            settings = await self.storage.load_guild_settings(guild_id)
+            self.guild_settings[guild_id] = settings
+        return settings
+
+    async def get_guild_user_stats(self, guild_id: int) -> Dict[int, UserGiveawayStats]:
+        """Returns cached user stats for a guild, loading them off the event loop on first use."""
+        if guild_id not in self.user_stats:
+            self.user_stats[guild_id] = await self.storage.load_guild_user_stats(guild_id)
+        return self.user_stats[guild_id]
+
+    async def save_ended_giveaway_cache_for_guild(self, giveaway: GiveawayData):
+        """Adds an ended giveaway to the reroll cache for its guild."""
+        # Update global cache and indexes (evicting per the guild's retention) in memory
+        settings = await self.get_guild_settings(giveaway.guild_id)
+        await self.ensure_ended_cache_loaded(giveaway.guild_id) # Retention needs the guild's existing entries
+        evicted = self._cache_ended_giveaway(giveaway, settings)
+
+        # Only the new giveaway and the evictions are written; the stored cache is never reloaded here
+        await self.storage.add_ended_giveaway(giveaway, evicted)
+
+
+    async def get_giveaway_by_sequential_id(self, guild_id: int, giveaway_id: int) -> Optional[GiveawayData]:
         """Looks up a giveaway (active or ended) by its sequential ID and guild ID."""
         msg_id = self._sequential_id_map.get((guild_id, giveaway_id))
+        if msg_id not in self.active_giveaways and guild_id not in self._ended_loaded_guilds:
+            # Ended giveaways are only mapped once the guild's reroll cache is loaded
+            await self.ensure_ended_cache_loaded(guild_id)
+            msg_id = self._sequential_id_map.get((guild_id, giveaway_id))
         if msg_id is None:
-            return None # ID not found in map
+            # Not in memory; fall back to the storage backend (archive index with JSON, indexed query with SQLite)
+            return await self.storage.find_giveaway(guild_id, giveaway_id)
 
         # Check active giveaways first
         giveaway = self.active_giveaways.get(msg_id)
@@ -1188,44 +4154,41 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         # Check ended cache
         giveaway = self.ended_giveaways_cache.get(msg_id)
         if giveaway and giveaway.guild_id == guild_id:
+             self._touch_ended_giveaway(giveaway)
              return giveaway
 
-        # If found in map but not in cache/active (data inconsistency), rebuild map?
-        # For now, just return None.
-        logger.warning(f"Sequential ID {giveaway_id} for guild {guild_id} found in map, but message ID {msg_id} not found in active or ended cache.")
-        return None
+        # Found in map but not in cache/active (evicted from the ended cache or data inconsistency)
+        logger.debug(f"Sequential ID {giveaway_id} for guild {guild_id} found in map, but message ID {msg_id} not found in active or ended cache. Checking storage.")
+        return await self.storage.find_giveaway(guild_id, giveaway_id)
 
 
     def schedule_giveaway_end(self, giveaway: GiveawayData):
-        """Schedules the asyncio task to end a specific giveaway."""
+        """Adds a giveaway to the end scheduler. Overdue giveaways are ended on the scheduler's next pass."""
         # Only schedule standard giveaways, not drops
         if giveaway.is_drop:
-             logger.debug(f"Not scheduling end task for drop giveaway {giveaway.giveaway_id}/{giveaway.message_id}.")
+             logger.debug(f"Not scheduling end for drop giveaway {giveaway.giveaway_id}/{giveaway.message_id}.")
              return
 
-        if giveaway.message_id in self.giveaway_end_tasks and not self.giveaway_end_tasks[giveaway.message_id].done():
-            logger.warning(f"End task for giveaway {giveaway.giveaway_id}/{giveaway.message_id} already exists. Skipping schedule.")
-            return
-
-        now = datetime.now(timezone.utc)
-        delay = (giveaway.end_time - now).total_seconds()
+        if self.scheduler.is_scheduled(giveaway.message_id):
+            logger.warning(f"End of giveaway {giveaway.giveaway_id}/{giveaway.message_id} is already scheduled. Rescheduling to {giveaway.end_time}.")
 
-        if delay <= 0:
-            logger.warning(f"Attempted to schedule end for giveaway {giveaway.giveaway_id}/{giveaway.message_id} that should have already ended. Ending now.")
-            # Run immediately in background
-            task = asyncio.create_task(self.end_giveaway(giveaway.message_id, ended_by=self.bot.user))
-        else:
-            logger.info(f"Scheduling end for giveaway {giveaway.giveaway_id}/{giveaway.message_id} in {delay:.2f} seconds.")
-            task = asyncio.create_task(self.giveaway_end_runner(giveaway.message_id, delay))
+        delay = (giveaway.end_time - datetime.now(timezone.utc)).total_seconds()
+        logger.debug(f"Scheduling end for giveaway {giveaway.giveaway_id}/{giveaway.message_id} in {delay:.2f} seconds.")
+        self.scheduler.schedule(giveaway.message_id, giveaway.end_time)
+        giveaway.task_scheduled = True # Mark as scheduled
 
-        self.giveaway_end_tasks[giveaway.message_id] = task
-        giveaway.task_scheduled = True # Mark task as scheduled
 
+    def _enqueue_giveaway_end(self, message_id: int):
+        """Called by the scheduler when a giveaway's end time is reached: hands it to the end queue."""
+        giveaway = self.active_giveaways.get(message_id)
+        if not giveaway:
+            logger.warning(f"Giveaway message {message_id} not found in active list when its end time was reached. Already ended or removed?")
+            return
+        self.end_queue.enqueue(message_id, giveaway.guild_id, giveaway.channel_id)
 
-    async def giveaway_end_runner(self, message_id: int, delay: float):
-        """The coroutine that waits and then calls end_giveaway."""
+    async def _end_scheduled_giveaway(self, message_id: int):
+        """Run by an end queue worker for a giveaway whose end time was reached."""
         try:
-            await asyncio.sleep(delay)
             logger.info(f"Timer finished for giveaway message {message_id}. Triggering end.")
             # Fetch the giveaway data again in case it was modified
             giveaway = self.active_giveaways.get(message_id)
@@ -1234,15 +4197,12 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
             elif giveaway and giveaway.is_drop:
                  logger.debug(f"End timer triggered for drop giveaway {giveaway.giveaway_id}, but drops end on first join. Skipping timer end.")
             else:
-                logger.warning(f"Giveaway message {message_id} not found in active list when end runner triggered. Already ended or removed?")
+                logger.warning(f"Giveaway message {message_id} not found in active list when its end time was reached. Already ended or removed?")
 
         except asyncio.CancelledError:
-            logger.info(f"End task for giveaway message {message_id} was cancelled.")
+            logger.info(f"End of giveaway message {message_id} was cancelled.")
         except Exception as e:
-            logger.error(f"Error in giveaway end runner for message {message_id}: {e}", exc_info=True)
-        finally:
-            # Clean up the task reference once it's done or cancelled
-            self.giveaway_end_tasks.pop(message_id, None)
+            logger.error(f"Error ending scheduled giveaway message {message_id}: {e}", exc_info=True)
 
 
     # Add instant_winner parameter for drops
@@ -1253,33 +4213,36 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
             logger.warning(f"Attempted to end non-existent or already ended giveaway message {message_id}.")
             giveaway = self.ended_giveaways_cache.get(message_id)
             if not giveaway or giveaway.ended:
-                 # Cleanup task if it somehow persisted
-                 self.giveaway_end_tasks.pop(message_id, None)
+                 # Unschedule if it somehow persisted
+                 self.scheduler.cancel(message_id)
                  return # Avoid double processing
 
         if giveaway.ended:
              logger.warning(f"Giveaway {giveaway.giveaway_id}/{message_id} processing end, but already marked as ended.")
-             self.giveaway_end_tasks.pop(message_id, None)
+             self.scheduler.cancel(message_id)
              return # Avoid double processing
 
 
         logger.info(f"Ending giveaway {giveaway.giveaway_id}/{message_id} (Prize: {giveaway.prize}). Ended by: {ended_by or 'Scheduled Task'}")
         giveaway.ended = True
         giveaway.task_scheduled = False
+        self.scheduler.cancel(message_id) # Ended early (button/command) or popped by the scheduler
 
-        # Remove from active giveaways (global dict) and save for this guild
-        self.active_giveaways.pop(message_id, None)
-        self.save_active_giveaways_for_guild(giveaway.guild_id)
+        # Remove from active giveaways (global dict + indexes) and save for this guild
+        self._unregister_active_giveaway(giveaway)
+        self.count_renderer.finish(message_id) # The ended view below shows the final count
+        await self.storage.record_end(giveaway)
+        await self.save_active_giveaways_for_guild(giveaway.guild_id, force=True)
 
         # Add to ended cache and save for this guild
-        self.save_ended_giveaway_cache_for_guild(giveaway)
+        await self.save_ended_giveaway_cache_for_guild(giveaway)
 
         # --- Find Winners ---
         winners = []
-        eligible_participants = []
+        eligible_entries: Dict[int, int] = {} # user_id: entries (the draw weights)
 
         guild = self.bot.get_guild(giveaway.guild_id)
-        guild_settings = self.guild_settings.get(giveaway.guild_id) or GuildSettings(giveaway.guild_id) # Get settings or default
+        guild_settings = await self.get_guild_settings(giveaway.guild_id) # Loads on first use (defaults if the guild has none)
 
         if instant_winner: # Special case for drop giveaways
              if instant_winner in giveaway.participants:
@@ -1290,61 +4253,20 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                  # Should not happen if logic is correct, but handle defensively
 
         elif guild: # Normal giveaway winner drawing
-            participants_list = list(giveaway.participants.keys())
-            if participants_list:
-                # Filter participants based on blacklist/bypass roles at the time of ending
-                all_blacklist_roles = set()
-                if giveaway.blacklist_role_id:
-                     all_blacklist_roles.add(giveaway.blacklist_role_id)
-                if guild_settings and guild_settings.default_blacklist_role_id:
-                     all_blacklist_roles.add(guild_settings.default_blacklist_role_id)
-
-                all_bypass_roles = set(giveaway.bypass_role_ids)
-                if guild_settings and guild_settings.default_bypass_role_ids:
-                     all_bypass_roles.update(guild_settings.default_bypass_role_ids)
-
-
-                for user_id in participants_list:
-                     member = guild.get_member(user_id)
-                     if not member:
-                         logger.warning(f"Participant {user_id} not found in guild {guild.id} during winner drawing for giveaway {giveaway.giveaway_id}. Skipping.")
-                         continue # Skip if user is no longer in the guild
-
-                     member_roles_set = {role.id for role in member.roles}
-                     has_bypass = any(role_id in all_bypass_roles for role_id in member_roles_set)
-                     is_blacklisted = any(role_id in all_blacklist_roles for role_id in member_roles_set)
-
-                     if not is_blacklisted or has_bypass:
-                          eligible_participants.append(user_id)
-
-            if eligible_participants:
-                # Create weighted list from eligible participants
-                entries_weighted_list = []
-                for user_id in eligible_participants:
-                     if user_id in giveaway.participants:
-                         entries_weighted_list.extend([user_id] * giveaway.participants[user_id])
-
-                actual_winner_count = min(giveaway.winners_count, len(set(eligible_participants)))
-
-                if actual_winner_count > 0 and entries_weighted_list:
-                     drawn_winners = set()
-                     attempts = 0
-                     max_attempts = actual_winner_count * 10
-
-                     while len(drawn_winners) < actual_winner_count and attempts < max_attempts:
-                          if not entries_weighted_list: break # No more entries to draw from
-                          chosen_user_id = random.choice(entries_weighted_list)
-                          if chosen_user_id not in drawn_winners:
-                               drawn_winners.add(chosen_user_id)
-                          attempts += 1
-                     winners = list(drawn_winners)
+            if giveaway.participants:
+                # Filter participants based on blacklist/bypass roles at the time of ending (one pass over the pool)
+                eligible_entries, missing = giveaway.role_eligibility(guild_settings).filter_participants(guild, giveaway.participants)
+                if missing:
+                    logger.warning(f"{missing} participant(s) not found in guild {guild.id} during winner drawing for giveaway {giveaway.giveaway_id}. Skipped.")
+
+            if eligible_entries:
+                # Weighted draw over eligible participants (entries = weight)
+                winners = draw_weighted_winners(eligible_entries, giveaway.winners_count)
 
         # --- Increment User Win Stats ---
         if winners:
             # Load stats for the guild if not already cached (should be by load_state)
-            if giveaway.guild_id not in self.user_stats:
-                 self.user_stats[giveaway.guild_id] = load_guild_user_stats(giveaway.guild_id)
-            guild_stats = self.user_stats[giveaway.guild_id]
+            guild_stats = await self.get_guild_user_stats(giveaway.guild_id)
 
             now = datetime.now(timezone.utc)
             for winner_id in winners:
@@ -1353,7 +4275,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                  guild_stats[winner_id].won_count += 1
                  guild_stats[winner_id].won_last_timestamp = now
 
-            save_guild_user_stats(guild_stats, giveaway.guild_id)
+            await self.storage.save_guild_user_stats(guild_stats, giveaway.guild_id, changed_user_ids=set(winners))
 
 
         # --- Update Original Message ---
@@ -1368,17 +4290,21 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                 # Add winner info to embed
                 winner_mentions = []
                 if winners:
+                     winner_users = await self.user_resolver.resolve_users(guild, winners) # One batch for all winners
                      for winner_id in winners:
-                         winner_user = self.bot.get_user(winner_id) or await self.bot.fetch_user(winner_id) # Fetch if not cached
+                         winner_user = winner_users.get(winner_id)
                          winner_mentions.append(winner_user.mention if winner_user else f"User ID: {winner_id}")
                      ended_embed.add_field(name="🏆 Winner(s)", value=", ".join(winner_mentions), inline=False)
                 else:
                      ended_embed.add_field(name="🏆 Winner(s)", value="No eligible participants found!", inline=False)
 
                 # Edit the message with the ended embed and the NEW EndedGiveawayView
-                original_msg = await channel.fetch_message(message_id)
+                # (a partial message needs no fetch; a queued count edit of the message is superseded by this one)
+                message = channel.get_partial_message(message_id)
                 ended_view = EndedGiveawayView(self, giveaway=giveaway) # Create instance of the new view
-                await original_msg.edit(embed=ended_embed, view=ended_view) # Replace the view
+                await self.outbound.submit(("channel", channel.id), functools.partial(message.edit, embed=ended_embed, view=ended_view), # Replace the view
+                                           OUTBOUND_PRIORITY_ANNOUNCE, f"end edit of giveaway message {message_id}", merge_key=("edit", message_id))
+                original_msg = message
 
             except discord.NotFound:
                 logger.error(f"Original giveaway message {message_id} not found in channel {giveaway.channel_id} during end process.")
@@ -1397,11 +4323,12 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                     winner_mentions_str = ", ".join(winner_mentions)
                     # Use customizable win message
                     win_message = guild_settings.win_message.format(winners=winner_mentions_str, prize=giveaway.prize)
-                    await channel.send(
+                    await self.outbound.submit(("channel", channel.id), functools.partial(
+                        channel.send,
                         win_message,
                         reference=original_msg,
                         allowed_mentions=discord.AllowedMentions(users=True) # Ensure winners are pinged
-                    )
+                    ), OUTBOUND_PRIORITY_ANNOUNCE, f"winner announcement for giveaway {giveaway.giveaway_id}/{message_id}")
                     logger.info(f"Announced winners for giveaway {giveaway.giveaway_id}/{message_id}: {winner_mentions_str}")
                     await self.log_giveaway_event("end_winners", giveaway, ended_by, winner_ids=winners) # Pass ended_by
 
@@ -1412,10 +4339,11 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                 else:
                      # Use customizable no winners message
                      nowinners_message = guild_settings.nowinners_message.format(prize=giveaway.prize)
-                     await channel.send(
+                     await self.outbound.submit(("channel", channel.id), functools.partial(
+                        channel.send,
                         nowinners_message,
                         reference=original_msg
-                    )
+                    ), OUTBOUND_PRIORITY_ANNOUNCE, f"no-winners announcement for giveaway {giveaway.giveaway_id}/{message_id}")
                      logger.info(f"Giveaway {giveaway.giveaway_id}/{message_id} ended with no winners.")
                      await self.log_giveaway_event("end_no_winners", giveaway, ended_by) # Pass ended_by
 
@@ -1424,104 +4352,111 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
             except Exception as e:
                  logger.error(f"Error sending winner announcement for {message_id}: {e}", exc_info=True)
 
-        # Final cleanup of task reference
-        self.giveaway_end_tasks.pop(message_id, None)
-
     # --- New function to send DM to winners ---
     async def dm_giveaway_winners(self, guild: discord.Guild, winner_ids: List[int], giveaway: GiveawayData, settings: GuildSettings):
-        """Sends a DM embed to each winner."""
+        """Queues a DM embed to each winner and returns at once; delivery results land in giveaway.dm_results."""
         if not settings.dm_winner: return # Double check setting
 
         for winner_id in winner_ids:
-            try:
-                user = self.bot.get_user(winner_id) or await self.bot.fetch_user(winner_id)
-                if not user:
-                    logger.warning(f"Could not fetch user {winner_id} to DM for giveaway {giveaway.giveaway_id}.")
-                    continue
+            self.dm_fanout.enqueue(giveaway, winner_id, functools.partial(self._send_winner_dm, guild, winner_id, giveaway, settings),
+                                   f"win DM to user {winner_id} for giveaway {giveaway.giveaway_id}")
 
-                # Get DM embed color (random or hex)
-                dm_color = discord.Color.random() if settings.colour_dm_winembed.lower() == 'random' else discord.Color.blue() # Default blue if hex invalid
-                if settings.colour_dm_winembed.startswith('#'):
-                     try:
-                         dm_color = discord.Color.from_rgb(*tuple(int(settings.colour_dm_winembed[i:i+2], 16) for i in (1, 3, 5)))
-                     except:
-                         logger.warning(f"Invalid hex color for winner DM embed in guild {settings.guild_id}: {settings.colour_dm_winembed}. Using default blue.")
-                         dm_color = discord.Color.blue()
-
-
-                # Create DM embed using customizable settings
-                dm_embed = discord.Embed(
-                    title=settings.title_dm_winembed.format(prize=giveaway.prize, guild_name=guild.name),
-                    description=settings.description_dm_winembed.format(prize=giveaway.prize, guild_name=guild.name),
-                    color=dm_color,
-                    timestamp=datetime.now(timezone.utc)
-                )
-                if settings.thumbnail_dm_winembed:
-                    dm_embed.set_thumbnail(url=settings.thumbnail_dm_winembed)
-                if settings.footer_dm_winembed:
-                    # No custom emoji in footer text
-                    dm_embed.set_footer(text=settings.footer_dm_winembed.format(giveaway_id=giveaway.giveaway_id))
-
-                # Add field linking to the giveaway message
-                jump_url = f"https://discord.com/channels/{giveaway.guild_id}/{giveaway.channel_id}/{giveaway.message_id}"
-                dm_embed.add_field(name="Giveaway Link", value=f"[Jump to the giveaway message]({jump_url})", inline=False)
-                dm_embed.add_field(name="Prize", value=giveaway.prize, inline=False)
-                host = guild.get_member(giveaway.host_id)
-                dm_embed.add_field(name="Hosted By", value=host.mention if host else f"ID: {giveaway.host_id}", inline=False)
-
-
-                await user.send(embed=dm_embed)
-                logger.info(f"Sent win DM to user {user.id} for giveaway {giveaway.giveaway_id}.")
-            except discord.Forbidden:
-                logger.warning(f"Could not send DM to user {winner_id} for giveaway {giveaway.giveaway_id} (DMs blocked).")
-            except Exception as e:
-                logger.error(f"Failed to send DM to user {winner_id} for giveaway {giveaway.giveaway_id}: {e}", exc_info=True)
+    async def _store_dm_results(self, giveaway: GiveawayData):
+        """Persists a giveaway's DM results once all of its queued DMs are done."""
+        if not giveaway.ended:
+            return
+        results = Counter(giveaway.dm_results.values())
+        logger.info(f"Winner DMs for giveaway {giveaway.giveaway_id}/{giveaway.message_id}: {dict(results)}")
+        await self.storage.update_dm_results(giveaway, in_reroll_cache=giveaway.message_id in self.ended_giveaways_cache)
+
+    async def _send_winner_dm(self, guild: discord.Guild, winner_id: int, giveaway: GiveawayData, settings: GuildSettings) -> bool:
+        """Sends the win DM embed to one winner. Returns False if the user could not be found; send errors propagate."""
+        user = await self.user_resolver.resolve_user(winner_id)
+        if not user:
+            logger.warning(f"Could not fetch user {winner_id} to DM for giveaway {giveaway.giveaway_id}.")
+            return False
+
+        # Get DM embed color (random or hex)
+        dm_color = discord.Color.random() if settings.colour_dm_winembed.lower() == 'random' else discord.Color.blue() # Default blue if hex invalid
+        if settings.colour_dm_winembed.startswith('#'):
+             try:
+                 dm_color = discord.Color.from_rgb(*tuple(int(settings.colour_dm_winembed[i:i+2], 16) for i in (1, 3, 5)))
+             except:
+                 logger.warning(f"Invalid hex color for winner DM embed in guild {settings.guild_id}: {settings.colour_dm_winembed}. Using default blue.")
+                 dm_color = discord.Color.blue()
+
+
+        # Create DM embed using customizable settings
+        dm_embed = discord.Embed(
+            title=settings.title_dm_winembed.format(prize=giveaway.prize, guild_name=guild.name),
+            description=settings.description_dm_winembed.format(prize=giveaway.prize, guild_name=guild.name),
+            color=dm_color,
+            timestamp=datetime.now(timezone.utc)
+        )
+        if settings.thumbnail_dm_winembed:
+            dm_embed.set_thumbnail(url=settings.thumbnail_dm_winembed)
+        if settings.footer_dm_winembed:
+            # No custom emoji in footer text
+            dm_embed.set_footer(text=settings.footer_dm_winembed.format(giveaway_id=giveaway.giveaway_id))
+
+        # Add field linking to the giveaway message
+        jump_url = f"https://discord.com/channels/{giveaway.guild_id}/{giveaway.channel_id}/{giveaway.message_id}"
+        dm_embed.add_field(name="Giveaway Link", value=f"[Jump to the giveaway message]({jump_url})", inline=False)
+        dm_embed.add_field(name="Prize", value=giveaway.prize, inline=False)
+        host = guild.get_member(giveaway.host_id)
+        dm_embed.add_field(name="Hosted By", value=host.mention if host else f"ID: {giveaway.host_id}", inline=False)
+
+
+        await user.send(embed=dm_embed)
+        logger.info(f"Sent win DM to user {user.id} for giveaway {giveaway.giveaway_id}.")
+        return True
 
     # --- New function to send DM to host for start confirmation ---
     async def dm_giveaway_host(self, guild: discord.Guild, host_id: int, giveaway: GiveawayData, settings: GuildSettings):
-         """Sends a DM embed to the host when their giveaway starts."""
-         try:
-             user = self.bot.get_user(host_id) or await self.bot.fetch_user(host_id)
-             if not user:
-                 logger.warning(f"Could not fetch host user {host_id} to DM for giveaway {giveaway.giveaway_id}.")
-                 return
-
-             # Get DM embed color (random or hex)
-             dm_color = discord.Color.random() if settings.colour_dm_hostembed.lower() == 'random' else discord.Color.blue() # Default blue if hex invalid
-             if settings.colour_dm_hostembed.startswith('#'):
-                  try:
-                      dm_color = discord.Color.from_rgb(*tuple(int(settings.colour_dm_hostembed[i:i+2], 16) for i in (1, 3, 5)))
-                  except:
-                      logger.warning(f"Invalid hex color for host DM embed in guild {settings.guild_id}: {settings.colour_dm_hostembed}. Using default blue.")
-                      dm_color = discord.Color.blue()
-
-
-             # Create DM embed using customizable settings
-             dm_embed = discord.Embed(
-                 title=settings.title_dm_hostembed.format(prize=giveaway.prize, guild_name=guild.name),
-                 description=settings.description_dm_hostembed.format(prize=giveaway.prize, guild_name=guild.name),
-                 color=dm_color,
-                 timestamp=datetime.now(timezone.utc)
-             )
-             if settings.thumbnail_dm_hostembed:
-                 dm_embed.set_thumbnail(url=settings.thumbnail_dm_hostembed)
-             if settings.footer_dm_hostembed:
-                 # No custom emoji in footer text
-                 dm_embed.set_footer(text=settings.footer_dm_hostembed.format(giveaway_id=giveaway.giveaway_id))
-
-             # Add field linking to the giveaway message
-             jump_url = f"https://discord.com/channels/{giveaway.guild_id}/{giveaway.channel_id}/{giveaway.message_id}"
-             dm_embed.add_field(name="Giveaway Link", value=f"[Jump to the giveaway message]({jump_url})", inline=False)
-             dm_embed.add_field(name="Prize", value=giveaway.prize, inline=False)
-             dm_embed.add_field(name="Ends", value=f"<t:{int(giveaway.end_time.timestamp())}:R>", inline=False)
-
-
-             await user.send(embed=dm_embed)
-             logger.info(f"Sent host DM to user {host_id} for giveaway {giveaway.giveaway_id}.")
-         except discord.Forbidden:
-             logger.warning(f"Could not send DM to host {host_id} for giveaway {giveaway.giveaway_id} (DMs blocked).")
-         except Exception as e:
-             logger.error(f"Failed to send DM to host {host_id} for giveaway {giveaway.giveaway_id}: {e}", exc_info=True)
+         """Queues a DM embed to the host when their giveaway starts (not recorded in dm_results)."""
+         self.dm_fanout.enqueue(giveaway, host_id, functools.partial(self._send_host_dm, guild, host_id, giveaway, settings),
+                                f"host DM to user {host_id} for giveaway {giveaway.giveaway_id}", record=False)
+
+    async def _send_host_dm(self, guild: discord.Guild, host_id: int, giveaway: GiveawayData, settings: GuildSettings) -> bool:
+         """Sends the host DM embed. Returns False if the user could not be found; send errors propagate."""
+         user = await self.user_resolver.resolve_user(host_id)
+         if not user:
+             logger.warning(f"Could not fetch host user {host_id} to DM for giveaway {giveaway.giveaway_id}.")
+             return False
+
+         # Get DM embed color (random or hex)
+         dm_color = discord.Color.random() if settings.colour_dm_hostembed.lower() == 'random' else discord.Color.blue() # Default blue if hex invalid
+         if settings.colour_dm_hostembed.startswith('#'):
+              try:
+                  dm_color = discord.Color.from_rgb(*tuple(int(settings.colour_dm_hostembed[i:i+2], 16) for i in (1, 3, 5)))
+              except:
+                  logger.warning(f"Invalid hex color for host DM embed in guild {settings.guild_id}: {settings.colour_dm_hostembed}. Using default blue.")
+                  dm_color = discord.Color.blue()
+
+
+         # Create DM embed using customizable settings
+         dm_embed = discord.Embed(
+             title=settings.title_dm_hostembed.format(prize=giveaway.prize, guild_name=guild.name),
+             description=settings.description_dm_hostembed.format(prize=giveaway.prize, guild_name=guild.name),
+             color=dm_color,
+             timestamp=datetime.now(timezone.utc)
+         )
+         if settings.thumbnail_dm_hostembed:
+             dm_embed.set_thumbnail(url=settings.thumbnail_dm_hostembed)
+         if settings.footer_dm_hostembed:
+             # No custom emoji in footer text
+             dm_embed.set_footer(text=settings.footer_dm_hostembed.format(giveaway_id=giveaway.giveaway_id))
+
+         # Add field linking to the giveaway message
+         jump_url = f"https://discord.com/channels/{giveaway.guild_id}/{giveaway.channel_id}/{giveaway.message_id}"
+         dm_embed.add_field(name="Giveaway Link", value=f"[Jump to the giveaway message]({jump_url})", inline=False)
+         dm_embed.add_field(name="Prize", value=giveaway.prize, inline=False)
+         dm_embed.add_field(name="Ends", value=f"<t:{int(giveaway.end_time.timestamp())}:R>", inline=False)
+
+
+         await user.send(embed=dm_embed)
+         logger.info(f"Sent host DM to user {host_id} for giveaway {giveaway.giveaway_id}.")
+         return True
 
 
     # --- New function to perform the core reroll logic ---
@@ -1529,73 +4464,36 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
     async def perform_reroll(self, interaction: discord.Interaction, giveaway: GiveawayData):
         """Performs the core logic of rerolling winners for an ended giveaway."""
         guild = interaction.guild
-        guild_settings = self.guild_settings.get(guild.id) or GuildSettings(guild.id)
+        guild_settings = await self.get_guild_settings(guild.id)
+        self._touch_ended_giveaway(giveaway) # Recently rerolled giveaways are evicted last
 
         # --- Get Eligible Participants ---
-        participants_list = list(giveaway.participants.keys())
-        if not participants_list:
+        if not giveaway.participants:
             await interaction.followup.send("Cannot reroll: No participants were recorded for this giveaway.", ephemeral=True)
             return
 
-        eligible_participants = []
-
-        # Filter participants based on blacklist/bypass roles at the time of rerolling (using current roles)
-        all_blacklist_roles = set()
-        if giveaway.blacklist_role_id:
-             all_blacklist_roles.add(giveaway.blacklist_role_id)
-        if guild_settings and guild_settings.default_blacklist_role_id:
-             all_blacklist_roles.add(guild_settings.default_blacklist_role_id)
-
-        all_bypass_roles = set(giveaway.bypass_role_ids)
-        if guild_settings and guild_settings.default_bypass_role_ids:
-             all_bypass_roles.update(guild_settings.default_bypass_role_ids)
-
-        for user_id in participants_list:
-             member = guild.get_member(user_id)
-             if not member:
-                 logger.warning(f"Participant {user_id} not found in guild {guild.id} during reroll for giveaway {giveaway.giveaway_id}. Skipping.")
-                 continue
-
-             member_roles_set = {role.id for role in member.roles}
-             has_bypass = any(role_id in all_bypass_roles for role_id in member_roles_set)
-             is_blacklisted = any(role_id in all_blacklist_roles for role_id in member_roles_set)
-
-             if not is_blacklisted or has_bypass:
-                  eligible_participants.append(user_id)
+        # Filter participants based on blacklist/bypass roles at the time of rerolling (using current roles, one pass)
+        eligible_entries, missing = giveaway.role_eligibility(guild_settings).filter_participants(guild, giveaway.participants)
+        if missing:
+            logger.warning(f"{missing} participant(s) not found in guild {guild.id} during reroll for giveaway {giveaway.giveaway_id}. Skipped.")
+        eligible_participants = list(eligible_entries)
 
 
         if not eligible_participants:
              await interaction.followup.send("Cannot reroll: No eligible participants remaining (all might have won already or left, or are now blacklisted).", ephemeral=True)
              return
 
-        # Create weighted list from eligible participants
-        entries_weighted_list = []
+        # Entries per eligible participant (the draw weights)
         # For reroll, we should use the original entries if it's a normal giveaway.
         # For drops, everyone has 1 entry.
-        if not giveaway.is_drop:
-             for user_id in eligible_participants:
-                  if user_id in giveaway.participants:
-                      entries_weighted_list.extend([user_id] * giveaway.participants[user_id])
-        else: # For drops, eligible participants just have 1 entry each
-             entries_weighted_list = list(eligible_participants)
-
+        if giveaway.is_drop: # For drops, eligible participants just have 1 entry each
+             eligible_entries = {user_id: 1 for user_id in eligible_participants}
 
-        num_to_reroll = min(giveaway.winners_count, len(set(eligible_participants)))
-
-        if num_to_reroll <=0 or not entries_weighted_list:
+        if giveaway.winners_count <= 0 or not any(entries > 0 for entries in eligible_entries.values()):
              await interaction.followup.send("Cannot reroll: No winners needed or no eligible participants left with entries.", ephemeral=True)
              return
 
-        new_winners = set()
-        attempts = 0
-        max_attempts = num_to_reroll * 10 # Safety break
-        while len(new_winners) < num_to_reroll and attempts < max_attempts:
-             if not entries_weighted_list: break
-             chosen_user_id = random.choice(entries_weighted_list)
-             new_winners.add(chosen_user_id)
-             attempts += 1
-
-        winners = list(new_winners)
+        winners = draw_weighted_winners(eligible_entries, giveaway.winners_count)
 
         if not winners:
              await interaction.followup.send("Failed to select new winners after rerolling.", ephemeral=True)
@@ -1603,9 +4501,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
         # --- Increment User Win Stats (for rerolled winners) ---
         if winners:
-            if giveaway.guild_id not in self.user_stats:
-                 self.user_stats[giveaway.guild_id] = load_guild_user_stats(giveaway.guild_id)
-            guild_stats = self.user_stats[giveaway.guild_id]
+            guild_stats = await self.get_guild_user_stats(giveaway.guild_id)
 
             now = datetime.now(timezone.utc)
             for winner_id in winners:
@@ -1616,22 +4512,18 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                  guild_stats[winner_id].won_count += 1
                  guild_stats[winner_id].won_last_timestamp = now
 
-            save_guild_user_stats(guild_stats, giveaway.guild_id)
+            await self.storage.save_guild_user_stats(guild_stats, giveaway.guild_id, changed_user_ids=set(winners))
 
 
         # --- Announce Rerolled Winners ---
         channel = self.bot.get_channel(giveaway.channel_id)
-        original_msg = None
         if channel:
-             try:
-                 original_msg = await channel.fetch_message(giveaway.message_id)
-             except Exception as e:
-                 logger.warning(f"Could not fetch original message {giveaway.message_id} for reroll announcement: {e}")
-
-        if channel and original_msg:
+            # No fetch: replies to the giveaway message, or posts a plain message if it was deleted
+            reply_to = channel.get_partial_message(giveaway.message_id).to_reference(fail_if_not_exists=False)
             reroll_mentions = []
+            winner_users = await self.user_resolver.resolve_users(guild, winners) # Departed users are remembered between rerolls
             for winner_id in winners:
-                winner_user = guild.get_member(winner_id) or await self.bot.fetch_user(winner_id)
+                winner_user = winner_users.get(winner_id)
                 reroll_mentions.append(winner_user.mention if winner_user else f"User ID: {winner_id}")
 
             try:
@@ -1639,12 +4531,13 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                 reroll_message_text = guild_settings.reroll_message.format(winners=', '.join(reroll_mentions), prize=giveaway.prize)
                 reroll_view = EndedGiveawayView(self, giveaway=giveaway) # Use the ended view with link
 
-                await channel.send(
+                await self.outbound.submit(("channel", channel.id), functools.partial(
+                    channel.send,
                     reroll_message_text,
-                    reference=original_msg,
+                    reference=reply_to,
                     view=reroll_view, # Keep the view for consistency
                     allowed_mentions=discord.AllowedMentions(users=True)
-                )
+                ), OUTBOUND_PRIORITY_ANNOUNCE, f"reroll announcement for giveaway {giveaway.giveaway_id}/{giveaway.message_id}")
                 await interaction.followup.send(f"✅ Rerolled winners for giveaway ID **{giveaway.giveaway_id}**.", ephemeral=True)
                 logger.info(f"Rerolled winners for {giveaway.giveaway_id}/{giveaway.message_id}: {', '.join(reroll_mentions)}")
                 await self.log_giveaway_event("reroll", giveaway, interaction.user, winner_ids=winners)
@@ -1662,7 +4555,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                 await interaction.followup.send(f"✅ Rerolled winners for {giveaway.giveaway_id}, but failed to send announcement: {e}", ephemeral=True)
                 await self.log_giveaway_event("reroll", giveaway, interaction.user, winner_ids=winners)
         else:
-             await interaction.followup.send(f"Could not find the original giveaway message/channel ({giveaway.message_id}) to announce the reroll for giveaway ID **{giveaway.giveaway_id}**.", ephemeral=True)
+             await interaction.followup.send(f"Could not find the giveaway channel ({giveaway.channel_id}) to announce the reroll for giveaway ID **{giveaway.giveaway_id}**.", ephemeral=True)
              await self.log_giveaway_event("reroll", giveaway, interaction.user, winner_ids=winners)
 
 
@@ -1674,12 +4567,15 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              return # Do not log other events like join/leave
 
         guild = self.bot.get_guild(giveaway.guild_id)
-        if not guild or guild.id not in self.guild_settings or not self.guild_settings[guild.id].log_channel_id:
-            return # No guild, no settings, or no log channel configured
+        if not guild:
+            return
+        guild_settings = await self.get_guild_settings(guild.id)
+        if not guild_settings.log_channel_id:
+            return # No log channel configured
 
-        log_channel = guild.get_channel(self.guild_settings[guild.id].log_channel_id)
+        log_channel = guild.get_channel(guild_settings.log_channel_id)
         if not isinstance(log_channel, discord.TextChannel):
-             logger.warning(f"Configured log channel ID {self.guild_settings[guild.id].log_channel_id} for guild {guild.id} is not a valid text channel.")
+             logger.warning(f"Configured log channel ID {guild_settings.log_channel_id} for guild {guild.id} is not a valid text channel.")
              return
 
         bot_member = guild.get_member(self.bot.user.id)
@@ -1721,15 +4617,13 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                 bonus_list = ", ".join(f"{guild.get_role(rid).mention if guild and guild.get_role(rid) else f'ID:{rid}'}:{extra}" for rid, extra in giveaway.bonus_entries.items())
                 req_details.append(f"Bonus Entries: {bonus_list}")
             all_bypass_roles = set(giveaway.bypass_role_ids)
-            if guild_settings := self.guild_settings.get(guild.id):
-                all_bypass_roles.update(guild_settings.default_bypass_role_ids)
+            all_bypass_roles.update(guild_settings.default_bypass_role_ids)
             if all_bypass_roles:
                  bypass_list = ", ".join(guild.get_role(rid).mention if guild and guild.get_role(rid) else f'ID:{rid}' for rid in all_bypass_roles)
                  req_details.append(f"Bypass Roles: {bypass_list}")
             all_blacklist_roles = set()
             if giveaway.blacklist_role_id: all_blacklist_roles.add(giveaway.blacklist_role_id)
-            if guild_settings := self.guild_settings.get(guild.id):
-                 if guild_settings.default_blacklist_role_id: all_blacklist_roles.add(guild_settings.default_blacklist_role_id)
+            if guild_settings.default_blacklist_role_id: all_blacklist_roles.add(guild_settings.default_blacklist_role_id)
             if all_blacklist_roles:
                  blacklist_list = ", ".join(guild.get_role(rid).mention if guild and guild.get_role(rid) else f'ID:{rid}' for rid in all_blacklist_roles)
                  req_details.append(f"Blacklist Roles: {blacklist_list}")
@@ -1738,9 +4632,8 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
             # Send Host DM
             try:
-                guild_settings_for_dm = self.guild_settings.get(giveaway.guild_id)
-                if guild and user and guild_settings_for_dm: # Ensure guild, user (starter), and settings exist
-                     await self.dm_giveaway_host(guild, user.id, giveaway, guild_settings_for_dm)
+                if guild and user: # Ensure guild and user (starter) exist
+                     await self.dm_giveaway_host(guild, user.id, giveaway, guild_settings)
             except Exception as e:
                  logger.error(f"Failed to send host DM after giveaway start {giveaway.giveaway_id}: {e}", exc_info=True)
 
@@ -1750,8 +4643,9 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
             color = discord.Color.gold()
             if winner_ids:
                  winner_mentions = []
+                 winner_users = await self.user_resolver.resolve_users(guild, winner_ids)
                  for wid in winner_ids:
-                     w_user = guild.get_member(wid) or await self.bot.fetch_user(wid)
+                     w_user = winner_users.get(wid)
                      winner_mentions.append(w_user.mention if w_user else f"ID: {wid}")
                  fields.append({"name": "Winner(s)", "value": ", ".join(winner_mentions), "inline": False})
             fields.append({"name": "Participants", "value": str(len(giveaway.participants)), "inline": True})
@@ -1780,8 +4674,9 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
             color = discord.Color.purple()
             if winner_ids:
                  winner_mentions = []
+                 winner_users = await self.user_resolver.resolve_users(guild, winner_ids)
                  for wid in winner_ids:
-                     w_user = guild.get_member(wid) or await self.bot.fetch_user(wid)
+                     w_user = winner_users.get(wid)
                      winner_mentions.append(w_user.mention if w_user else f"ID: {wid}")
                  fields.append({"name": "New Winner(s)", "value": ", ".join(winner_mentions), "inline": False})
             if user:
@@ -1809,40 +4704,31 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
             except:
                  pass # Ignore if link construction fails
 
-        try:
-            await log_channel.send(embed=log_embed)
-        except Exception as e:
-            logger.error(f"Failed to send log embed to channel {log_channel.id} for guild {guild.id}: {e}", exc_info=True)
+        # Queued behind announcements; failures are logged by the dispatcher
+        self.outbound.submit(("channel", log_channel.id), functools.partial(log_channel.send, embed=log_embed),
+                             OUTBOUND_PRIORITY_LOG, f"{event_type} log embed for giveaway {giveaway.giveaway_id} in guild {guild.id}")
 
 
     # --- Periodic Check Task ---
-    @tasks.loop(minutes=5) # Check periodically for ended giveaways missed during downtime
+    @tasks.loop(minutes=5) # Safety net: the scheduler runner normally ends giveaways on time
     async def check_missed_giveaways(self):
         logger.debug("Running periodic check for missed giveaways...")
-        now = datetime.now(timezone.utc)
-        giveaways_to_end_now = []
-
-        # Iterate through active giveaways globally
-        for msg_id, giveaway in list(self.active_giveaways.items()):
-             # Only process standard giveaways for timer end
-             if not giveaway.ended and not giveaway.is_drop and giveaway.end_time <= now:
-                 # Check if task is already running or scheduled (it shouldn't be if end_time passed)
-                 task = self.giveaway_end_tasks.get(msg_id)
-                 if task and not task.done():
-                      logger.warning(f"Missed giveaway check: Task for {giveaway.giveaway_id}/{msg_id} is running/scheduled despite end time passing. Skipping.")
-                      continue
-
-                 logger.info(f"Missed giveaway check: Found giveaway {giveaway.giveaway_id}/{msg_id} in guild {giveaway.guild_id} whose end time ({giveaway.end_time}) has passed. Scheduling immediate end.")
-                 giveaways_to_end_now.append(msg_id)
-
-        # Schedule end tasks for those found
-        for msg_id in giveaways_to_end_now:
-             # Ensure we don't double-process if end_giveaway was already called by load_state
-             if msg_id in self.active_giveaways and not self.active_giveaways[msg_id].ended:
-                 # Run as a new task to avoid blocking the loop
-                 asyncio.create_task(self.end_giveaway(msg_id, ended_by=self.bot.user))
-             else:
-                 logger.debug(f"Missed giveaway check: Skipping {msg_id} as it's no longer active or already marked ended.")
+        self.scheduler.start() # Restarts the runner/workers if they ever stopped
+        self.end_queue.start()
+        # Only overdue heap entries are touched, not every active giveaway
+        queued = self.scheduler.dispatch_due()
+        if queued:
+            logger.info(f"Missed giveaway check: queued {queued} overdue giveaway(s) for ending.")
+        # Age-based retention for the reroll caches (count limits are applied as giveaways end)
+        expired = await self.prune_ended_giveaway_caches()
+        if expired:
+            logger.info(f"Evicted {expired} expired giveaway(s) from reroll caches.")
+        if len(self.end_queue) or self.end_queue.in_progress:
+            logger.info(f"End queue status: {self.end_queue.stats()}")
+        if self.outbound.backlog():
+            logger.info(f"Outbound queue backlog: {self.outbound.backlog()} message(s). Per route: {self.outbound.stats()}")
+        if len(self.dm_fanout):
+            logger.info(f"DM fan-out backlog: {self.dm_fanout.stats()}")
 
 
     @check_missed_giveaways.before_loop
@@ -1851,6 +4737,42 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         logger.info("Starting periodic check for missed giveaways.")
 
 
+    # --- Write-Behind Flush Task ---
+    @tasks.loop(seconds=WRITE_BEHIND_FLUSH_INTERVAL)
+    async def flush_active_giveaways(self):
+        written = await self.active_store.flush()
+        if written:
+            logger.debug(f"Write-behind flushed {written} guild(s). Stats: {self.active_store.stats()}")
+
+
+    # --- Member Listeners (keep cached lookups fresh) ---
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        self.user_resolver.forget(member.id, member.guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        self.user_resolver.forget(member.id, member.guild.id)
+
+
+    # --- Message Count Listeners ---
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Feeds the message count index used by min_messages requirements."""
+        if message.guild is None:
+            return
+        self.message_counts.ingest(message)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """Deleted messages no longer count toward min_messages (raw: works for uncached messages too)."""
+        self.message_counts.remove_messages(payload.channel_id, (payload.message_id,))
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        self.message_counts.remove_messages(payload.channel_id, payload.message_ids)
+
+
     # --- Helper functions for settings autocomplete ---
     async def role_autocomplete(self, interaction: discord.Interaction, current: str):
         """Autocomplete for role arguments in settings."""
@@ -1898,6 +4820,8 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         message_channel="Channel to count messages in (defaults to giveaway channel).",
         message_cooldown="Cooldown between counted messages (e.g., 30s).",
         keywords="Comma-separated keywords required in messages (e.g., enter, win).",
+        whole_word_keywords="Keywords must appear as whole words (default: off).",
+        case_sensitive_keywords="Keywords are matched case-sensitively (default: off).",
         donor="User who donated the prize.",
         image_url="URL of an image for the embed."
     )
@@ -1914,6 +4838,8 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                              message_channel: Optional[discord.TextChannel] = None,
                              message_cooldown: Optional[str] = None,
                              keywords: Optional[str] = None,
+                             whole_word_keywords: Optional[bool] = False,
+                             case_sensitive_keywords: Optional[bool] = False,
                              donor: Optional[discord.User] = None,
                              image_url: Optional[str] = None):
         """Starts a standard giveaway with various options."""
@@ -1923,8 +4849,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              return
 
         # Permissions check using guild settings if available
-        guild_settings = self.guild_settings.get(guild.id, load_guild_settings(guild.id)) # Load if not cached
-        self.guild_settings[guild.id] = guild_settings # Cache it
+        guild_settings = await self.get_guild_settings(guild.id) # Load if not cached
         member = guild.get_member(interaction.user.id)
 
         is_staff = False
@@ -1981,7 +4906,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         # Get the next sequential giveaway ID for this guild
         sequential_id = guild_settings.next_giveaway_id
         guild_settings.next_giveaway_id += 1
-        save_guild_settings(guild_settings) # Save incremented ID immediately
+        await self.storage.save_guild_settings(guild_settings) # Save incremented ID immediately
 
 
         # Parse bonus roles
@@ -2049,6 +4974,8 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
             message_count_channel_id=count_channel.id if count_channel else None,
             message_cooldown_seconds=cooldown_seconds,
             required_keywords=keyword_list,
+            keyword_whole_word=bool(whole_word_keywords),
+            keyword_case_sensitive=bool(case_sensitive_keywords),
             donor_id=donor.id if donor else None,
             image_url=image_url,
             participants={},
@@ -2060,8 +4987,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         # Create embed (without message ID initially)
         try:
             # Pass guild settings to embed function
-            guild_settings_for_embed = self.guild_settings.get(guild.id) # Fetch settings for embed
-            embed = create_giveaway_embed(temp_giveaway, self.bot, status="active", guild_settings=guild_settings_for_embed)
+            embed = create_giveaway_embed(temp_giveaway, self.bot, status="active", guild_settings=guild_settings)
             giveaway_msg = await target_channel.send(embed=embed, view=ActiveGiveawayView(self)) # Use ActiveGiveawayView
         except discord.Forbidden:
              await interaction.followup.send(f"I lack permissions to send messages or embeds in {target_channel.mention}.", ephemeral=True)
@@ -2075,7 +5001,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         # Now update the giveaway data with the actual message ID
         temp_giveaway.message_id = giveaway_msg.id
         # Update the embed footer with the correct IDs
-        embed.set_footer(text=guild_settings_for_embed.embed_footer.format(giveaway_id=temp_giveaway.giveaway_id)) # Use custom footer
+        embed.set_footer(text=guild_settings.embed_footer.format(giveaway_id=temp_giveaway.giveaway_id)) # Use custom footer
         try:
             await giveaway_msg.edit(embed=embed)
         except Exception as e:
@@ -2083,15 +5009,12 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
 
         # Store and schedule
-        self.active_giveaways[giveaway_msg.id] = temp_giveaway
-        self._sequential_id_map[(temp_giveaway.guild_id, temp_giveaway.giveaway_id)] = temp_giveaway.message_id
-        self.save_active_giveaways_for_guild(temp_giveaway.guild_id)
+        self._register_active_giveaway(temp_giveaway)
+        await self.save_active_giveaways_for_guild(temp_giveaway.guild_id, force=True)
         self.schedule_giveaway_end(temp_giveaway) # Schedule the end task for standard giveaways
 
         # Increment host and donor stats (New)
-        if guild.id not in self.user_stats:
-             self.user_stats[guild.id] = load_guild_user_stats(guild.id)
-        guild_stats = self.user_stats[guild.id]
+        guild_stats = await self.get_guild_user_stats(guild.id)
         now = datetime.now(timezone.utc)
 
         # Increment host stats
@@ -2109,7 +5032,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              guild_stats[donor_id].donated_count += 1
              guild_stats[donor_id].donated_last_timestamp = now
 
-        save_guild_user_stats(guild_stats, guild.id)
+        await self.storage.save_guild_user_stats(guild_stats, guild.id, changed_user_ids={host_id, donor.id} if donor else {host_id})
 
 
         logger.info(f"Giveaway {temp_giveaway.giveaway_id}/{giveaway_msg.id} started by {interaction.user} in {target_channel.name} ({target_channel.id}) for guild {guild.id}.")
@@ -2138,8 +5061,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              return
 
         # Permissions check using guild settings if available
-        guild_settings = self.guild_settings.get(guild.id, load_guild_settings(guild.id))
-        self.guild_settings[guild.id] = guild_settings
+        guild_settings = await self.get_guild_settings(guild.id)
         member = guild.get_member(interaction.user.id)
 
         is_staff = False
@@ -2173,7 +5095,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
         sequential_id = guild_settings.next_giveaway_id
         guild_settings.next_giveaway_id += 1
-        save_guild_settings(guild_settings)
+        await self.storage.save_guild_settings(guild_settings)
 
         # Create giveaway data for a drop
         temp_giveaway = GiveawayData(
@@ -2203,8 +5125,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         )
 
         # Create embed using drop settings
-        guild_settings_for_embed = self.guild_settings.get(guild.id)
-        embed = create_giveaway_embed(temp_giveaway, self.bot, status="active", guild_settings=guild_settings_for_embed)
+        embed = create_giveaway_embed(temp_giveaway, self.bot, status="active", guild_settings=guild_settings)
 
         try:
             drop_msg = await target_channel.send(embed=embed, view=ActiveGiveawayView(self)) # Use ActiveGiveawayView
@@ -2219,7 +5140,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         # Now update the giveaway data with the actual message ID
         temp_giveaway.message_id = drop_msg.id
         # Update the embed footer with the correct IDs
-        embed.set_footer(text=guild_settings_for_embed.embed_footer.format(giveaway_id=temp_giveaway.giveaway_id)) # Use custom footer
+        embed.set_footer(text=guild_settings.embed_footer.format(giveaway_id=temp_giveaway.giveaway_id)) # Use custom footer
         try:
             await drop_msg.edit(embed=embed)
         except Exception as e:
@@ -2227,15 +5148,12 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
 
         # Store the drop giveaway
-        self.active_giveaways[drop_msg.id] = temp_giveaway
-        self._sequential_id_map[(temp_giveaway.guild_id, temp_giveaway.giveaway_id)] = temp_giveaway.message_id
-        self.save_active_giveaways_for_guild(temp_giveaway.guild_id)
+        self._register_active_giveaway(temp_giveaway)
+        await self.save_active_giveaways_for_guild(temp_giveaway.guild_id, force=True)
         # No schedule_giveaway_end for drops
 
         # Increment host stats (New)
-        if guild.id not in self.user_stats:
-             self.user_stats[guild.id] = load_guild_user_stats(guild.id)
-        guild_stats = self.user_stats[guild.id]
+        guild_stats = await self.get_guild_user_stats(guild.id)
         now = datetime.now(timezone.utc)
 
         host_id = interaction.user.id
@@ -2243,7 +5161,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              guild_stats[host_id] = UserGiveawayStats(user_id=host_id, guild_id=guild.id)
         guild_stats[host_id].hosted_count += 1
         guild_stats[host_id].hosted_last_timestamp = now
-        save_guild_user_stats(guild_stats, guild.id)
+        await self.storage.save_guild_user_stats(guild_stats, guild.id, changed_user_ids={host_id})
 
 
         logger.info(f"Drop Giveaway {temp_giveaway.giveaway_id}/{drop_msg.id} started by {interaction.user} in {target_channel.name} ({target_channel.id}) for guild {guild.id}.")
@@ -2269,9 +5187,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         target_user = user or interaction.user # Default to self
 
         # Load stats for the guild
-        if guild.id not in self.user_stats:
-             self.user_stats[guild.id] = load_guild_user_stats(guild.id)
-        guild_stats = self.user_stats[guild.id]
+        guild_stats = await self.get_guild_user_stats(guild.id)
 
         user_stats = guild_stats.get(target_user.id)
 
@@ -2344,8 +5260,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              return
 
         # Permissions check using guild settings if available
-        guild_settings = self.guild_settings.get(guild.id, load_guild_settings(guild.id))
-        self.guild_settings[guild.id] = guild_settings
+        guild_settings = await self.get_guild_settings(guild.id)
         member = guild.get_member(interaction.user.id)
 
         is_staff = False
@@ -2361,7 +5276,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
 
         await interaction.response.defer(ephemeral=True, thinking=True)
-        guild_giveaways = [gw for gw in self.active_giveaways.values() if gw.guild_id == guild.id and not gw.ended]
+        guild_giveaways = [gw for gw in self.get_guild_active_giveaways(guild.id) if not gw.ended]
 
         if not guild_giveaways:
             await interaction.followup.send("There are no active giveaways in this server right now.", ephemeral=True)
@@ -2417,8 +5332,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              return
 
         # Permissions check
-        guild_settings = self.guild_settings.get(guild.id, load_guild_settings(guild.id))
-        self.guild_settings[guild.id] = guild_settings
+        guild_settings = await self.get_guild_settings(guild.id)
         member = guild.get_member(interaction.user.id)
         is_staff = False
         if guild_settings.staff_role_id and member:
@@ -2433,7 +5347,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         await interaction.response.defer(ephemeral=True, thinking=True)
 
         # Lookup giveaway by sequential ID
-        giveaway = self.get_giveaway_by_sequential_id(guild.id, giveaway_id)
+        giveaway = await self.get_giveaway_by_sequential_id(guild.id, giveaway_id)
 
         if not giveaway or giveaway.ended or giveaway.guild_id != guild.id:
             await interaction.followup.send(f"No active giveaway found with ID {giveaway_id} in this server.", ephemeral=True)
@@ -2441,19 +5355,19 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
         logger.info(f"Cancelling giveaway {giveaway_id}/{giveaway.message_id} by request of {interaction.user} in guild {guild.id}.")
 
-        # Cancel the end task (only applicable to standard giveaways)
+        # Unschedule the end (only applicable to standard giveaways)
         if not giveaway.is_drop:
-             task = self.giveaway_end_tasks.pop(giveaway.message_id, None)
-             if task:
-                 task.cancel()
+             self.scheduler.cancel(giveaway.message_id)
 
         giveaway.ended = True # Mark as ended (cancelled)
         giveaway.task_scheduled = False # Task is no longer relevant
 
 
         # Remove from active, save state for this guild
-        self.active_giveaways.pop(giveaway.message_id, None)
-        self.save_active_giveaways_for_guild(giveaway.guild_id)
+        self._unregister_active_giveaway(giveaway)
+        self.count_renderer.finish(giveaway.message_id)
+        await self.storage.record_end(giveaway, cancelled=True)
+        await self.save_active_giveaways_for_guild(giveaway.guild_id, force=True)
         # Optionally add to ended cache marked as cancelled? For now, just remove from active.
         # Also remove from sequential ID map? No, keep it for historical lookup if needed.
 
@@ -2461,11 +5375,12 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         channel = self.bot.get_channel(giveaway.channel_id)
         if channel:
             try:
-                original_msg = await channel.fetch_message(giveaway.message_id)
+                original_msg = channel.get_partial_message(giveaway.message_id)
                 cancel_embed = create_giveaway_embed(giveaway, self.bot, status="cancelled", guild_settings=guild_settings)
                 # Replace the view with EndedGiveawayView (buttons should be disabled by logic)
                 ended_view = EndedGiveawayView(self, giveaway=giveaway) # Create instance
-                await original_msg.edit(embed=cancel_embed, view=ended_view) # Replace the view
+                await self.outbound.submit(("channel", channel.id), functools.partial(original_msg.edit, embed=cancel_embed, view=ended_view), # Replace the view
+                                           OUTBOUND_PRIORITY_ANNOUNCE, f"cancel edit of giveaway message {giveaway.message_id}", merge_key=("edit", giveaway.message_id))
 
                 await interaction.followup.send(f"✅ Giveaway **{giveaway_id}** (Prize: {giveaway.prize}) has been cancelled.", ephemeral=True)
                 await self.log_giveaway_event("cancel", giveaway, interaction.user)
@@ -2497,8 +5412,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              return
 
         # Permissions check
-        guild_settings = self.guild_settings.get(guild.id, load_guild_settings(guild.id))
-        self.guild_settings[guild.id] = guild_settings
+        guild_settings = await self.get_guild_settings(guild.id)
         member = guild.get_member(interaction.user.id)
         is_staff = False
         if guild_settings.staff_role_id and member:
@@ -2513,18 +5427,15 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
         await interaction.response.defer(ephemeral=True, thinking=True)
 
         # Lookup giveaway by sequential ID
-        giveaway = self.get_giveaway_by_sequential_id(guild.id, giveaway_id)
+        giveaway = await self.get_giveaway_by_sequential_id(guild.id, giveaway_id)
 
         if not giveaway or giveaway.ended or giveaway.guild_id != guild.id:
             await interaction.followup.send(f"No active giveaway found with ID {giveaway_id} in this server.", ephemeral=True)
             return
 
-        # Cancel the scheduled end task (if exists and is standard giveaway)
-        if not giveaway.is_drop:
-             task = self.giveaway_end_tasks.pop(giveaway.message_id, None)
-             if task:
-                  task.cancel()
-                  logger.info(f"Cancelled scheduled end task for giveaway {giveaway_id}/{giveaway.message_id} due to manual end.")
+        # Unschedule the end (if it is a scheduled standard giveaway)
+        if not giveaway.is_drop and self.scheduler.cancel(giveaway.message_id):
+             logger.info(f"Unscheduled end of giveaway {giveaway_id}/{giveaway.message_id} due to manual end.")
 
         # Trigger the end logic
         await self.end_giveaway(giveaway.message_id, ended_by=interaction.user)
@@ -2542,8 +5453,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
              return
 
         # Permissions check
-        guild_settings = self.guild_settings.get(guild.id, load_guild_settings(guild.id))
-        self.guild_settings[guild.id] = guild_settings
+        guild_settings = await self.get_guild_settings(guild.id)
         member = guild.get_member(interaction.user.id)
         is_staff = False
         if guild_settings.staff_role_id and member:
@@ -2557,8 +5467,8 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
         await interaction.response.defer(ephemeral=True, thinking=True)
 
-        # Lookup giveaway by sequential ID (will check active and ended cache)
-        giveaway = self.get_giveaway_by_sequential_id(guild.id, giveaway_id)
+        # Lookup giveaway by sequential ID (checks active and ended cache, then pages in from the archive)
+        giveaway = await self.get_giveaway_by_sequential_id(guild.id, giveaway_id)
 
         if not giveaway or giveaway.guild_id != guild.id:
             await interaction.followup.send(f"Could not find data for giveaway ID **{giveaway_id}** in this server. It might be too old or never existed.", ephemeral=True)
@@ -2576,12 +5486,63 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
         # The perform_reroll function handles the followup and logging
 
+    @g_group.command(name="dmstatus", description="Show winner DM delivery results for an ended giveaway.")
+    @app_commands.describe(giveaway_id="The Sequential Giveaway ID of the ended giveaway.")
+    @app_commands.checks.has_permissions(manage_guild=True) # Default check
+    async def gdmstatus_command(self, interaction: discord.Interaction, giveaway_id: int):
+        """Shows which winners were DMed, which have DMs closed and which failed."""
+        guild = interaction.guild
+        if not guild:
+             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+             return
+
+        # Permissions check
+        guild_settings = await self.get_guild_settings(guild.id)
+        member = guild.get_member(interaction.user.id)
+        is_staff = False
+        if guild_settings.staff_role_id and member:
+             staff_role = guild.get_role(guild_settings.staff_role_id)
+             if staff_role and staff_role in member.roles:
+                  is_staff = True
+        if not member.guild_permissions.manage_guild and not is_staff:
+            await interaction.response.send_message("You need the 'Manage Guild' permission or the configured staff role to use this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        giveaway = await self.get_giveaway_by_sequential_id(guild.id, giveaway_id)
+        if not giveaway or giveaway.guild_id != guild.id:
+            await interaction.followup.send(f"Could not find data for giveaway ID **{giveaway_id}** in this server. It might be too old or never existed.", ephemeral=True)
+            return
+        if not giveaway.ended:
+            await interaction.followup.send(f"Giveaway ID **{giveaway_id}** has not ended yet.", ephemeral=True)
+            return
+        if not giveaway.dm_results:
+            await interaction.followup.send(f"No winner DMs were sent for giveaway ID **{giveaway_id}** (winner DMs may be disabled).", ephemeral=True)
+            return
+
+        labels = {DM_STATUS_SENT: "✅ Sent", DM_STATUS_CLOSED: "🔒 DMs closed", DM_STATUS_FAILED: "❌ Failed", DM_STATUS_PENDING: "⏳ Pending"}
+        counts = Counter(giveaway.dm_results.values())
+        summary = " | ".join(f"{label}: **{counts[status]}**" for status, label in labels.items() if counts[status])
+        lines = [f"**Winner DMs for giveaway {giveaway_id}** ({giveaway.prize})", summary, ""]
+        length = sum(len(line) + 1 for line in lines)
+        for user_id, status in giveaway.dm_results.items():
+            line = f"<@{user_id}> - {labels.get(status, status)}"
+            if length + len(line) + 1 > 1900: # Keep under the 2000 character message limit
+                lines.append(f"...and {len(giveaway.dm_results) - (len(lines) - 3)} more.")
+                break
+            lines.append(line)
+            length += len(line) + 1
+        await interaction.followup.send("\n".join(lines), ephemeral=True, allowed_mentions=discord.AllowedMentions.none())
+
     @g_group.command(name="settings", description="Configure giveaway settings for this server.")
     @app_commands.describe(
          staff_role="Role that can manage giveaways (overrides default permissions). Select 'Unset' to clear.", # Add unset instruction
          default_blacklist="Default role whose members are blacklisted. Select 'Unset' to clear.", # Add unset instruction
          default_bypass="Default roles that bypass requirements (mention roles, separated by space). Type 'none' to clear.", # Add unset instruction
          log_channel="Channel to send detailed giveaway logs. Select 'Unset' to clear.", # Add unset instruction
+         reroll_cache_size=f"How many ended giveaways can still be rerolled (1-{MAX_ENDED_GIVEAWAYS_LIMIT}).",
+         reroll_cache_days="Days an ended giveaway can still be rerolled. 0 for no limit.",
          # --- New Arguments for Customization ---
          embed_colour="Embed color (hex e.g., #3498db).",
          embed_winners_colour="Embed color when winners drawn (hex).",
@@ -2621,6 +5582,8 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                                 default_blacklist: Optional[discord.Role] = None,
                                 default_bypass: Optional[str] = None,
                                 log_channel: Optional[discord.TextChannel] = None,
+                                reroll_cache_size: Optional[app_commands.Range[int, 1, MAX_ENDED_GIVEAWAYS_LIMIT]] = None,
+                                reroll_cache_days: Optional[app_commands.Range[int, 0]] = None,
                                 # --- New Parameters ---
                                 embed_colour: Optional[str] = None,
                                 embed_winners_colour: Optional[str] = None,
@@ -2655,7 +5618,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
          await interaction.response.defer(ephemeral=True, thinking=True)
 
          # Load current settings or get default
-         guild_settings = self.guild_settings.get(guild.id, load_guild_settings(guild.id))
+         guild_settings = await self.get_guild_settings(guild.id)
 
          # Track changes to provide feedback
          changes = []
@@ -2725,6 +5688,14 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                      guild_settings.log_channel_id = log_channel.id
                      changes.append(f"Giveaway log channel set to {log_channel.mention}.")
 
+         if reroll_cache_size is not None:
+             guild_settings.ended_cache_max_count = reroll_cache_size
+             changes.append(f"Reroll cache size set to {reroll_cache_size} giveaways.")
+
+         if reroll_cache_days is not None:
+             guild_settings.ended_cache_max_age_days = reroll_cache_days
+             changes.append(f"Reroll cache age limit set to {f'{reroll_cache_days} days' if reroll_cache_days else 'none'}.")
+
 
          # --- Update New Settings ---
          if embed_colour is not None:
@@ -2884,7 +5855,9 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
                   f"Default Blacklist Role: {blacklist_role_mention}\n"
                   f"Default Bypass Roles: {bypass_roles_str}\n"
                   f"Log Channel: {log_channel_mention}\n"
-                  f"DM Winner: {settings.dm_winner}", inline=False)
+                  f"DM Winner: {settings.dm_winner}\n"
+                  f"Reroll Cache: {settings.ended_cache_max_count} giveaways"
+                  f"{f', {settings.ended_cache_max_age_days} days' if settings.ended_cache_max_age_days else ''}", inline=False)
 
               embed.add_field(name="Embed Appearance (Giveaway)", value=
                   f"Color: `{settings.embed_colour}`\n"
@@ -2927,7 +5900,9 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
 
          # Save updated settings if changes were made (even if there were warnings)
          self.guild_settings[guild.id] = guild_settings # Ensure cached
-         save_guild_settings(guild_settings)
+         await self.storage.save_guild_settings(guild_settings)
+         if reroll_cache_size is not None or reroll_cache_days is not None:
+             await self.prune_ended_giveaway_caches(guild.id) # Apply a lowered retention right away
 
          feedback_message = ""
          if changes:
@@ -2947,13 +5922,14 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
          embed = discord.Embed(title="🎁 Giveaway Bot Help", color=discord.Color.purple())
          embed.description = "Manage giveaways and drops using these slash commands:"
 
-         embed.add_field(name="/g start", value="Starts a new standard giveaway.\n*Args: `duration`, `winners`, `prize`, `[channel]`, `[required_role]`, `[bonus_roles]`, `[bypass_roles]`, `[blacklist_role]`, `[min_messages]`, `[message_channel]`, `[message_cooldown]`, `[keywords]`, `[donor]`, `[image_url]`*", inline=False)
+         embed.add_field(name="/g start", value="Starts a new standard giveaway.\n*Args: `duration`, `winners`, `prize`, `[channel]`, `[required_role]`, `[bonus_roles]`, `[bypass_roles]`, `[blacklist_role]`, `[min_messages]`, `[message_channel]`, `[message_cooldown]`, `[keywords]`, `[whole_word_keywords]`, `[case_sensitive_keywords]`, `[donor]`, `[image_url]`*", inline=False)
          embed.add_field(name="/g drop", value="Starts a drop giveaway (first to join wins).\n*Args: `prize`, `[channel]`, `[image_url]`*", inline=False) # Add drop command
          embed.add_field(name="/g profile", value="Shows giveaway statistics for a user.\n*Args: `[user]`*", inline=False) # Add profile command
          embed.add_field(name="/g list", value="Lists active giveaways in this server by sequential ID.", inline=False)
          embed.add_field(name="/g end", value="Ends a giveaway immediately.\n*Args: `giveaway_id`*", inline=False)
          embed.add_field(name="/g cancel", value="Cancels an active giveaway.\n*Args: `giveaway_id`*", inline=False)
-         embed.add_field(name="/g reroll", value="Rerolls winners for a recently ended giveaway.\n*Args: `giveaway_id`*", inline=False)
+         embed.add_field(name="/g reroll", value="Rerolls winners for an ended giveaway.\n*Args: `giveaway_id`*", inline=False)
+         embed.add_field(name="/g dmstatus", value="Shows which winners of an ended giveaway were DMed (sent, DMs closed or failed).\n*Args: `giveaway_id`*", inline=False)
          embed.add_field(name="/g settings", value="Configure server-specific settings.", inline=False) # Simplify args list due to length
          embed.add_field(name="ㅤ", value="*Use `/g settings` without args to view current settings. See command usage for available arguments.*", inline=False) # Add note about settings args
 
@@ -2968,7 +5944,7 @@ class GiveawayCog(commands.Cog, name="Giveaways"):
          embed.add_field(name="Formatting Help", value=
                           "**Duration/Cooldown:** `10s`, `15m`, `2h`, `1d`, `1h30m` (Cooldown max unit is hours).\n"
                           "**Bonus/Bypass Roles:** Mention the role(s). Example: `bonus_roles:@VIP:2 @Booster:1` `bypass_roles:@Admin @Mod`\n"
-                          "**Keywords:** Comma-separated list. Example: `keywords:enter, giveaway, win`\n"
+                          "**Keywords:** Comma-separated list. Example: `keywords:enter, giveaway, win`. Matching ignores case and finds keywords inside words unless `whole_word_keywords`/`case_sensitive_keywords` are set.\n"
                           "**Settings Unset:** For roles/channels, select the 'Unset' option (value 0) from autocomplete. For default bypass, type `none`. For other optional text/image fields, omit the argument.\n" # Clarified unset method
                           "**Settings Formatting:** For embed/message text, use `{prize}`, `{winners}`, `{host}`, `{guild_name}`, `{giveaway_id}` where applicable. Markdown is supported in DM descriptions."
                           , inline=False)